@@ -1,15 +1,23 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, render_template, request, jsonify, stream_with_context
 from datetime import datetime
 import io
 from PIL import Image
 
 # Services
 from services.analysis_service import get_analysis_service
-from services.history_service import HistoryService, ProfileService
+from services.history_service import HistoryService, ProfileService, UserDeletedError
 from services.led_service import LEDService
 from services.chatbot_service import get_chatbot_service
-from services.chat_history_service import ChatHistoryService
+from services.response_cache import get_response_cache
+from services.chat_context_service import ChatContextService
+from services.chat_history_service import ChatHistoryService, get_chat_history_writer
+from services.population_service import start_population_scheduler
+from services.purge_service import get_user_purge_worker
 from models.database import init_db, get_db
+from models.migrations import add_user_deleted_at_column
+from core.config import CHAT_ANALYSIS_CONTEXT_DEFAULT
+from core.constants import SERIES_DEFAULT_POINTS, SERIES_DEFAULT_WINDOW, USERS_PAGE_SIZE
+from utils.sse import format_sse
 
 # Blueprints
 from routes.device import device_bp
@@ -24,11 +32,18 @@ app.register_blueprint(device_bp)
 # ==========================================
 try:
     init_db()
+    add_user_deleted_at_column()
     print("[INFO] Database connection successful!")
 except Exception as e:
     print(f"[WARNING] Database initialization error: {e}")
     # 필요한 경우 여기에 대체 로직 추가
 
+# 모집단 분위수 배치 (POPULATION_STATS_INTERVAL > 0 인 경우에만)
+start_population_scheduler()
+
+# 중단된 사용자 삭제 정리 재개 (백그라운드)
+get_user_purge_worker()
+
 # ==========================================
 # 싱글톤 서비스 인스턴스 가져오기
 # ==========================================
@@ -99,6 +114,9 @@ def save_history():
         result = HistoryService.save_analysis(user_id, data)
         return jsonify(result)
 
+    except UserDeletedError as e:
+        return jsonify({"error": str(e)}), 410
+
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -110,6 +128,9 @@ def get_history(user_id):
         result = HistoryService.get_user_history(user_id, limit)
         return jsonify(result)
 
+    except UserDeletedError as e:
+        return jsonify({"error": str(e)}), 410
+
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -120,6 +141,28 @@ def get_user_stats(user_id):
         result = HistoryService.get_user_stats(user_id)
         return jsonify(result)
 
+    except UserDeletedError as e:
+        return jsonify({"error": str(e)}), 410
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/v1/stats/<user_id>/series', methods=['GET'])
+def get_user_score_series(user_id):
+    """사용자 점수 시계열 조회 (차트용, 서버 측 다운샘플링)"""
+    try:
+        bucket = request.args.get('bucket', 'day')
+        points = request.args.get('points', type=int, default=SERIES_DEFAULT_POINTS)
+        window = request.args.get('window', type=int, default=SERIES_DEFAULT_WINDOW)
+        result = HistoryService.get_score_series(user_id, bucket, points, window)
+        return jsonify(result)
+
+    except UserDeletedError as e:
+        return jsonify({"error": str(e)}), 410
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -134,6 +177,9 @@ def save_user_profile():
         result = ProfileService.save_profile(data)
         return jsonify(result)
 
+    except UserDeletedError as e:
+        return jsonify({"error": str(e)}), 410
+
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -151,10 +197,12 @@ def get_user_profile(user_id):
 
 @app.route('/api/v1/users', methods=['GET'])
 def get_all_users():
-    """모든 사용자 목록 조회"""
+    """사용자 목록 조회 (keyset 페이징: ?limit=&after=<next_cursor>)"""
     try:
-        users = ProfileService.get_all_users()
-        return jsonify({"users": users})
+        limit = request.args.get('limit', type=int, default=USERS_PAGE_SIZE)
+        after = request.args.get('after')
+        result = ProfileService.get_all_users(limit, after)
+        return jsonify(result)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -173,36 +221,65 @@ def delete_user(user_id):
 # ==========================================
 # 6. 챗봇 상담 API
 # ==========================================
+def _parse_chat_request(label):
+    """
+    챗봇 요청 파싱 / 검증 / 컨텍스트 생성 (일반·스트리밍 라우트 공용)
+
+    Returns:
+        (user_id, message, image_file, context) 또는 질문과 이미지가 모두 없으면 None
+
+    Raises:
+        UserDeletedError: 삭제 처리 중인 사용자
+    """
+    user_id = request.form.get('user_id', 'anonymous')
+    message = request.form.get('message', '')
+    image_file = request.files.get('image')
+
+    use_analysis = request.form.get('use_analysis', CHAT_ANALYSIS_CONTEXT_DEFAULT)
+    multi_turn = request.form.get('multi_turn', '0')
+
+    # JSON 요청 처리 (이미지가 없는 경우)
+    if not message and request.is_json:
+        data = request.get_json()
+        message = data.get('message', '')
+        user_id = data.get('user_id', user_id)
+        use_analysis = str(data.get('use_analysis', use_analysis))
+        multi_turn = str(data.get('multi_turn', multi_turn))
+
+    if not message and not image_file:
+        return None
+
+    # 삭제 처리 중인 사용자는 대화를 받지 않음 (정리 후 기록이 남지 않도록)
+    HistoryService.ensure_active_user(user_id)
+
+    print(f"[{label}] User: {user_id}, Message: {message}, Image: {bool(image_file)}")
+
+    # 최근 분석 요약(사진 없이도 피부 상태 반영)과 멀티턴 대화 기록을 질문에 포함
+    # (응답 캐시는 질문 원문을 키로 하고 컨텍스트별로 구분)
+    context = ChatContextService.build_context(
+        user_id, include_analysis=use_analysis == '1', include_history=multi_turn == '1'
+    ) if message else None
+
+    return user_id, message, image_file, context
+
+
 @app.route('/api/v1/chatbot/chat', methods=['POST'])
 def chat_with_bot():
     global chatbot_service
     try:
         if chatbot_service is None:
             chatbot_service = get_chatbot_service()
-            
-        user_id = request.form.get('user_id', 'anonymous')
-        message = request.form.get('message', '')
-        image_file = request.files.get('image')
-        
-        # JSON 요청 처리 (이미지가 없는 경우)
-        if not message and request.is_json:
-            data = request.get_json()
-            message = data.get('message', '')
-            user_id = data.get('user_id', user_id)
 
-        if not message and not image_file:
-             return jsonify({"error": "No message or image provided"}), 400
+        chat_request = _parse_chat_request("Chatbot")
+        if chat_request is None:
+            return jsonify({"error": "No message or image provided"}), 400
+        user_id, message, image_file, context = chat_request
 
-        print(f"[Chatbot] User: {user_id}, Message: {message}, Image: {bool(image_file)}")
-
-        reply = chatbot_service.generate_response(message, image_file)
+        reply = chatbot_service.generate_response(message, image_file, context=context)
         
-        # 챗봇 대화 내용 저장
+        # 챗봇 대화 내용 저장 (write-behind: 응답을 DB 저장과 분리)
         try:
-            from models.database import SessionLocal
-            db = SessionLocal()
-            ChatHistoryService.save_chat(db, user_id, message, reply)
-            db.close()
+            get_chat_history_writer().enqueue(user_id, message, reply)
         except Exception as save_err:
             print(f"Failed to save chat history: {save_err}")
         
@@ -212,20 +289,88 @@ def chat_with_bot():
             "timestamp": datetime.now().isoformat()
         })
 
+    except UserDeletedError as e:
+        return jsonify({"error": str(e)}), 410
+
+    except Exception as e:
+        print(f"Chatbot Error: {e}")
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/v1/chatbot/chat/stream', methods=['POST'])
+def chat_with_bot_stream():
+    """챗봇 답변 스트리밍 (SSE) - 스트림이 끝나면 최종 답변을 저장"""
+    global chatbot_service
+    try:
+        if chatbot_service is None:
+            chatbot_service = get_chatbot_service()
+
+        chat_request = _parse_chat_request("Chatbot Stream")
+        if chat_request is None:
+            return jsonify({"error": "No message or image provided"}), 400
+        user_id, message, image_file, context = chat_request
+
+    except UserDeletedError as e:
+        return jsonify({"error": str(e)}), 410
+
     except Exception as e:
         print(f"Chatbot Error: {e}")
         return jsonify({"error": str(e)}), 500
 
+    def events():
+        reply = ""
+        try:
+            for chunk in chatbot_service.stream_response(message, image_file, context=context):
+                if "token" in chunk:
+                    yield format_sse({"token": chunk["token"]})
+                else:
+                    reply = chunk.get("reply", "")
+        except Exception as e:
+            print(f"Chatbot Stream Error: {e}")
+            yield format_sse({"error": str(e)}, event="error")
+            return
+
+        # 챗봇 대화 내용 저장 (write-behind)
+        try:
+            get_chat_history_writer().enqueue(user_id, message, reply)
+        except Exception as save_err:
+            print(f"Failed to save chat history: {save_err}")
+
+        yield format_sse({
+            "reply": reply,
+            "user_id": user_id,
+            "timestamp": datetime.now().isoformat()
+        }, event="done")
+
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.route('/api/v1/chatbot/cache/stats', methods=['GET'])
+def get_chatbot_cache_stats():
+    """챗봇 응답 캐시 적중 통계 API"""
+    return jsonify(get_response_cache().stats())
+
 
 @app.route('/api/v1/chatbot/history/<user_id>', methods=['GET'])
 def get_chat_history(user_id):
     """챗봇 대화 내역 조회 API"""
     try:
+        HistoryService.ensure_active_user(user_id)
+
+        # 버퍼에 남은 대화를 먼저 반영 (read-your-writes)
+        get_chat_history_writer().flush()
+
         from models.database import SessionLocal
         db = SessionLocal()
         history = ChatHistoryService.get_history(db, user_id)
         db.close()
         return jsonify([h.to_dict() for h in history])
+    except UserDeletedError as e:
+        return jsonify({"error": str(e)}), 410
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
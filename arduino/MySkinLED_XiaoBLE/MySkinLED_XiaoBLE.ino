@@ -14,6 +14,16 @@
  *
  * Commands: "START:MODE:DURATION"
  * Example: "START:RED:20" (Red mode for 20 minutes)
+ *
+ * Therapy programs: "PROGRAM:MODE,SECONDS,PWM_START,PWM_END,RAMP_SECONDS;..." (up to 4 phases, 60 min total)
+ * Example: "PROGRAM:RED,600,128,255,60;GOLD,300,96,191,60" -> "OK:PROGRAM:2:900"
+ * The device steps through the phases and PWM ramps on its own timer; a program keeps
+ * running if the BLE central disconnects (a single START still stops on disconnect).
+ *
+ * USB Serial also accepts binary frames (protocol v1, see services/device_protocol.py):
+ *   0xA5 | VER | SEQ | TYPE | LEN | PAYLOAD | CRC16-CCITT (big-endian, over VER..PAYLOAD)
+ * The host negotiates with the text command "PROTO:<version>" -> "OK:PROTO:<version>".
+ * Text and binary commands can be mixed; each is answered in the format it arrived in.
  */
 
 #include <ArduinoBLE.h>
@@ -42,19 +52,72 @@ LEDMode modes[3] = {
   {"GOLD", 255, 215, 0}    // 590nm equivalent (미백, 색소침착)
 };
 
-// State variables
+// Binary frame protocol
+#define PROTOCOL_VERSION 1
+#define FRAME_SYNC 0xA5
+#define FRAME_HEADER_SIZE 5
+#define FRAME_MAX_PAYLOAD 32
+#define FRAME_TIMEOUT_MS 100   // drop a partial frame if the rest does not arrive
+
+#define CMD_START 0x01
+#define CMD_STOP 0x02
+#define CMD_STATUS 0x03
+#define CMD_TEST 0x04
+#define CMD_PROGRAM 0x05
+#define RSP_OK 0x81
+#define RSP_ERROR 0x82
+#define RSP_STATUS 0x83
+#define MODE_OFF 0xFF
+
+// Therapy program limits (a 4-phase text command fits the 100-byte BLE characteristic)
+#define MAX_PHASES 4
+#define PHASE_SIZE 6
+#define MAX_PROGRAM_SECONDS 3600
+
+struct Phase {
+  uint8_t mode;          // index into modes[]
+  uint16_t seconds;
+  uint8_t pwmStart;      // brightness at phase start (0-255)
+  uint8_t pwmEnd;        // brightness after the ramp
+  uint8_t rampSeconds;
+};
+
+// Serial receive state (text line or binary frame)
+String rxLine = "";
+uint8_t rxFrame[FRAME_HEADER_SIZE + FRAME_MAX_PAYLOAD + 2];
+size_t rxFrameLen = 0;
+unsigned long rxFrameStart = 0;
+
+// State variables (a single START runs as a one-phase program)
 String currentMode = "OFF";
-unsigned long therapyDuration = 0;  // in milliseconds
-unsigned long therapyStartTime = 0;
+Phase program[MAX_PHASES];
+int phaseCount = 0;
+int phaseIndex = 0;
+unsigned long phaseStartTime = 0;
+int currentLevel = -1;
 bool therapyActive = false;
+bool programMode = false;  // uploaded program: keeps running without a BLE central
 
 // Function prototypes
 void setupPins();
 void setupBLE();
 void processCommand(String cmd, bool isBLE);
+String executeCommand(String cmd);
 void sendResponse(String response, bool isBLE);
+void pollSerial();
+void handleFrame();
+void sendFrame(uint8_t seq, uint8_t type, const uint8_t* payload, uint8_t len);
+void sendBinaryResponse(uint8_t seq, String response);
+uint16_t crc16(const uint8_t* data, size_t len);
+int modeIndex(String mode);
+String parseProgram(String body, Phase* out, int& count);
+bool isNumber(String value);
 void setLEDColor(int r, int g, int b);
+void writeLED(int r, int g, int b);
 void startTherapy(String mode, int durationMin);
+void startProgram(Phase* phases, int count);
+void enterPhase(int index);
+void applyLevel(int level);
 void stopTherapy();
 void updateTherapy();
 void blinkStatusLED();
@@ -94,15 +157,7 @@ void setup() {
 
 void loop() {
   // Check for Serial commands (USB connection)
-  if (Serial.available() > 0) {
-    String command = Serial.readStringUntil('\n');
-    command.trim();
-    if (command.length() > 0) {
-      Serial.print("Serial command received: ");
-      Serial.println(command);
-      processCommand(command, false);
-    }
-  }
+  pollSerial();
 
   // Poll BLE central
   BLEDevice central = BLE.central();
@@ -114,15 +169,7 @@ void loop() {
 
     while (central.connected()) {
       // Check for Serial commands even during BLE connection
-      if (Serial.available() > 0) {
-        String command = Serial.readStringUntil('\n');
-        command.trim();
-        if (command.length() > 0) {
-          Serial.print("Serial command received: ");
-          Serial.println(command);
-          processCommand(command, false);
-        }
-      }
+      pollSerial();
 
       // Check for incoming BLE command
       if (commandCharacteristic.written()) {
@@ -142,7 +189,11 @@ void loop() {
     Serial.print("Disconnected from central: ");
     Serial.println(central.address());
     digitalWrite(STATUS_LED, LOW);
-    stopTherapy();
+    if (programMode && therapyActive) {
+      Serial.println("Program continues without central");
+    } else {
+      stopTherapy();
+    }
   } else {
     // No BLE connection - check serial and update therapy
     updateTherapy();
@@ -197,7 +248,247 @@ void setupBLE() {
 }
 
 // Unified command processing function
+// Read available Serial bytes without blocking; dispatch text lines and binary frames
+void pollSerial() {
+  if (rxFrameLen > 0 && millis() - rxFrameStart > FRAME_TIMEOUT_MS) {
+    rxFrameLen = 0;
+  }
+
+  while (Serial.available() > 0) {
+    uint8_t b = Serial.read();
+
+    if (rxFrameLen > 0) {
+      rxFrame[rxFrameLen++] = b;
+      if (rxFrameLen == FRAME_HEADER_SIZE && rxFrame[4] > FRAME_MAX_PAYLOAD) {
+        rxFrameLen = 0;  // invalid length, resync on next SYNC byte
+      } else if (rxFrameLen >= FRAME_HEADER_SIZE && rxFrameLen == FRAME_HEADER_SIZE + rxFrame[4] + 2) {
+        handleFrame();
+        rxFrameLen = 0;
+      }
+      continue;
+    }
+
+    if (b == FRAME_SYNC && rxLine.length() == 0) {
+      rxFrame[0] = b;
+      rxFrameLen = 1;
+      rxFrameStart = millis();
+    } else if (b == '\n') {
+      String command = rxLine;
+      rxLine = "";
+      command.trim();
+      if (command.length() > 0) {
+        Serial.print("Serial command received: ");
+        Serial.println(command);
+        processCommand(command, false);
+      }
+    } else if (rxLine.length() < 100) {
+      rxLine += (char)b;
+    }
+  }
+}
+
+// Handle a complete binary frame in rxFrame (no echo line, answer with the same SEQ)
+void handleFrame() {
+  uint8_t len = rxFrame[4];
+  uint16_t expected = ((uint16_t)rxFrame[FRAME_HEADER_SIZE + len] << 8) | rxFrame[FRAME_HEADER_SIZE + len + 1];
+  if (crc16(rxFrame + 1, FRAME_HEADER_SIZE - 1 + len) != expected) {
+    // SEQ cannot be trusted either: drop silently, the host times out
+    return;
+  }
+
+  uint8_t version = rxFrame[1];
+  uint8_t seq = rxFrame[2];
+  uint8_t type = rxFrame[3];
+  uint8_t* payload = rxFrame + FRAME_HEADER_SIZE;
+  uint8_t error = 0;
+  String command = "";
+
+  if (version == 0 || version > PROTOCOL_VERSION) {
+    error = 5;  // UNSUPPORTED_VERSION
+  } else if (type == CMD_START) {
+    if (len != 2) {
+      error = 1;  // INVALID_FORMAT
+    } else if (payload[0] >= 3) {
+      error = 4;  // INVALID_MODE
+    } else {
+      command = "START:" + modes[payload[0]].name + ":" + String(payload[1]);
+    }
+  } else if (type == CMD_STOP) {
+    command = "STOP";
+  } else if (type == CMD_STATUS) {
+    command = "STATUS";
+  } else if (type == CMD_TEST) {
+    command = "TEST";
+  } else if (type == CMD_PROGRAM) {
+    if (len == 0 || payload[0] == 0 || payload[0] > MAX_PHASES || len != 1 + payload[0] * PHASE_SIZE) {
+      error = 1;  // INVALID_FORMAT
+    } else {
+      command = "PROGRAM:";
+      for (int i = 0; i < payload[0] && !error; i++) {
+        uint8_t* phase = payload + 1 + i * PHASE_SIZE;
+        if (phase[0] >= 3) {
+          error = 4;  // INVALID_MODE
+          break;
+        }
+        if (i > 0) command += ";";
+        command += modes[phase[0]].name + "," + String(((uint16_t)phase[1] << 8) | phase[2]) + ","
+                 + String(phase[3]) + "," + String(phase[4]) + "," + String(phase[5]);
+      }
+    }
+  } else {
+    error = 3;  // UNKNOWN_COMMAND
+  }
+
+  if (error) {
+    sendFrame(seq, RSP_ERROR, &error, 1);
+    return;
+  }
+  sendBinaryResponse(seq, executeCommand(command));
+}
+
+// Encode a text response as a binary response frame
+void sendBinaryResponse(uint8_t seq, String response) {
+  uint8_t payload[4];
+
+  if (response.startsWith("ERROR:")) {
+    String name = response.substring(6);
+    payload[0] = 3;  // UNKNOWN_COMMAND
+    if (name == "INVALID_FORMAT") payload[0] = 1;
+    else if (name == "INVALID_DURATION") payload[0] = 2;
+    else if (name == "INVALID_MODE") payload[0] = 4;
+    sendFrame(seq, RSP_ERROR, payload, 1);
+  } else if (response == "IDLE") {
+    payload[0] = 0;
+    payload[1] = MODE_OFF;
+    payload[2] = 0;
+    payload[3] = 0;
+    sendFrame(seq, RSP_STATUS, payload, 4);
+  } else if (response.startsWith("ACTIVE:")) {
+    int lastColon = response.lastIndexOf(':');
+    int index = modeIndex(response.substring(7, lastColon));
+    unsigned long remaining = response.substring(lastColon + 1).toInt();
+    if (remaining > 0xFFFF) remaining = 0xFFFF;
+    payload[0] = 1;
+    payload[1] = index < 0 ? MODE_OFF : index;
+    payload[2] = (remaining >> 8) & 0xFF;
+    payload[3] = remaining & 0xFF;
+    sendFrame(seq, RSP_STATUS, payload, 4);
+  } else if (response.startsWith("OK:STARTED:")) {
+    int lastColon = response.lastIndexOf(':');
+    int index = modeIndex(response.substring(11, lastColon));
+    payload[0] = CMD_START;
+    payload[1] = index < 0 ? MODE_OFF : index;
+    payload[2] = response.substring(lastColon + 1).toInt();
+    sendFrame(seq, RSP_OK, payload, 3);
+  } else if (response.startsWith("OK:PROGRAM:")) {
+    int lastColon = response.lastIndexOf(':');
+    unsigned long total = response.substring(lastColon + 1).toInt();
+    payload[0] = CMD_PROGRAM;
+    payload[1] = response.substring(11, lastColon).toInt();
+    payload[2] = (total >> 8) & 0xFF;
+    payload[3] = total & 0xFF;
+    sendFrame(seq, RSP_OK, payload, 4);
+  } else {
+    payload[0] = response == "OK:STOPPED" ? CMD_STOP : CMD_TEST;
+    sendFrame(seq, RSP_OK, payload, 1);
+  }
+}
+
+void sendFrame(uint8_t seq, uint8_t type, const uint8_t* payload, uint8_t len) {
+  uint8_t frame[FRAME_HEADER_SIZE + FRAME_MAX_PAYLOAD + 2];
+  frame[0] = FRAME_SYNC;
+  frame[1] = PROTOCOL_VERSION;
+  frame[2] = seq;
+  frame[3] = type;
+  frame[4] = len;
+  memcpy(frame + FRAME_HEADER_SIZE, payload, len);
+  uint16_t crc = crc16(frame + 1, FRAME_HEADER_SIZE - 1 + len);
+  frame[FRAME_HEADER_SIZE + len] = crc >> 8;
+  frame[FRAME_HEADER_SIZE + len + 1] = crc & 0xFF;
+  Serial.write(frame, FRAME_HEADER_SIZE + len + 2);  // single write keeps the frame contiguous
+}
+
+// CRC-16/CCITT-FALSE (poly 0x1021, init 0xFFFF)
+uint16_t crc16(const uint8_t* data, size_t len) {
+  uint16_t crc = 0xFFFF;
+  for (size_t i = 0; i < len; i++) {
+    crc ^= (uint16_t)data[i] << 8;
+    for (int bit = 0; bit < 8; bit++) {
+      crc = (crc & 0x8000) ? (crc << 1) ^ 0x1021 : crc << 1;
+    }
+  }
+  return crc;
+}
+
+int modeIndex(String mode) {
+  for (int i = 0; i < 3; i++) {
+    if (modes[i].name == mode) return i;
+  }
+  return -1;
+}
+
+bool isNumber(String value) {
+  if (value.length() == 0) return false;
+  for (unsigned int i = 0; i < value.length(); i++) {
+    if (!isDigit(value.charAt(i))) return false;
+  }
+  return true;
+}
+
+// Parse "MODE,SECONDS,PWM_START,PWM_END,RAMP;..." into out; returns "" or an error name
+String parseProgram(String body, Phase* out, int& count) {
+  count = 0;
+  unsigned long total = 0;
+  int start = 0;
+
+  while (start <= (int)body.length()) {
+    int end = body.indexOf(';', start);
+    if (end < 0) end = body.length();
+    String part = body.substring(start, end);
+    start = end + 1;
+
+    // MODE + 4 numeric fields
+    String fields[5];
+    int pos = 0;
+    for (int f = 0; f < 5; f++) {
+      int comma = part.indexOf(',', pos);
+      if ((f < 4) != (comma >= 0)) return "INVALID_FORMAT";
+      fields[f] = part.substring(pos, f < 4 ? comma : part.length());
+      fields[f].trim();
+      pos = comma + 1;
+      if (f > 0 && !isNumber(fields[f])) return "INVALID_FORMAT";
+    }
+
+    int index = modeIndex(fields[0]);
+    if (index < 0) return "INVALID_MODE";
+    long seconds = fields[1].toInt();
+    long pwmStart = fields[2].toInt();
+    long pwmEnd = fields[3].toInt();
+    long ramp = fields[4].toInt();
+    if (seconds <= 0 || seconds > MAX_PROGRAM_SECONDS) return "INVALID_DURATION";
+    if (ramp > min(seconds, 255L) || pwmStart > 255 || pwmEnd > 255) return "INVALID_FORMAT";
+    if (count >= MAX_PHASES) return "INVALID_FORMAT";
+
+    out[count].mode = index;
+    out[count].seconds = seconds;
+    out[count].pwmStart = pwmStart;
+    out[count].pwmEnd = pwmEnd;
+    out[count].rampSeconds = ramp;
+    count++;
+    total += seconds;
+  }
+
+  if (total > MAX_PROGRAM_SECONDS) return "INVALID_DURATION";
+  return "";
+}
+
 void processCommand(String cmd, bool isBLE) {
+  // Send response
+  sendResponse(executeCommand(cmd), isBLE);
+}
+
+// Run a text command and return its text response
+String executeCommand(String cmd) {
   cmd.trim();
   cmd.toUpperCase();
 
@@ -230,10 +521,28 @@ void processCommand(String cmd, bool isBLE) {
     stopTherapy();
     response = "OK:STOPPED";
   }
+  else if (cmd.startsWith("PROGRAM:")) {
+    // Validate into a staging buffer so a bad upload does not touch the running program
+    Phase staged[MAX_PHASES];
+    int count = 0;
+    String error = parseProgram(cmd.substring(8), staged, count);
+    if (error.length() > 0) {
+      response = "ERROR:" + error;
+      Serial.println("Invalid program: " + error);
+    } else {
+      unsigned long total = 0;
+      for (int i = 0; i < count; i++) total += staged[i].seconds;
+      startProgram(staged, count);
+      response = "OK:PROGRAM:" + String(count) + ":" + String(total);
+    }
+  }
   else if (cmd == "STATUS") {
     if (therapyActive) {
-      unsigned long elapsed = (millis() - therapyStartTime) / 1000;
-      unsigned long remaining = (therapyDuration / 1000) - elapsed;
+      // Remaining time of the whole program (current phase + phases not yet started)
+      unsigned long remaining = 0;
+      for (int i = phaseIndex; i < phaseCount; i++) remaining += program[i].seconds;
+      unsigned long elapsed = (millis() - phaseStartTime) / 1000;
+      remaining = remaining > elapsed ? remaining - elapsed : 0;
       response = "ACTIVE:" + currentMode + ":" + String(remaining);
     } else {
       response = "IDLE";
@@ -253,13 +562,21 @@ void processCommand(String cmd, bool isBLE) {
     setLEDColor(0, 0, 0);
     response = "OK:TEST_COMPLETED";
   }
+  else if (cmd.startsWith("PROTO:")) {
+    // Binary protocol negotiation: answer with the highest version both sides support
+    int requested = cmd.substring(6).toInt();
+    if (requested <= 0) {
+      response = "ERROR:INVALID_FORMAT";
+    } else {
+      response = "OK:PROTO:" + String(min(requested, PROTOCOL_VERSION));
+    }
+  }
   else {
     response = "ERROR:UNKNOWN_COMMAND";
     Serial.println("Unknown command: " + cmd);
   }
 
-  // Send response
-  sendResponse(response, isBLE);
+  return response;
 }
 
 // Send response via BLE or Serial
@@ -282,29 +599,72 @@ void startTherapy(String mode, int durationMin) {
   Serial.println(" minutes");
 
   mode.toUpperCase();
-  bool modeFound = false;
+  int index = modeIndex(mode);
 
-  // Find matching mode
-  for (int i = 0; i < 3; i++) {
-    if (modes[i].name == mode) {
-      setLEDColor(modes[i].r, modes[i].g, modes[i].b);
-      currentMode = mode;
-      therapyDuration = durationMin * 60000UL;  // Convert to milliseconds
-      therapyStartTime = millis();
-      therapyActive = true;
-      modeFound = true;
-      break;
-    }
+  if (index < 0) {
+    Serial.println("Invalid mode: " + mode);
+    return;
   }
 
-  if (!modeFound) {
-    Serial.println("Invalid mode: " + mode);
+  // Full brightness, no ramp
+  program[0].mode = index;
+  program[0].seconds = durationMin * 60;
+  program[0].pwmStart = 255;
+  program[0].pwmEnd = 255;
+  program[0].rampSeconds = 0;
+  phaseCount = 1;
+  programMode = false;
+  enterPhase(0);
+  therapyActive = true;
+}
+
+void startProgram(Phase* phases, int count) {
+  Serial.print("Starting program: ");
+  Serial.print(count);
+  Serial.println(" phases");
+
+  memcpy(program, phases, sizeof(Phase) * count);
+  phaseCount = count;
+  programMode = true;
+  enterPhase(0);
+  therapyActive = true;
+}
+
+void enterPhase(int index) {
+  Phase& phase = program[index];
+  LEDMode& mode = modes[phase.mode];
+
+  phaseIndex = index;
+  phaseStartTime = millis();
+  currentMode = mode.name;
+  currentLevel = phase.pwmStart;
+
+  if (phaseCount > 1) {
+    Serial.print("Phase ");
+    Serial.print(index + 1);
+    Serial.print("/");
+    Serial.print(phaseCount);
+    Serial.print(": ");
+    Serial.print(mode.name);
+    Serial.print(" for ");
+    Serial.print(phase.seconds);
+    Serial.println(" seconds");
   }
+  setLEDColor(mode.r * currentLevel / 255, mode.g * currentLevel / 255, mode.b * currentLevel / 255);
+}
+
+// Set phase brightness without debug output (called every loop during a ramp)
+void applyLevel(int level) {
+  if (level == currentLevel) return;
+  currentLevel = level;
+  LEDMode& mode = modes[program[phaseIndex].mode];
+  writeLED(mode.r * level / 255, mode.g * level / 255, mode.b * level / 255);
 }
 
 void stopTherapy() {
   Serial.println("Stopping therapy");
   therapyActive = false;
+  programMode = false;
   currentMode = "OFF";
   setLEDColor(0, 0, 0);
 }
@@ -312,35 +672,54 @@ void stopTherapy() {
 void updateTherapy() {
   if (!therapyActive) return;
 
-  unsigned long elapsed = millis() - therapyStartTime;
-
-  if (elapsed >= therapyDuration) {
-    Serial.println("Therapy completed!");
+  Phase& phase = program[phaseIndex];
+  unsigned long elapsed = millis() - phaseStartTime;
 
-    // Send completion notification via BLE if connected
-    BLEDevice central = BLE.central();
-    if (central && central.connected()) {
-      commandCharacteristic.writeValue("COMPLETED");
+  if (elapsed < phase.seconds * 1000UL) {
+    // Linear PWM ramp from pwmStart to pwmEnd
+    unsigned long rampMs = phase.rampSeconds * 1000UL;
+    if (elapsed < rampMs) {
+      applyLevel(phase.pwmStart + ((long)phase.pwmEnd - phase.pwmStart) * (long)elapsed / (long)rampMs);
+    } else {
+      applyLevel(phase.pwmEnd);
     }
+    return;
+  }
 
-    stopTherapy();
+  if (phaseIndex + 1 < phaseCount) {
+    enterPhase(phaseIndex + 1);
+    return;
+  }
 
-    // Blink to indicate completion
-    for (int i = 0; i < 3; i++) {
-      digitalWrite(STATUS_LED, HIGH);
-      delay(200);
-      digitalWrite(STATUS_LED, LOW);
-      delay(200);
-    }
+  Serial.println("Therapy completed!");
+
+  // Send completion notification via BLE if connected
+  BLEDevice central = BLE.central();
+  if (central && central.connected()) {
+    commandCharacteristic.writeValue("COMPLETED");
+  }
+
+  stopTherapy();
+
+  // Blink to indicate completion
+  for (int i = 0; i < 3; i++) {
+    digitalWrite(STATUS_LED, HIGH);
+    delay(200);
+    digitalWrite(STATUS_LED, LOW);
+    delay(200);
   }
 }
 
-void setLEDColor(int r, int g, int b) {
+void writeLED(int r, int g, int b) {
   // Seeed Xiao BLE Sense Plus는 공통 양극(Common Anode) RGB LED
   // PWM 값을 반전해야 함: 0 = 켜짐, 255 = 꺼짐
   analogWrite(LED_PIN_R, 255 - r);
   analogWrite(LED_PIN_G, 255 - g);
   analogWrite(LED_PIN_B, 255 - b);
+}
+
+void setLEDColor(int r, int g, int b) {
+  writeLED(r, g, b);
 
   Serial.print("LED Color set to R:");
   Serial.print(r);
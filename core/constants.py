@@ -40,10 +40,101 @@ SCORE_THRESHOLDS = {
 
 # LED 추천 파라미터
 LED_DURATION_THRESHOLDS = {
-    "high_severity": (40, 25),    # (severity, duration_minutes)
+    "high_severity": (40, 25),    # (severity, duration_minutes) - severity 초과 시 적용
     "medium_severity": (25, 20),
-    "low_severity": (0, 15)
+    "low_severity": (0, 15)       # 가장 낮은 구간은 나머지 전부 (severity 0 포함)
 }
 
+# 문제 유형 (순서 = 심각도 동점 시 우선순위)
+LED_ISSUES = ["wrinkle", "elasticity", "pigmentation", "acne", "pore"]
+
+# 부위 → 문제 유형 가중치 (부위 결함 점수 100 - score에 곱해 문제 점수에 누적)
+LED_REGION_ISSUE_WEIGHTS = {
+    "forehead": {"wrinkle": 0.3, "elasticity": 0.2},
+    "eye_l": {"wrinkle": 0.3, "elasticity": 0.2},
+    "eye_r": {"wrinkle": 0.3, "elasticity": 0.2},
+    "cheek_l": {"pore": 0.25, "pigmentation": 0.2},
+    "cheek_r": {"pore": 0.25, "pigmentation": 0.2},
+    "chin": {"acne": 0.3}
+}
+
+# 모드별 추천 사유 (문제 유형 → 모드는 LED_MODES의 target_issues)
+LED_MODE_REASONS = {
+    "red": "주름 및 탄력 개선 집중",
+    "blue": "모공 및 피지 문제 집중 케어",
+    "gold": "색소 침착 및 피부톤 개선"
+}
+
+LED_DEFAULT_REGION_SCORE = 75      # 점수가 없는 부위의 기본 점수
+LED_WEAK_REGION_SCORE = 70         # 이보다 낮은 부위는 target_regions에 포함
+LED_INTENSITY_SCALE = 1.5          # 강도 = 심각도 × scale
+LED_INTENSITY_RANGE = (50, 100)    # 강도 범위 (최소, 최대)
+LED_RESCORE_BATCH_SIZE = 500       # 히스토리 추천 재계산 배치 크기
+
 # 히스토리 조회 제한
 MAX_HISTORY_ITEMS = 20
+
+# 점수 시계열 (차트) 설정
+SERIES_DEFAULT_POINTS = 60   # 시계열당 기본 점 개수
+SERIES_MAX_POINTS = 500      # 요청 가능한 최대 점 개수
+SERIES_DEFAULT_WINDOW = 7    # 이동 평균 윈도우 (버킷 개수)
+
+# 모집단 분위수 설정
+PERCENTILE_ALL_SEGMENT = "*"     # 세그먼트 전체를 뜻하는 값
+PERCENTILE_MIN_SAMPLES = 20      # 이보다 표본이 적은 세그먼트는 상위 세그먼트로 대체
+PERCENTILE_CACHE_TTL = 300       # 룩업 테이블 메모리 캐시 유지 시간 (초)
+
+# 챗봇 대화 write-behind 설정
+CHAT_WRITE_BATCH_SIZE = 50        # 이 개수만큼 쌓이면 즉시 flush
+CHAT_WRITE_FLUSH_INTERVAL = 2.0   # 최대 flush 주기 (초)
+CHAT_WRITE_QUEUE_SIZE = 10000     # 메모리 큐 최대 크기 (초과분은 spool 파일로)
+
+# 비밀번호 해시 / 로그인 설정
+PASSWORD_HASH_WORKERS = 2          # 해시 전용 스레드 수 (추론 스레드와 CPU 경합 제한)
+PASSWORD_HASH_MAX_PENDING = 32     # 실행 + 대기 중인 해시 작업 최대 수
+PASSWORD_HASH_WAIT_TIMEOUT = 5.0   # 대기 슬롯 획득 제한 시간 (초)
+LOGIN_TRACKER_FLUSH_INTERVAL = 5.0 # last_login_at 일괄 저장 주기 (초)
+
+# 사용자 삭제 백그라운드 정리 설정
+USER_PURGE_BATCH_SIZE = 500        # 배치당 삭제할 행 수
+USER_PURGE_INTERVAL = 60.0         # 대기 중인 삭제 재확인 주기 (초)
+
+# 프로필 캐시 / 사용자 목록 설정
+PROFILE_CACHE_SIZE = 10000         # 캐시할 최대 프로필 수
+PROFILE_CACHE_TTL = 300            # 프로필 캐시 유지 시간 (초)
+USERS_PAGE_SIZE = 100              # 사용자 목록 기본 페이지 크기
+USERS_MAX_PAGE_SIZE = 1000         # 사용자 목록 최대 페이지 크기
+
+# 챗봇 응답 캐시 설정
+RESPONSE_CACHE_SIZE = 2000          # 캐시할 최대 응답 수
+RESPONSE_CACHE_TTL = 86400          # 응답 유지 시간 (초)
+RESPONSE_CACHE_SIMILARITY = 0.92    # 유사 질문으로 판단할 최소 코사인 유사도
+
+# 챗봇 분석 컨텍스트 설정
+CHAT_CONTEXT_TOP_METRICS = 3       # 컨텍스트에 포함할 상위(결함 큰) 메트릭 수
+
+# 챗봇 멀티턴 메모리 설정 (토큰 수는 근사치)
+CHAT_MEMORY_TOKEN_BUDGET = 512     # 원문 그대로 넣을 최근 대화 토큰 예산
+CHAT_MEMORY_SUMMARY_TOKENS = 256   # 누적 요약 토큰 예산 (초과 시 오래된 줄부터 제거)
+CHAT_MEMORY_SCAN_LIMIT = 50        # 한 번에 읽을 최대 대화 수
+CHAT_MEMORY_SNIPPET_CHARS = 120    # 요약에 남길 질문/답변 길이 (글자)
+
+# 디바이스 통신 설정 (USB 시리얼 / BLE)
+SERIAL_READ_TIMEOUT = 0.1          # 리더 스레드 read 대기 (초, 종료 신호 확인 주기)
+SERIAL_COMMAND_TIMEOUT = 2.0       # 명령 응답 대기 (초)
+SERIAL_COMMAND_TIMEOUTS = {        # 응답 전에 오래 실행되는 명령의 응답 대기 (초, 없으면 SERIAL_COMMAND_TIMEOUT)
+    "TEST": 6.0                    # 펌웨어 LED 테스트 약 4초 후 응답
+}
+SERIAL_READY_TIMEOUT = 3.0         # 연결 직후 디바이스 응답 대기 (초)
+SERIAL_PROBE_TIMEOUT = 0.5         # 포트 탐색 시 펌웨어 확인 응답 대기 (초)
+DEVICE_CALL_TIMEOUT = 15.0         # BLE/Mock 디바이스 호출 최대 대기 (초, 스캔은 스캔 시간에 추가)
+DEVICE_STATUS_RESYNC_INTERVAL = 5.0  # 상태 스트림의 디바이스 재조회 주기 (초)
+DEVICE_STATUS_TICK_INTERVAL = 1.0    # 남은 시간 tick 이벤트 주기 (초)
+DEVICE_STATUS_QUEUE_SIZE = 32        # 구독자별 미전송 이벤트 최대 수
+DEVICE_STATUS_KEEPALIVE = 15.0       # 이벤트가 없을 때 SSE keepalive 주기 (초)
+
+# 테라피 프로그램 설정 (다단계 시퀀스 - 디바이스가 자체 실행)
+THERAPY_RAMP_SECONDS = 60          # 단계 시작 시 목표 밝기까지 올리는 시간 (초)
+THERAPY_RAMP_START_RATIO = 0.5     # 램프 시작 밝기 (목표 밝기 대비 비율)
+THERAPY_SECONDARY_RATIO = 0.75     # 보조 단계로 추가할 문제의 최소 심각도 (주 문제 대비 비율)
+THERAPY_SECONDARY_MINUTES = 5      # 보조 단계 시간 (분)
@@ -0,0 +1,227 @@
+"""
+모델 아티팩트 다운로드 / 로컬 캐시
+
+- 소스: GCS(gs://bucket/prefix) 또는 로컬 디렉토리 (오프라인 테스트, 마운트된 볼륨)
+- 여러 파일(샤드)을 동시에 받고, 중단된 파일은 .part에서 이어받습니다.
+- 크기 + MD5(소스가 제공하는 경우)로 검증한 뒤 버전별 디렉토리에 보관하고,
+  모든 파일이 검증되면 .manifest.json을 기록합니다. 다음 시작 때는 디렉토리가
+  비어 있지 않은지가 아니라 manifest의 파일 목록/크기로 완전성을 확인합니다.
+"""
+import base64
+import hashlib
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+MANIFEST_NAME = ".manifest.json"
+CHUNK_SIZE = 8 * 1024 * 1024
+
+
+class ArtifactFile:
+    """소스의 파일 한 개"""
+
+    def __init__(self, name, size, md5=None):
+        self.name = name    # 소스 기준 상대 경로
+        self.size = size
+        self.md5 = md5      # hex 문자열 (없으면 크기만 검증)
+
+    def to_dict(self):
+        return {"name": self.name, "size": self.size, "md5": self.md5}
+
+
+class LocalDirSource:
+    """로컬 디렉토리 소스 (체크섬은 크기로만 검증)"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def list_files(self):
+        files = []
+        for root, _, names in os.walk(self.path):
+            for name in names:
+                full = os.path.join(root, name)
+                rel = os.path.relpath(full, self.path)
+                files.append(ArtifactFile(rel, os.path.getsize(full)))
+        return sorted(files, key=lambda f: f.name)
+
+    def fetch(self, name, dest, offset=0):
+        """name을 offset 바이트부터 dest 파일 객체에 기록"""
+        with open(os.path.join(self.path, name), "rb") as src:
+            src.seek(offset)
+            shutil.copyfileobj(src, dest, CHUNK_SIZE)
+
+
+class GCSSource:
+    """GCS 소스 (google-cloud-storage 클라이언트, 범위 요청으로 이어받기)"""
+
+    def __init__(self, uri):
+        from google.cloud import storage
+
+        bucket, _, prefix = uri[len("gs://"):].partition("/")
+        self.prefix = prefix.rstrip("/") + "/" if prefix else ""
+        self.bucket = storage.Client().bucket(bucket)
+
+    def list_files(self):
+        files = []
+        for blob in self.bucket.list_blobs(prefix=self.prefix):
+            if blob.name.endswith("/"):
+                continue
+            # 복합 객체는 MD5가 없으므로 크기만 검증
+            md5 = base64.b64decode(blob.md5_hash).hex() if blob.md5_hash else None
+            files.append(ArtifactFile(blob.name[len(self.prefix):], blob.size, md5))
+        return sorted(files, key=lambda f: f.name)
+
+    def fetch(self, name, dest, offset=0):
+        blob = self.bucket.blob(self.prefix + name)
+        blob.download_to_file(dest, start=offset or None)
+
+
+def make_source(uri):
+    """URI → 소스 객체 (gs://는 GCS, 그 외는 로컬 경로)"""
+    if uri.startswith("gs://"):
+        return GCSSource(uri)
+    if uri.startswith("file://"):
+        uri = uri[len("file://"):]
+    return LocalDirSource(uri)
+
+
+def _md5(path):
+    digest = hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ModelArtifactManager:
+    """
+    버전별 모델 아티팩트 캐시
+
+    Args:
+        source_uri: gs://bucket/prefix 또는 로컬 디렉토리
+        cache_dir: 로컬 캐시 루트 (버전별 하위 디렉토리 생성)
+        version: 캐시 버전 이름 (None이면 소스 파일 목록의 지문)
+        workers: 동시 다운로드 수
+        keep_versions: 보관할 완료 버전 수 (오래된 것부터 삭제)
+    """
+
+    def __init__(self, source_uri, cache_dir, version=None, workers=8, keep_versions=2):
+        self.source_uri = source_uri
+        self.cache_dir = cache_dir
+        self.version = version
+        self.workers = workers
+        self.keep_versions = keep_versions
+
+    def ensure(self):
+        """
+        완전한 로컬 모델 디렉토리 경로 반환 (필요하면 다운로드)
+
+        소스에 접근할 수 없으면 가장 최근에 완료된 로컬 버전을 사용합니다.
+        """
+        try:
+            source = make_source(self.source_uri)
+            files = source.list_files()
+        except Exception as e:
+            fallback = self._latest_complete()
+            if fallback is None:
+                raise
+            print(f"⚠️ [ARTIFACT] 소스 조회 실패, 로컬 캐시 사용 ({fallback}): {e}")
+            return fallback
+
+        if not files:
+            raise FileNotFoundError(f"모델 파일이 없습니다: {self.source_uri}")
+
+        version = self.version or self.fingerprint(files)
+        path = os.path.join(self.cache_dir, version)
+        if self.is_complete(path, files):
+            print(f"✅ [ARTIFACT] 캐시된 모델 사용: {path}")
+            return path
+
+        started = time.time()
+        print(f"--- [ARTIFACT] 다운로드 시작: {len(files)}개 파일 → {path} ---")
+        os.makedirs(path, exist_ok=True)
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            # list()로 모든 결과를 소비해 첫 실패를 그대로 전파
+            list(pool.map(lambda f: self._download(source, f, path), files))
+
+        with open(os.path.join(path, MANIFEST_NAME), "w") as fp:
+            json.dump({"source": self.source_uri, "files": [f.to_dict() for f in files]}, fp)
+        print(f"✅ [ARTIFACT] 다운로드 완료 ({time.time() - started:.1f}초)")
+
+        self._prune(keep=path)
+        return path
+
+    @staticmethod
+    def fingerprint(files):
+        """파일 이름/크기/MD5로 만든 버전 이름"""
+        digest = hashlib.sha256()
+        for f in files:
+            digest.update(f"{f.name}\0{f.size}\0{f.md5 or ''}\n".encode())
+        return digest.hexdigest()[:16]
+
+    @staticmethod
+    def is_complete(path, files=None):
+        """manifest가 있고 모든 파일이 기록된 크기로 존재하는지 확인"""
+        manifest_path = os.path.join(path, MANIFEST_NAME)
+        if not os.path.exists(manifest_path):
+            return False
+        with open(manifest_path) as f:
+            recorded = json.load(f)["files"]
+        if files is not None and sorted(r["name"] for r in recorded) != [f.name for f in files]:
+            return False
+        return all(
+            os.path.exists(os.path.join(path, r["name"]))
+            and os.path.getsize(os.path.join(path, r["name"])) == r["size"]
+            for r in recorded
+        )
+
+    @staticmethod
+    def has_safetensors(path):
+        """safetensors 샤드 포함 여부 (from_pretrained use_safetensors 판단용)"""
+        return any(name.endswith(".safetensors") for name in os.listdir(path))
+
+    def _download(self, source, artifact, root):
+        """파일 한 개 다운로드 (.part 이어받기 + 검증 후 교체)"""
+        dest = os.path.join(root, artifact.name)
+        if os.path.exists(dest) and os.path.getsize(dest) == artifact.size:
+            if artifact.md5 is None or _md5(dest) == artifact.md5:
+                return
+
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        part = dest + ".part"
+        offset = os.path.getsize(part) if os.path.exists(part) else 0
+        if offset > artifact.size:
+            offset = 0
+
+        if offset < artifact.size:
+            with open(part, "ab" if offset else "wb") as f:
+                source.fetch(artifact.name, f, offset)
+
+        size = os.path.getsize(part)
+        if size != artifact.size or (artifact.md5 is not None and _md5(part) != artifact.md5):
+            # 이어받은 앞부분이 손상되었을 수 있으므로 처음부터 다시 받도록 삭제
+            os.remove(part)
+            raise IOError(f"검증 실패: {artifact.name} ({size}/{artifact.size} bytes)")
+
+        os.replace(part, dest)
+
+    def _complete_versions(self):
+        """완료된 버전 경로 목록 (최신순)"""
+        if not os.path.isdir(self.cache_dir):
+            return []
+        paths = [os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir)]
+        paths = [p for p in paths if os.path.isdir(p) and self.is_complete(p)]
+        return sorted(paths, key=lambda p: os.path.getmtime(os.path.join(p, MANIFEST_NAME)), reverse=True)
+
+    def _latest_complete(self):
+        versions = self._complete_versions()
+        return versions[0] if versions else None
+
+    def _prune(self, keep):
+        """보관 개수를 넘는 오래된 완료 버전 삭제"""
+        others = [p for p in self._complete_versions() if p != keep]
+        for path in others[max(0, self.keep_versions - 1):]:
+            print(f"🗑️ [ARTIFACT] 오래된 모델 버전 삭제: {path}")
+            shutil.rmtree(path, ignore_errors=True)
@@ -0,0 +1,231 @@
+"""
+동시 요청 배치 스케줄러 + 요청 수용 제어
+
+/predict로 들어온 요청을 큐에 모았다가 전용 스레드에서 한 번에 generate 합니다.
+- 첫 요청 도착 후 최대 BATCH_WAIT_MS 동안, 최대 MAX_BATCH_SIZE개까지 모음
+- 이미지 유무가 다른 요청은 프롬프트 구조가 달라 별도 레인(큐)에서 배치
+- 텍스트 레인이 우선이며, 이미지 요청이 IMAGE_MAX_DEFER_MS 이상 밀리면 이미지 배치를 먼저 실행
+- 생성 중 도착한 요청은 다음 배치에 합류 (HF generate는 실행 중인 배치에 합류 불가)
+
+수용 제어:
+- 대기 요청이 max_queue_size에 도달하거나, 예상 대기 시간이 요청의 마감 시각을
+  넘으면 즉시 Overloaded (→ 503 + Retry-After)
+- 대기 중 마감 시각이 지난 요청은 실행하지 않고 DeadlineExceeded (→ 504)
+"""
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+TEXT_LANE = "text"
+IMAGE_LANE = "image"
+
+
+class Overloaded(Exception):
+    """수용 불가 (retry_after: 재시도 권장 시간, 초)"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(Exception):
+    """실행 전에 요청 마감 시각이 지남"""
+
+
+class GenerationRequest:
+    """배치 대기 중인 단일 생성 요청"""
+
+    def __init__(self, prompt, image=None, image_key=None, deadline=None):
+        self.prompt = prompt
+        self.image = image
+        self.image_key = image_key  # 이미지 특징 캐시 키
+        self.deadline = deadline    # time.monotonic() 기준 마감 시각 (None이면 무제한)
+        self.enqueued_at = time.monotonic()
+        self.future = Future()
+
+    @property
+    def lane(self):
+        return IMAGE_LANE if self.image is not None else TEXT_LANE
+
+
+class BatchScheduler:
+    """
+    요청을 모아 run_batch(requests) -> [reply, ...]를 호출하는 스케줄러
+
+    Args:
+        run_batch: GenerationRequest 리스트를 받아 같은 순서의 응답 리스트를 반환하는 함수
+        max_batch_size: 배치당 최대 요청 수
+        max_wait_ms: 첫 요청 이후 추가 요청을 기다리는 최대 시간 (ms)
+        max_queue_size: 대기 가능한 최대 요청 수 (초과 시 Overloaded)
+        image_max_defer_ms: 텍스트 우선 처리로 이미지 요청을 미룰 수 있는 최대 시간 (ms)
+    """
+
+    def __init__(self, run_batch, max_batch_size=8, max_wait_ms=20, max_queue_size=64, image_max_defer_ms=5000):
+        self.run_batch = run_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_queue_size = max_queue_size
+        self.image_max_defer = image_max_defer_ms / 1000
+        self._lanes = {TEXT_LANE: deque(), IMAGE_LANE: deque()}
+        self._cond = threading.Condition()
+        # 레인별 배치 실행 시간 이동 평균 (초, 예상 대기 시간 계산용) - 초기값은 보수적으로
+        self._batch_seconds = {TEXT_LANE: 5.0, IMAGE_LANE: 10.0}
+        self._running = None  # 실행 중인 배치의 (레인, 시작 시각)
+        self.rejected = 0
+        self.expired = 0
+        self._thread = threading.Thread(target=self._run, name="llava-batch", daemon=True)
+        self._thread.start()
+
+    def submit(self, prompt, image=None, image_key=None, deadline=None):
+        """
+        요청 등록 (concurrent.futures.Future 반환)
+
+        Raises:
+            Overloaded: 큐가 가득 찼거나 마감 시각 안에 처리할 수 없을 때
+        """
+        request = GenerationRequest(prompt, image, image_key, deadline)
+        with self._cond:
+            self._admit(request.lane, deadline)
+            self._lanes[request.lane].append(request)
+            self._cond.notify()
+        return request.future
+
+    def check_admission(self, image=False, deadline=None):
+        """스케줄러를 거치지 않는 요청(스트리밍)의 수용 여부 확인 (Overloaded 발생)"""
+        with self._cond:
+            self._admit(IMAGE_LANE if image else TEXT_LANE, deadline)
+
+    def queue_depth(self):
+        """대기 중인 요청 수"""
+        with self._cond:
+            return sum(len(lane) for lane in self._lanes.values())
+
+    def estimated_wait(self, lane=TEXT_LANE):
+        """새 요청이 해당 레인에서 응답받기까지의 예상 시간 (초)"""
+        with self._cond:
+            return self._estimated_wait(lane)
+
+    def stats(self):
+        """/health용 상태"""
+        with self._cond:
+            return {
+                "queue_depth": {name: len(lane) for name, lane in self._lanes.items()},
+                "max_queue_size": self.max_queue_size,
+                "estimated_wait_s": {
+                    name: round(self._estimated_wait(name), 2) for name in self._lanes
+                },
+                "avg_batch_s": {name: round(s, 2) for name, s in self._batch_seconds.items()},
+                "rejected": self.rejected,
+                "expired": self.expired
+            }
+
+    def _admit(self, lane, deadline):
+        """수용 판단 (self._cond 보유 상태에서 호출)"""
+        depth = sum(len(q) for q in self._lanes.values())
+        wait = self._estimated_wait(lane)
+        if depth >= self.max_queue_size:
+            self.rejected += 1
+            raise Overloaded("queue full", retry_after=wait)
+        if deadline is not None and time.monotonic() + wait > deadline:
+            self.rejected += 1
+            raise Overloaded("deadline cannot be met", retry_after=wait)
+
+    def _estimated_wait(self, lane):
+        """
+        새 요청의 응답까지 예상 시간: 앞선 배치 + 자신의 배치 수 × 레인별 평균 배치 시간
+        (self._cond 보유 상태에서 호출)
+        """
+        # 텍스트 레인이 우선이므로 텍스트 요청은 텍스트 대기열만, 이미지 요청은 둘 다 기다림
+        lanes = (TEXT_LANE,) if lane == TEXT_LANE else (TEXT_LANE, IMAGE_LANE)
+        wait = 0.0
+        for name in lanes:
+            depth = len(self._lanes[name]) + (1 if name == lane else 0)
+            wait += math.ceil(depth / self.max_batch_size) * self._batch_seconds[name]
+        if self._running is not None:
+            running_lane, started = self._running
+            wait += max(0.0, self._batch_seconds[running_lane] - (time.monotonic() - started))
+        return wait
+
+    def _next_lane(self):
+        """다음에 실행할 레인 (텍스트 우선, 오래 밀린 이미지 요청은 예외)"""
+        text, image = self._lanes[TEXT_LANE], self._lanes[IMAGE_LANE]
+        if image and (not text or time.monotonic() - image[0].enqueued_at >= self.image_max_defer):
+            return IMAGE_LANE
+        return TEXT_LANE
+
+    def _collect(self):
+        with self._cond:
+            while True:
+                while not any(self._lanes.values()):
+                    self._cond.wait()
+
+                lane = self._next_lane()
+                queue = self._lanes[lane]
+                batch = []
+                deadline = time.monotonic() + self.max_wait
+                while len(batch) < self.max_batch_size:
+                    if queue:
+                        request = queue.popleft()
+                        # RUNNING으로 전환 - 이후에는 호출자가 취소할 수 없음 (이미 취소된 요청은 버림)
+                        if request.future.set_running_or_notify_cancel():
+                            batch.append(request)
+                        continue
+                    if not batch:
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+
+                if batch:
+                    self._running = (lane, time.monotonic())
+                    return lane, batch
+
+    def _run(self):
+        while True:
+            batch = []
+            try:
+                lane, batch = self._collect()
+                now = time.monotonic()
+                live = []
+                for request in batch:
+                    if request.deadline is not None and request.deadline < now:
+                        self.expired += 1
+                        self._fail(request, DeadlineExceeded("request deadline passed while queued"))
+                    else:
+                        live.append(request)
+
+                if live:
+                    started = time.monotonic()
+                    self._execute(live)
+                    elapsed = time.monotonic() - started
+                    with self._cond:
+                        # 이동 평균 (최근 배치에 가중치 0.3)
+                        self._batch_seconds[lane] = 0.7 * self._batch_seconds[lane] + 0.3 * elapsed
+            except Exception as e:
+                # 배치 하나의 오류로 스케줄러 스레드가 멈추면 이후 요청이 모두 응답을 받지 못함
+                print(f"❌ [BATCH] 배치 처리 오류: {e}")
+                for request in batch:
+                    self._fail(request, e)
+            finally:
+                with self._cond:
+                    self._running = None
+
+    def _execute(self, group):
+        try:
+            replies = self.run_batch(group)
+        except Exception as e:
+            for request in group:
+                self._fail(request, e)
+            return
+
+        for request, reply in zip(group, replies):
+            if not request.future.done():
+                request.future.set_result(reply)
+
+    @staticmethod
+    def _fail(request, error):
+        if not request.future.done():
+            request.future.set_exception(error)
@@ -2,22 +2,72 @@ import os
 import torch
 import base64
 import io
-import subprocess
+import asyncio
+import json
+import math
+import time
+import threading
 from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
-from transformers import AutoProcessor, LlavaForConditionalGeneration, BitsAndBytesConfig
+from fastapi.responses import JSONResponse, StreamingResponse
+from transformers import (
+    AutoProcessor, LlavaForConditionalGeneration, BitsAndBytesConfig, TextIteratorStreamer, StoppingCriteriaList
+)
 from PIL import Image
+from artifacts import ModelArtifactManager
+from batching import BatchScheduler, Overloaded, DeadlineExceeded
+from speculative import AssistedDecoding
+from stopping import ResponseFormatStoppingCriteria, CancelledStoppingCriteria
+from prompt_cache import ImageFeatureCache, PrefixKVCache, build_inputs_embeds, image_key
 
 app = FastAPI()
 
 # --- [설정] ---
 BUCKET_NAME = "skincare-model-storage" 
 GCS_MODEL_PATH = f"gs://{BUCKET_NAME}/final"
-LOCAL_MODEL_PATH = "/app/model_files"
+# 모델 소스 (gs://... 또는 로컬 디렉토리) 및 버전별 로컬 캐시
+MODEL_SOURCE = os.getenv("MODEL_SOURCE", GCS_MODEL_PATH)
+MODEL_CACHE_DIR = os.getenv("MODEL_CACHE_DIR", "/app/model_files")
+MODEL_VERSION = os.getenv("MODEL_VERSION")  # 없으면 소스 파일 목록의 지문
+MODEL_DOWNLOAD_WORKERS = int(os.getenv("MODEL_DOWNLOAD_WORKERS", "8"))
 
 model = None
 processor = None
 
+# 조기 종료 설정 (후처리에서 버려질 토큰 생성 방지)
+# Flask 측 ChatbotService는 "Answer:" 이후를 버리므로 기본적으로 해당 마커에서 종료
+STOP_AT_ANSWER = os.getenv("STOP_AT_ANSWER", "1") == "1"
+WORD_BUDGET = int(os.getenv("WORD_BUDGET", "200"))  # 프롬프트 제한(150단어)에 여유분 포함, 0이면 비활성화
+
+# GPU 생성 직렬화 (배치 스케줄러와 스트리밍 요청이 동시에 generate 하지 않도록)
+# 이미지 특징 계산 후 같은 스레드에서 generate를 호출하므로 재진입 가능한 락 사용
+generation_lock = threading.RLock()
+
+# 동시 요청 배치 설정
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "8"))     # 배치당 최대 요청 수
+BATCH_WAIT_MS = int(os.getenv("BATCH_WAIT_MS", "20"))      # 배치를 모으는 최대 대기 시간 (ms)
+
+# 요청 수용 제어 설정
+MAX_QUEUE_SIZE = int(os.getenv("MAX_QUEUE_SIZE", "64"))              # 대기 가능한 최대 요청 수
+IMAGE_MAX_DEFER_MS = int(os.getenv("IMAGE_MAX_DEFER_MS", "5000"))    # 텍스트 우선 처리로 이미지 요청을 미룰 수 있는 최대 시간
+DEFAULT_REQUEST_TIMEOUT = float(os.getenv("DEFAULT_REQUEST_TIMEOUT", "300"))  # 호출자가 마감을 보내지 않을 때 (초, 0이면 무제한)
+
+# 프롬프트 prefill 캐시 설정
+IMAGE_FEATURE_CACHE_SIZE = int(os.getenv("IMAGE_FEATURE_CACHE_SIZE", "64"))  # 0이면 비활성화
+# 텍스트 전용 프롬프트를 "규칙 블록 → 질문" 순서로 바꾸고 규칙 블록의 KV 캐시를 재사용
+# (프롬프트 배치가 바뀌어 답변이 달라질 수 있으므로 기본값은 비활성화)
+PROMPT_PREFIX_CACHE = os.getenv("PROMPT_PREFIX_CACHE", "0") == "1"
+
+RULE_BLOCK = "[STRICT RULE] Your ENTIRE response must be under 150 words. Be concise.\nChain-of-Thought: (2-3 sentences max)\nAnswer: (3-4 sentences max)"
+TEXT_PROMPT_PREFIX = f"USER: {RULE_BLOCK}\n\n"
+
+image_feature_cache = ImageFeatureCache(IMAGE_FEATURE_CACHE_SIZE) if IMAGE_FEATURE_CACHE_SIZE > 0 else None
+prefix_cache = None
+
+# 추측 디코딩 설정 (draft 모델 경로가 있으면 텍스트 전용 단일 요청에 assisted generation 사용)
+DRAFT_MODEL_PATH = os.getenv("DRAFT_MODEL_PATH")    # 로컬 경로, 허브 이름 또는 gs://...
+NUM_ASSISTANT_TOKENS = int(os.getenv("NUM_ASSISTANT_TOKENS", "0"))  # 0이면 transformers 기본값
+assisted = None
+
 # A100에서는 양자화 없이 FP16으로 직접 로드 (더 빠름)
 # 4비트 양자화는 VRAM이 부족한 경우에만 사용
 USE_QUANTIZATION = False  # A100은 VRAM 충분하므로 False
@@ -32,43 +82,47 @@ if USE_QUANTIZATION:
 else:
     bnb_config = None
 
-def download_model_from_gcs():
-    if not os.path.exists(LOCAL_MODEL_PATH) or not os.listdir(LOCAL_MODEL_PATH):
-        print(f"--- [GCS] 모델 다운로드 시작 ---")
-        os.makedirs(LOCAL_MODEL_PATH, exist_ok=True)
-        try:
-            subprocess.run(["gsutil", "-m", "cp", "-r", f"{GCS_MODEL_PATH}/*", LOCAL_MODEL_PATH], check=True)
-            print("✅ [GCS] 다운로드 완료")
-        except Exception as e:
-            print(f"❌ [GCS] 다운로드 실패: {e}")
-            raise e
+def download_model():
+    """모델 아티팩트를 로컬 캐시에 준비하고 경로 반환"""
+    manager = ModelArtifactManager(
+        MODEL_SOURCE, MODEL_CACHE_DIR, version=MODEL_VERSION, workers=MODEL_DOWNLOAD_WORKERS
+    )
+    try:
+        return manager.ensure()
+    except Exception as e:
+        print(f"❌ [ARTIFACT] 모델 준비 실패: {e}")
+        raise e
 
 @app.on_event("startup")
 async def load_model():
-    global model, processor
+    global model, processor, prefix_cache, assisted
     try:
-        download_model_from_gcs()
-        
+        model_path = download_model()
+        # safetensors 샤드는 mmap으로 필요할 때 읽으므로 .bin(pickle) 대신 우선 사용
+        use_safetensors = ModelArtifactManager.has_safetensors(model_path)
+
         print("--- [LOAD] 모델 및 프로세서 로딩 중 ---")
         # 1. 토큰 깨짐 방지를 위해 use_fast=False 및 trust_remote_code=True 설정
-        processor = AutoProcessor.from_pretrained(LOCAL_MODEL_PATH, use_fast=False, trust_remote_code=True)
+        processor = AutoProcessor.from_pretrained(model_path, use_fast=False, trust_remote_code=True)
         
         # 양자화 여부에 따라 모델 로드 방식 변경
         if bnb_config:
             model = LlavaForConditionalGeneration.from_pretrained(
-                LOCAL_MODEL_PATH,
+                model_path,
                 quantization_config=bnb_config,
                 device_map="auto",
                 low_cpu_mem_usage=True,
+                use_safetensors=use_safetensors or None,
                 trust_remote_code=True
             )
         else:
             # A100: FP16 + SDPA로 최대 속도 (양자화 없음, PyTorch 2.0 내장)
             model = LlavaForConditionalGeneration.from_pretrained(
-                LOCAL_MODEL_PATH,
+                model_path,
                 torch_dtype=torch.float16,
                 device_map="auto",
                 low_cpu_mem_usage=True,
+                use_safetensors=use_safetensors or None,
                 trust_remote_code=True,
                 attn_implementation="sdpa"  # PyTorch 2.0 내장 SDPA
             )
@@ -81,16 +135,245 @@ async def load_model():
         
         model.config.pad_token_id = processor.tokenizer.pad_token_id
         model.eval()
+
+        if PROMPT_PREFIX_CACHE:
+            prefix_cache = PrefixKVCache(model, processor.tokenizer, TEXT_PROMPT_PREFIX)
+            print(f"✅ 프롬프트 prefix KV 캐시 준비 ({prefix_cache.prefix_ids.shape[1]} 토큰)")
+
+        if DRAFT_MODEL_PATH:
+            load_draft_model()
         print("✅ [SUCCESS] 모델 로드 및 토크나이저 보정 완료!")
     except Exception as e:
         print(f"❌ [ERROR] 로드 실패: {e}")
 
+def load_draft_model():
+    """draft 모델 로드 (실패해도 본 모델 서비스는 계속)"""
+    global assisted
+    try:
+        draft_path = DRAFT_MODEL_PATH
+        if draft_path.startswith("gs://"):
+            draft_path = ModelArtifactManager(
+                draft_path, os.path.join(MODEL_CACHE_DIR, "draft"), workers=MODEL_DOWNLOAD_WORKERS
+            ).ensure()
+        assisted = AssistedDecoding(
+            model, draft_path, processor.tokenizer.vocab_size,
+            device=model.device, dtype=torch.float16, num_assistant_tokens=NUM_ASSISTANT_TOKENS or None
+        )
+        print(f"✅ 추측 디코딩 draft 모델 로드: {DRAFT_MODEL_PATH}")
+    except Exception as e:
+        print(f"⚠️ draft 모델 로드 실패, 일반 생성 사용: {e}")
+
+
 @app.get("/health")
 async def health():
     if model is not None:
-        return {"status": "healthy"}
+        caches = {"prefix_hits": prefix_cache.hits if prefix_cache else None}
+        if image_feature_cache is not None:
+            caches["image_features"] = image_feature_cache.stats()
+        return {
+            "status": "healthy",
+            "scheduler": scheduler.stats(),
+            "caches": caches,
+            "assisted": assisted.stats() if assisted else None
+        }
     return JSONResponse(content={"status": "loading"}, status_code=503)
 
+def extract_question(prompt):
+    """
+    이미 USER/ASSISTANT 템플릿으로 감싸진 프롬프트에서 질문만 추출
+
+    Flask 측 ChatbotService가 같은 템플릿을 입혀 보내므로 그대로 감싸면
+    규칙 블록이 두 번 들어가 prefill 토큰이 불필요하게 늘어납니다.
+    """
+    text = prompt.strip()
+    if not (text.startswith("USER:") and text.endswith("ASSISTANT:")):
+        return text
+
+    text = text[len("USER:"):-len("ASSISTANT:")].strip()
+    if text.startswith("<image>"):
+        text = text[len("<image>"):].strip()
+    if "[STRICT RULE]" in text:
+        text = text.split("[STRICT RULE]")[0].strip()
+    return text
+
+
+def build_prompt(question, has_image):
+    """CoT 구조 프롬프트 구성 (이미지가 있을 때만 <image> 태그 포함)"""
+    question = extract_question(question)
+    if PROMPT_PREFIX_CACHE and not has_image:
+        # 고정 규칙 블록을 앞에 두어 모든 텍스트 요청이 같은 prefix를 공유
+        return f"{TEXT_PROMPT_PREFIX}{question}\nASSISTANT:"
+    image_tag = "<image>\n" if has_image else ""
+    return f"USER: {image_tag}{question}\n\n{RULE_BLOCK}\nASSISTANT:"
+
+
+def clean_reply(full_text):
+    """생성 결과에서 답변만 추출하고 반복 문단 제거"""
+    # 답변만 추출
+    if "ASSISTANT:" in full_text:
+        reply = full_text.split("ASSISTANT:")[-1].strip()
+    else:
+        reply = full_text
+
+    # 조기 종료로 끝에 남은 "Answer:" 마커 제거
+    if reply.rstrip().endswith("Answer:"):
+        reply = reply.rstrip()[:-len("Answer:")].rstrip()
+
+    # 후처리: 반복 답변 제거 (첫 번째 완성된 답변만 사용)
+    # \n\n 이후 반복되는 내용 제거
+    if "\n\n" in reply:
+        parts = reply.split("\n\n")
+        # 첫 번째 부분만 사용 (또는 Chain-of-Thought + Answer까지)
+        clean_reply = parts[0]
+        # Answer 부분이 있으면 포함
+        for i, part in enumerate(parts[1:], 1):
+            if part.strip().startswith("Answer:") or part.strip().startswith("Chain-of-Thought:"):
+                clean_reply += "\n\n" + part
+            elif i == 1 and not parts[0].strip().endswith(("다.", "요.", "습니다.", "세요.", "니다.")):
+                # 첫 번째 부분이 문장으로 안 끝나면 두 번째도 포함
+                clean_reply += "\n\n" + part
+            else:
+                break
+        reply = clean_reply.strip()
+
+    return reply
+
+
+def prepare_inputs(prompts, images):
+    """프롬프트/이미지를 모델 입력 텐서로 변환"""
+    if images:
+        return processor(text=prompts, images=images, padding=True, return_tensors="pt").to("cuda")
+    return processor(text=prompts, padding=True, return_tensors="pt").to("cuda")
+
+
+def build_stopping_criteria(prompt_length, cancel_event=None):
+    """응답 형식 기반 조기 종료 조건 생성 (cancel_event가 set되면 즉시 종료)"""
+    criteria = StoppingCriteriaList([
+        ResponseFormatStoppingCriteria(
+            processor.tokenizer,
+            prompt_length,
+            stop_markers=("Answer:",) if STOP_AT_ANSWER else (),
+            word_budget=WORD_BUDGET or None
+        )
+    ])
+    if cancel_event is not None:
+        criteria.append(CancelledStoppingCriteria(cancel_event))
+    return criteria
+
+
+def generate(prompt_length, cancel_event=None, **inputs):
+    """
+    공통 생성 파라미터로 model.generate 실행
+
+    Args:
+        prompt_length: 출력에 포함되는 프롬프트 토큰 길이
+        cancel_event: set되면 생성을 중단하는 threading.Event (스트리밍 연결 종료)
+        **inputs: model.generate 입력 (input_ids/inputs_embeds, attention_mask, streamer 등)
+    """
+    inputs.setdefault("stopping_criteria", build_stopping_criteria(prompt_length, cancel_event))
+    with generation_lock, torch.no_grad():
+        # 4. [생성 파라미터 보정] 환각 방지 + 반복 방지 균형
+        return model.generate(
+            max_new_tokens=1024,  # 적절한 길이
+            do_sample=False,  # Greedy decoding으로 환각 방지
+            repetition_penalty=1.1,  # 적당한 반복 방지
+            pad_token_id=processor.tokenizer.pad_token_id,
+            eos_token_id=processor.tokenizer.eos_token_id,
+            **inputs
+        )
+
+
+def generate_texts(prompts, images=(), image_keys=(), streamer=None, cancel_event=None):
+    """
+    프롬프트 목록 생성 → 디코딩된 텍스트 리스트
+
+    - 이미지: 캐시된 비전 특징으로 inputs_embeds를 만들어 비전 타워 재실행 생략
+    - 텍스트 단일 시퀀스: draft 모델이 있으면 추측 디코딩, 없으면 공유 prefix의 KV 캐시를
+      넘겨 prefix prefill 생략
+    캐시 경로가 실패하면 기본 경로로 처리합니다.
+    """
+    inputs = prepare_inputs(prompts, list(images))
+    extra = {"streamer": streamer} if streamer is not None else {}
+    if cancel_event is not None:
+        extra["cancel_event"] = cancel_event
+
+    if images and image_feature_cache is not None:
+        try:
+            with generation_lock, torch.no_grad():
+                features = image_feature_cache.features(model, inputs["pixel_values"], list(image_keys))
+                inputs_embeds = build_inputs_embeds(model, inputs["input_ids"], features)
+        except Exception as e:
+            print(f"⚠️ 이미지 특징 캐시 경로 실패, 기본 경로로 처리: {e}")
+        else:
+            # input_ids도 함께 넘겨 repetition_penalty가 기본 경로와 같이 프롬프트 토큰을 보도록 함
+            # (첫 스텝만 inputs_embeds 사용, 출력에는 기본 경로와 같이 프롬프트가 포함됨)
+            output = generate(
+                inputs["input_ids"].shape[1],
+                input_ids=inputs["input_ids"],
+                inputs_embeds=inputs_embeds,
+                attention_mask=inputs["attention_mask"],
+                **extra
+            )
+            return processor.batch_decode(output, skip_special_tokens=True)
+
+    if assisted is not None and AssistedDecoding.applies(inputs["input_ids"], bool(images)):
+        # 락 안에서 실행해야 forward 카운터(채택률 통계)에 다른 생성이 섞이지 않음
+        with generation_lock:
+            output = assisted.generate(generate, inputs["input_ids"].shape[1], **inputs, **extra)
+        return processor.batch_decode(output, skip_special_tokens=True)
+
+    if prefix_cache is not None and not images and prefix_cache.matches(inputs["input_ids"]):
+        extra["past_key_values"] = prefix_cache.copy()
+
+    output = generate(inputs["input_ids"].shape[1], **inputs, **extra)
+    return processor.batch_decode(output, skip_special_tokens=True)
+
+
+def run_batch(requests):
+    """
+    같은 종류(이미지 유무)의 요청들을 한 번의 generate로 처리
+
+    padding_side="left"이므로 배치 내 프롬프트 길이가 달라도 생성 위치가 맞춰짐
+    """
+    prompts = [build_prompt(r.prompt, r.image is not None) for r in requests]
+    images = [r.image for r in requests if r.image is not None]
+    image_keys = [r.image_key for r in requests if r.image is not None]
+
+    full_texts = generate_texts(prompts, images, image_keys)
+    return [clean_reply(text) for text in full_texts]
+
+
+# 동시 요청 배치 스케줄러 (generate는 전용 스레드에서 실행 → 이벤트 루프 비차단)
+scheduler = BatchScheduler(
+    run_batch,
+    max_batch_size=MAX_BATCH_SIZE,
+    max_wait_ms=BATCH_WAIT_MS,
+    max_queue_size=MAX_QUEUE_SIZE,
+    image_max_defer_ms=IMAGE_MAX_DEFER_MS
+)
+
+
+def request_deadline(request, body):
+    """
+    호출자가 보낸 남은 시간으로 마감 시각(time.monotonic 기준) 계산
+
+    X-Request-Timeout 헤더(초) 또는 body의 parameters.timeout(Vertex AI predict의 parameters)을
+    사용하고, 둘 다 없으면 DEFAULT_REQUEST_TIMEOUT을 사용합니다.
+    """
+    timeout = request.headers.get("X-Request-Timeout") or (body.get("parameters") or {}).get("timeout")
+    timeout = float(timeout) if timeout else DEFAULT_REQUEST_TIMEOUT
+    return time.monotonic() + timeout if timeout > 0 else None
+
+
+def overloaded_response(e):
+    """수용 불가 응답 (503 + Retry-After)"""
+    return JSONResponse(
+        content={"error": f"Server overloaded: {e}", "retry_after": round(e.retry_after, 1)},
+        status_code=503,
+        headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))}
+    )
+
+
 @app.post("/predict")
 async def predict(request: Request):
     if model is None:
@@ -99,62 +382,120 @@ async def predict(request: Request):
     try:
         body = await request.json()
         instances = body.get("instances", [])
-        results = []
-        
+        deadline = request_deadline(request, body)
+
+        futures = []
         for instance in instances:
             question = instance.get("prompt", "")
             image_base64 = instance.get("image")
 
-            # 3. [프롬프트 최적화] 불필요한 공백 제거 및 CoT 구조 적용
-            # 이미지 유무에 따라 <image> 태그 조건부 적용
+            image = None
             if image_base64:
-                formatted_prompt = f"USER: <image>\n{question.strip()}\n\n[STRICT RULE] Your ENTIRE response must be under 150 words. Be concise.\nChain-of-Thought: (2-3 sentences max)\nAnswer: (3-4 sentences max)\nASSISTANT:"
                 image = Image.open(io.BytesIO(base64.b64decode(image_base64))).convert("RGB")
-                inputs = processor(text=formatted_prompt, images=image, return_tensors="pt").to("cuda")
-            else:
-                formatted_prompt = f"USER: {question.strip()}\n\n[STRICT RULE] Your ENTIRE response must be under 150 words. Be concise.\nChain-of-Thought: (2-3 sentences max)\nAnswer: (3-4 sentences max)\nASSISTANT:"
-                inputs = processor(text=formatted_prompt, return_tensors="pt").to("cuda")
-
-            with torch.no_grad():
-                # 4. [생성 파라미터 보정] 환각 방지 + 반복 방지 균형
-                output = model.generate(
-                    **inputs,
-                    max_new_tokens=1024,  # 적절한 길이
-                    do_sample=False,  # Greedy decoding으로 환각 방지
-                    repetition_penalty=1.1,  # 적당한 반복 방지
-                    pad_token_id=processor.tokenizer.pad_token_id,
-                    eos_token_id=processor.tokenizer.eos_token_id
-                )
-            
-            full_text = processor.decode(output[0], skip_special_tokens=True)
-
-            # 답변만 추출
-            if "ASSISTANT:" in full_text:
-                reply = full_text.split("ASSISTANT:")[-1].strip()
-            else:
-                reply = full_text
-
-            # 후처리: 반복 답변 제거 (첫 번째 완성된 답변만 사용)
-            # \n\n 이후 반복되는 내용 제거
-            if "\n\n" in reply:
-                parts = reply.split("\n\n")
-                # 첫 번째 부분만 사용 (또는 Chain-of-Thought + Answer까지)
-                clean_reply = parts[0]
-                # Answer 부분이 있으면 포함
-                for i, part in enumerate(parts[1:], 1):
-                    if part.strip().startswith("Answer:") or part.strip().startswith("Chain-of-Thought:"):
-                        clean_reply += "\n\n" + part
-                    elif i == 1 and not parts[0].strip().endswith(("다.", "요.", "습니다.", "세요.", "니다.")):
-                        # 첫 번째 부분이 문장으로 안 끝나면 두 번째도 포함
-                        clean_reply += "\n\n" + part
-                    else:
-                        break
-                reply = clean_reply.strip()
-
-            results.append(reply)
-            
-        return {"predictions": results}
 
+            try:
+                futures.append(scheduler.submit(
+                    question, image, image_key(image_base64) if image else None, deadline=deadline
+                ))
+            except Overloaded:
+                # 먼저 등록한 인스턴스는 실행하지 않도록 취소
+                for f in futures:
+                    f.cancel()
+                raise
+
+        # 다른 요청과 함께 배치 처리된 결과를 기다림 (마감 시각이 지나면 대기 중인 요청 취소)
+        waiter = asyncio.gather(*(asyncio.wrap_future(f) for f in futures))
+        timeout = deadline - time.monotonic() if deadline is not None else None
+        results = await asyncio.wait_for(waiter, timeout=timeout)
+        return {"predictions": list(results)}
+
+    except Overloaded as e:
+        return overloaded_response(e)
+    except (DeadlineExceeded, asyncio.TimeoutError) as e:
+        print(f"⏱️ 요청 마감 초과: {e}")
+        return JSONResponse(content={"error": "Request deadline exceeded"}, status_code=504)
     except Exception as e:
         print(f"❌ 추론 오류: {e}")
-        return JSONResponse(content={"error": str(e)}, status_code=500)
\ No newline at end of file
+        return JSONResponse(content={"error": str(e)}, status_code=500)
+
+
+def sse(data, event=None):
+    """SSE 메시지 직렬화"""
+    message = f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+    return f"event: {event}\n{message}" if event else message
+
+
+@app.post("/predict/stream")
+async def predict_stream(request: Request):
+    """
+    단일 요청 토큰 스트리밍 (SSE)
+
+    data: {"token": "..."} 를 생성되는 대로 보내고,
+    마지막에 event: done / data: {"reply": 후처리된 답변} 을 보냅니다.
+    """
+    if model is None:
+        return JSONResponse(content={"error": "Model not ready"}, status_code=503)
+
+    try:
+        body = await request.json()
+        instance = (body.get("instances") or [{}])[0]
+        question = instance.get("prompt", "")
+        image_base64 = instance.get("image")
+
+        image = None
+        if image_base64:
+            image = Image.open(io.BytesIO(base64.b64decode(image_base64))).convert("RGB")
+
+        prompt = build_prompt(question, image is not None)
+        images = [image] if image else []
+        image_keys = [image_key(image_base64)] if image else []
+
+        # 스트리밍은 배치 스케줄러를 거치지 않지만 같은 GPU를 쓰므로 같은 기준으로 수용 판단
+        scheduler.check_admission(image=image is not None, deadline=request_deadline(request, body))
+    except Overloaded as e:
+        return overloaded_response(e)
+    except Exception as e:
+        print(f"❌ 스트리밍 요청 오류: {e}")
+        return JSONResponse(content={"error": str(e)}, status_code=400)
+
+    streamer = TextIteratorStreamer(processor.tokenizer, skip_prompt=True, skip_special_tokens=True)
+    # 클라이언트 연결이 끊기면 set → 다음 토큰에서 생성 중단 (generation_lock 조기 반환)
+    cancelled = threading.Event()
+    errors = []
+
+    def run():
+        try:
+            generate_texts([prompt], images, image_keys, streamer=streamer, cancel_event=cancelled)
+        except Exception as e:
+            errors.append(e)
+            streamer.end()
+
+    threading.Thread(target=run, name="llava-stream", daemon=True).start()
+
+    async def events():
+        loop = asyncio.get_running_loop()
+        chunks = []
+        tokens = iter(streamer)
+        try:
+            while True:
+                # streamer는 블로킹 큐이므로 스레드 풀에서 대기
+                token = await loop.run_in_executor(None, next, tokens, None)
+                if token is None:
+                    break
+                if await request.is_disconnected():
+                    print("⚠️ 스트리밍 클라이언트 연결 종료, 생성 중단")
+                    return
+                if token:
+                    chunks.append(token)
+                    yield sse({"token": token})
+
+            if errors:
+                print(f"❌ 스트리밍 추론 오류: {errors[0]}")
+                yield sse({"error": str(errors[0])}, event="error")
+            else:
+                yield sse({"reply": clean_reply("".join(chunks))}, event="done")
+        finally:
+            # 연결 종료로 제너레이터가 닫힌 경우 포함 - 남은 생성 중단
+            cancelled.set()
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
@@ -0,0 +1,129 @@
+"""
+프롬프트 prefill 캐시
+
+- ImageFeatureCache: 같은 이미지의 비전 타워 + 프로젝터 출력 재사용
+- PrefixKVCache: 모든 요청이 공유하는 고정 프롬프트 앞부분의 KV 캐시 재사용
+"""
+import copy
+import hashlib
+import threading
+from collections import OrderedDict
+
+import torch
+
+
+def image_key(image_base64):
+    """이미지 캐시 키 (base64 문자열 해시)"""
+    return hashlib.sha256(image_base64.encode("ascii")).hexdigest()
+
+
+class ImageFeatureCache:
+    """
+    이미지별 투영된 비전 특징(LRU)
+
+    Args:
+        maxsize: 캐시할 최대 이미지 수
+    """
+
+    def __init__(self, maxsize=64):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def features(self, model, pixel_values, keys):
+        """
+        이미지별 특징 반환 (캐시에 없는 이미지만 비전 타워 실행)
+
+        Args:
+            model: LlavaForConditionalGeneration
+            pixel_values: (이미지 수, C, H, W)
+            keys: 이미지별 캐시 키 (None이면 캐시하지 않음)
+
+        Returns:
+            list: 이미지별 (패치 수, hidden) 텐서
+        """
+        found = {}
+        with self._lock:
+            for i, key in enumerate(keys):
+                if key is not None and key in self._data:
+                    self._data.move_to_end(key)
+                    found[i] = self._data[key]
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+
+        missing = [i for i in range(len(keys)) if i not in found]
+        if missing:
+            computed = model.get_image_features(
+                pixel_values=pixel_values[missing],
+                vision_feature_layer=model.config.vision_feature_layer,
+                vision_feature_select_strategy=model.config.vision_feature_select_strategy
+            )
+            with self._lock:
+                for i, feature in zip(missing, computed):
+                    found[i] = feature
+                    if keys[i] is not None:
+                        self._data[keys[i]] = feature
+                        self._data.move_to_end(keys[i])
+                while len(self._data) > self.maxsize:
+                    self._data.popitem(last=False)
+
+        return [found[i] for i in range(len(keys))]
+
+    def stats(self):
+        """캐시 적중 통계"""
+        with self._lock:
+            return {"size": len(self._data), "hits": self.hits, "misses": self.misses}
+
+
+def build_inputs_embeds(model, input_ids, image_features):
+    """
+    이미지 토큰 위치를 (캐시된) 이미지 특징으로 채운 inputs_embeds 생성
+
+    프로세서가 <image>를 패치 수만큼 확장하는 transformers 버전에서만 동작하며,
+    토큰 수가 맞지 않으면 ValueError를 발생시켜 호출자가 기본 경로로 돌아가게 합니다.
+    """
+    image_token_id = getattr(model.config, "image_token_index", None)
+    if image_token_id is None:
+        image_token_id = model.config.image_token_id
+
+    embeds = model.get_input_embeddings()(input_ids)
+    mask = input_ids == image_token_id
+    features = torch.cat([f.reshape(-1, f.shape[-1]) for f in image_features]).to(embeds.device, embeds.dtype)
+    if int(mask.sum()) != features.shape[0]:
+        raise ValueError("image token count does not match image features")
+
+    embeds[mask] = features
+    return embeds
+
+
+class PrefixKVCache:
+    """
+    고정 프롬프트 앞부분(prefix)의 KV 캐시
+
+    prefix 토큰으로 한 번 forward 해 둔 past_key_values를 요청마다 복사해
+    generate에 넘기면 prefix 구간의 prefill을 건너뜁니다. 단일 시퀀스
+    (left padding이 없는 경우)에만 적용됩니다.
+    """
+
+    def __init__(self, model, tokenizer, prefix_text, device="cuda"):
+        self.prefix_ids = tokenizer(prefix_text, return_tensors="pt").input_ids.to(device)
+        with torch.no_grad():
+            output = model(input_ids=self.prefix_ids, use_cache=True)
+        self._cache = output.past_key_values
+        self.hits = 0
+
+    def matches(self, input_ids):
+        """input_ids가 prefix로 시작하는 단일 시퀀스인지 확인"""
+        length = self.prefix_ids.shape[1]
+        return (
+            input_ids.shape[0] == 1
+            and input_ids.shape[1] > length
+            and torch.equal(input_ids[:, :length], self.prefix_ids)
+        )
+
+    def copy(self):
+        """generate가 수정할 수 있도록 KV 캐시 사본 반환"""
+        self.hits += 1
+        return copy.deepcopy(self._cache)
@@ -0,0 +1,127 @@
+"""
+보조 모델 기반 추측 디코딩 (assisted generation)
+
+작은 draft 모델이 여러 토큰을 미리 제안하고 LLaVA 언어 모델이 한 번의 forward로
+검증합니다. greedy(do_sample=False)에서는 출력이 일반 생성과 동일하고,
+제안이 많이 채택될수록 토큰당 지연이 줄어듭니다.
+
+- draft 모델은 텍스트만 보므로 텍스트 전용 단일 시퀀스에만 적용
+- draft 모델은 같은 토크나이저(어휘)를 써야 함
+
+CPU에서 작은 모델로 확인:
+    python speculative.py --target <큰 모델> --draft <작은 모델> --prompt "..."
+"""
+import time
+
+import torch
+from transformers import AutoModelForCausalLM
+
+
+class AssistedDecoding:
+    """
+    draft 모델과 채택률 통계
+
+    Args:
+        target: 검증할 본 모델 (forward 호출 수로 검증 단계를 셉니다)
+        draft_path: draft 모델 경로 또는 허브 이름
+        vocab_size: 본 모델 토크나이저의 기본 어휘 크기 (draft가 포함하지 못하면 ValueError)
+        device: draft 모델 디바이스
+        dtype: draft 모델 dtype
+        num_assistant_tokens: 한 번에 제안할 토큰 수 (None이면 transformers 기본 휴리스틱)
+    """
+
+    def __init__(self, target, draft_path, vocab_size, device="cuda", dtype=torch.float16, num_assistant_tokens=None):
+        self.model = AutoModelForCausalLM.from_pretrained(draft_path, torch_dtype=dtype).to(device).eval()
+        if self.model.config.vocab_size < vocab_size:
+            raise ValueError(
+                f"draft vocab ({self.model.config.vocab_size}) does not cover target tokenizer ({vocab_size})"
+            )
+        if num_assistant_tokens:
+            self.model.generation_config.num_assistant_tokens = num_assistant_tokens
+
+        self._target_calls = 0
+        self._draft_calls = 0
+        target.register_forward_hook(self._count_target)
+        self.model.register_forward_hook(self._count_draft)
+
+        self.requests = 0
+        self.new_tokens = 0
+        self.verify_steps = 0
+        self.drafted = 0
+        self.seconds = 0.0
+
+    def _count_target(self, module, args, output):
+        self._target_calls += 1
+
+    def _count_draft(self, module, args, output):
+        self._draft_calls += 1
+
+    @staticmethod
+    def applies(input_ids, has_image):
+        """적용 가능 여부 (텍스트 전용 단일 시퀀스)"""
+        return not has_image and input_ids.shape[0] == 1
+
+    def generate(self, generate_fn, prompt_length, **inputs):
+        """
+        assistant_model을 붙여 generate_fn 실행 후 통계 갱신
+
+        generate_fn은 GPU 생성 락 안에서 실행되므로 forward 카운터를 그대로 사용합니다.
+        """
+        target_before, draft_before = self._target_calls, self._draft_calls
+        started = time.perf_counter()
+        output = generate_fn(prompt_length, assistant_model=self.model, **inputs)
+
+        self.requests += 1
+        self.seconds += time.perf_counter() - started
+        self.new_tokens += output.shape[1] - prompt_length
+        self.verify_steps += self._target_calls - target_before
+        self.drafted += self._draft_calls - draft_before
+        return output
+
+    def stats(self):
+        """
+        채택률 통계
+
+        검증 단계마다 본 모델이 토큰 1개를 직접 만들고 나머지는 채택된 제안이므로
+        채택 토큰 = 새 토큰 - 검증 단계, 채택률 = 채택 토큰 / 제안 토큰 (근사치)
+        """
+        accepted = max(0, self.new_tokens - self.verify_steps)
+        return {
+            "requests": self.requests,
+            "new_tokens": self.new_tokens,
+            "verify_steps": self.verify_steps,
+            "drafted_tokens": self.drafted,
+            "acceptance_rate": round(accepted / self.drafted, 3) if self.drafted else None,
+            "tokens_per_step": round(self.new_tokens / self.verify_steps, 2) if self.verify_steps else None,
+            "ms_per_token": round(self.seconds * 1000 / self.new_tokens, 1) if self.new_tokens else None
+        }
+
+
+if __name__ == "__main__":
+    import argparse
+    from transformers import AutoTokenizer
+
+    parser = argparse.ArgumentParser(description="assisted generation 출력 일치 / 속도 확인 (CPU)")
+    parser.add_argument("--target", required=True)
+    parser.add_argument("--draft", required=True)
+    parser.add_argument("--prompt", default="USER: How can I reduce the size of my pores?\nASSISTANT:")
+    parser.add_argument("--max-new-tokens", type=int, default=64)
+    args = parser.parse_args()
+
+    tokenizer = AutoTokenizer.from_pretrained(args.target)
+    target = AutoModelForCausalLM.from_pretrained(args.target, torch_dtype=torch.float32).eval()
+    assisted = AssistedDecoding(target, args.draft, tokenizer.vocab_size, device="cpu", dtype=torch.float32)
+    inputs = tokenizer(args.prompt, return_tensors="pt")
+
+    def run(prompt_length, **kwargs):
+        with torch.no_grad():
+            return target.generate(**inputs, max_new_tokens=args.max_new_tokens, do_sample=False, **kwargs)
+
+    started = time.perf_counter()
+    baseline = run(inputs["input_ids"].shape[1])
+    baseline_seconds = time.perf_counter() - started
+    output = assisted.generate(run, inputs["input_ids"].shape[1])
+
+    print(f"identical output: {torch.equal(baseline, output)}")
+    print(f"baseline: {baseline_seconds * 1000 / (baseline.shape[1] - inputs['input_ids'].shape[1]):.1f} ms/token")
+    print(f"assisted: {assisted.stats()}")
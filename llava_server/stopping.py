@@ -0,0 +1,77 @@
+"""
+응답 형식 기반 조기 종료 조건
+
+프롬프트가 강제하는 형식(150단어 이내, Chain-of-Thought → Answer)을 이용해
+어차피 후처리에서 버려질 토큰을 생성하지 않도록 시퀀스별로 생성을 멈춥니다.
+"""
+import re
+
+import torch
+from transformers import StoppingCriteria
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+class ResponseFormatStoppingCriteria(StoppingCriteria):
+    """
+    시퀀스별 조기 종료 판단
+
+    - stop_markers: 생성 텍스트에 마커(예: "Answer:")가 나타나면 종료
+    - 반복 문단: 완성된 문단(\\n\\n로 끝난)이 이전 문단과 같으면 종료
+    - word_budget: 단어 수가 예산을 넘으면 종료
+
+    Args:
+        tokenizer: 디코딩용 토크나이저
+        prompt_length: 프롬프트 토큰 길이 (left padding이므로 배치 공통)
+        stop_markers: 종료 마커 목록
+        word_budget: 최대 단어 수 (None이면 비활성화)
+    """
+
+    def __init__(self, tokenizer, prompt_length, stop_markers=("Answer:",), word_budget=None):
+        self.tokenizer = tokenizer
+        self.prompt_length = prompt_length
+        self.stop_markers = tuple(stop_markers)
+        self.word_budget = word_budget
+        self._done = None
+
+    def __call__(self, input_ids, scores, **kwargs):
+        if self._done is None:
+            self._done = torch.zeros(input_ids.shape[0], dtype=torch.bool, device=input_ids.device)
+
+        generated = input_ids[:, self.prompt_length:]
+        for i in range(generated.shape[0]):
+            if self._done[i]:
+                continue
+            text = self.tokenizer.decode(generated[i], skip_special_tokens=True)
+            if self.should_stop(text):
+                self._done[i] = True
+
+        return self._done.clone()
+
+    def should_stop(self, text):
+        """생성된 텍스트가 종료 조건을 만족하는지 확인"""
+        if any(marker in text for marker in self.stop_markers):
+            return True
+
+        if self.word_budget is not None and len(text.split()) > self.word_budget:
+            return True
+
+        # 마지막 조각은 아직 작성 중이므로 완성된 문단만 비교
+        paragraphs = [_WHITESPACE.sub(" ", p).strip() for p in text.split("\n\n")[:-1]]
+        paragraphs = [p for p in paragraphs if p]
+        return len(paragraphs) != len(set(paragraphs))
+
+
+class CancelledStoppingCriteria(StoppingCriteria):
+    """
+    외부 취소 신호로 생성 중단 (스트리밍 클라이언트 연결 종료 등)
+
+    Args:
+        event: set되면 모든 시퀀스를 종료하는 threading.Event
+    """
+
+    def __init__(self, event):
+        self.event = event
+
+    def __call__(self, input_ids, scores, **kwargs):
+        return torch.full((input_ids.shape[0],), self.event.is_set(), dtype=torch.bool, device=input_ids.device)
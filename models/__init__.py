@@ -1,6 +1,11 @@
 """
 Models package - AI 모델 및 데이터베이스 모델
 """
-from models.database import User, AnalysisHistory, init_db, SessionLocal, engine, get_db
+from models.database import (
+    User, AnalysisHistory, RegionScore, RegionMetric, ScorePercentile, init_db, SessionLocal, engine, get_db
+)
 
-__all__ = ['User', 'AnalysisHistory', 'init_db', 'SessionLocal', 'engine', 'get_db']
+__all__ = [
+    'User', 'AnalysisHistory', 'RegionScore', 'RegionMetric', 'ScorePercentile',
+    'init_db', 'SessionLocal', 'engine', 'get_db'
+]
@@ -3,7 +3,7 @@ SQLAlchemy Database Models for MySkin Project
 """
 
 from datetime import datetime
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Text, JSON
+from sqlalchemy import create_engine, event, Column, Integer, String, Float, DateTime, Text, JSON, ForeignKey, Index
 from sqlalchemy.orm import declarative_base, sessionmaker
 import os
 from dotenv import load_dotenv
@@ -49,6 +49,16 @@ except (ImportError, ModuleNotFoundError, Exception) as e:
     print("INFO: Falling back to SQLite...")
     DATABASE_URL = "sqlite:///./myskin.db"
     engine = create_engine(DATABASE_URL, echo=True)
+
+
+if DATABASE_URL.startswith('sqlite'):
+    # SQLite는 기본적으로 FK(ON DELETE CASCADE)를 적용하지 않음
+    @event.listens_for(engine, "connect")
+    def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
@@ -66,6 +76,7 @@ class User(Base):
     password_hash = Column(String(255), nullable=True)  # 비밀번호 해시
     gender = Column(String(20), nullable=True)          # 성별 (male, female, other)
     last_login_at = Column(DateTime, nullable=True)     # 최근 로그인 일시
+    deleted_at = Column(DateTime, nullable=True, index=True)  # 삭제 요청 일시 (백그라운드 정리 대기)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -108,6 +119,121 @@ class AnalysisHistory(Base):
             'course_name': self.course_name
         }
 
+    def build_region_rows(self):
+        """
+        regions JSON을 정규화 테이블 행(RegionScore, RegionMetric)으로 변환
+
+        raw `details` 배열은 분석용 가치가 없으므로 제외합니다.
+        self.id가 할당된 뒤(flush 이후)에 호출해야 합니다.
+        """
+        rows = []
+        for region_name, region_data in (self.regions or {}).items():
+            if not isinstance(region_data, dict):
+                continue
+
+            rows.append(RegionScore(
+                analysis_id=self.id,
+                user_id=self.user_id,
+                timestamp=self.timestamp,
+                region=region_name,
+                score=_to_float(region_data.get('score')),
+                grade=_to_int(region_data.get('grade')),
+                confidence=_to_float(region_data.get('confidence'))
+            ))
+
+            for metric_name, value in (region_data.get('metrics') or {}).items():
+                value = _to_float(value)
+                if value is None:
+                    continue
+                rows.append(RegionMetric(
+                    analysis_id=self.id,
+                    user_id=self.user_id,
+                    timestamp=self.timestamp,
+                    region=region_name,
+                    name=metric_name,
+                    value=value
+                ))
+        return rows
+
+
+class RegionScore(Base):
+    """부위별 점수 테이블 (analysis_history.regions 정규화)"""
+    __tablename__ = 'region_scores'
+    __table_args__ = (
+        Index('ix_region_scores_user_region_ts', 'user_id', 'region', 'timestamp'),
+        Index('ix_region_scores_region_score', 'region', 'score'),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    analysis_id = Column(Integer, ForeignKey('analysis_history.id', ondelete='CASCADE'), nullable=False, index=True)
+    user_id = Column(String(100), nullable=False)
+    timestamp = Column(DateTime)
+    region = Column(String(50), nullable=False)
+    score = Column(Float)
+    grade = Column(Integer)
+    confidence = Column(Float)
+
+    def to_dict(self):
+        """Convert model to dictionary"""
+        return {
+            'analysis_id': self.analysis_id,
+            'user_id': self.user_id,
+            'timestamp': self.timestamp.isoformat() if self.timestamp else None,
+            'region': self.region,
+            'score': self.score,
+            'grade': self.grade,
+            'confidence': self.confidence
+        }
+
+
+class RegionMetric(Base):
+    """부위별 세부 메트릭 테이블 (analysis_history.regions[*].metrics 정규화)"""
+    __tablename__ = 'region_metrics'
+    __table_args__ = (
+        Index('ix_region_metrics_user_region_name', 'user_id', 'region', 'name'),
+        Index('ix_region_metrics_region_name_value', 'region', 'name', 'value'),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    analysis_id = Column(Integer, ForeignKey('analysis_history.id', ondelete='CASCADE'), nullable=False, index=True)
+    user_id = Column(String(100), nullable=False)
+    timestamp = Column(DateTime)
+    region = Column(String(50), nullable=False)
+    name = Column(String(50), nullable=False)
+    value = Column(Float, nullable=False)
+
+
+class ScorePercentile(Base):
+    """모집단 점수 분위수 룩업 테이블 (배치 작업으로 주기적 갱신)"""
+    __tablename__ = 'score_percentiles'
+    __table_args__ = (
+        Index('ux_score_percentiles_key', 'metric', 'skin_type', 'gender', unique=True),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    metric = Column(String(50), nullable=False)      # "overall" 또는 부위 이름
+    skin_type = Column(String(50), nullable=False)   # 전체는 "*"
+    gender = Column(String(20), nullable=False)      # 전체는 "*"
+    sample_count = Column(Integer, nullable=False)
+    cutpoints = Column(JSON, nullable=False)         # 0~100 분위수 값 (101개)
+    computed_at = Column(DateTime, default=datetime.utcnow)
+
+
+def _to_float(value):
+    """숫자 변환 (변환 불가 시 None)"""
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_int(value):
+    """정수 변환 (변환 불가 시 None)"""
+    try:
+        return int(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
 
 class ChatHistory(Base):
     """챗봇 상담 내역 테이블"""
@@ -132,6 +258,17 @@ class ChatHistory(Base):
         }
 
 
+class ChatSummary(Base):
+    """챗봇 대화 누적 요약 (최근 대화 창 밖으로 밀려난 대화)"""
+    __tablename__ = 'chat_summaries'
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(String(100), nullable=False, unique=True, index=True)
+    summary = Column(Text, nullable=False, default='')
+    summarized_until = Column(Integer, nullable=False, default=0)  # 요약에 반영된 마지막 chat_history.id
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
 def init_db():
     """Initialize database - create all tables"""
     Base.metadata.create_all(bind=engine)
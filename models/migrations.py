@@ -0,0 +1,80 @@
+"""
+데이터 마이그레이션 스크립트
+
+실행: python -m models.migrations
+"""
+from sqlalchemy import exists, inspect, text
+from models.database import AnalysisHistory, RegionScore, SessionLocal, engine, init_db
+
+
+def add_user_deleted_at_column():
+    """
+    users.deleted_at 컬럼 추가 (create_all은 기존 테이블에 컬럼을 추가하지 않음)
+
+    Returns:
+        bool: 컬럼을 새로 추가했는지 여부
+    """
+    columns = {c['name'] for c in inspect(engine).get_columns('users')}
+    if 'deleted_at' in columns:
+        return False
+
+    column_type = 'DATETIME' if engine.dialect.name == 'sqlite' else 'TIMESTAMP'
+    with engine.begin() as conn:
+        conn.execute(text(f'ALTER TABLE users ADD COLUMN deleted_at {column_type}'))
+        conn.execute(text('CREATE INDEX IF NOT EXISTS ix_users_deleted_at ON users (deleted_at)'))
+
+    print("[MIGRATION] users.deleted_at 컬럼 추가 완료")
+    return True
+
+
+def backfill_region_scores(batch_size=500):
+    """
+    기존 analysis_history 레코드의 regions JSON을 region_scores / region_metrics로 백필
+
+    이미 정규화 행이 있는 레코드는 건너뛰므로 여러 번 실행해도 안전합니다.
+    id 기준 keyset 페이징으로 배치마다 커밋합니다.
+
+    Args:
+        batch_size: 배치당 처리할 분석 레코드 수
+
+    Returns:
+        int: 백필된 분석 레코드 수
+    """
+    db = SessionLocal()
+    total = 0
+    last_id = 0
+    try:
+        while True:
+            records = db.query(AnalysisHistory)\
+                .filter(AnalysisHistory.id > last_id)\
+                .filter(~exists().where(RegionScore.analysis_id == AnalysisHistory.id))\
+                .order_by(AnalysisHistory.id.asc())\
+                .limit(batch_size)\
+                .all()
+
+            if not records:
+                break
+
+            for record in records:
+                db.add_all(record.build_region_rows())
+
+            db.commit()
+            total += len(records)
+            last_id = records[-1].id
+            print(f"[MIGRATION] region_scores 백필 진행: {total}건 (last id={last_id})")
+
+        print(f"[MIGRATION] region_scores 백필 완료: {total}건")
+        return total
+
+    except Exception:
+        db.rollback()
+        raise
+
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    init_db()
+    add_user_deleted_at_column()
+    backfill_region_scores()
@@ -3,9 +3,16 @@
 """
 import asyncio
 import os
-from flask import Blueprint, jsonify, request
+import queue
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+from core.constants import DEVICE_CALL_TIMEOUT, DEVICE_STATUS_RESYNC_INTERVAL, DEVICE_STATUS_KEEPALIVE
+from services.device_registry import get_device_registry, SERIAL, MOCK
+from services.device_status_hub import DeviceStatusHub
 from services.led_service import LEDService
+from services.therapy_program_service import TherapyProgramService
+from utils.async_loop import get_device_loop
 from utils.decorators import handle_errors
+from utils.sse import format_sse
 
 # 연결 모드 결정: 시리얼(USB) > BLE > Mock
 CONNECTION_MODE = None
@@ -59,6 +66,52 @@ def get_device_service():
         raise RuntimeError("디바이스 서비스를 사용할 수 없습니다")
 
 
+def run_device_call(result, timeout: float = DEVICE_CALL_TIMEOUT):
+    """
+    BLE/Mock 서비스 호출 결과 대기
+
+    코루틴은 요청마다 새 이벤트 루프를 만들지 않고 디바이스 이벤트 루프 스레드에서
+    실행하므로, 루프에 묶인 BLE 연결이 요청 사이에 유지됩니다.
+
+    Args:
+        result: 서비스 메서드 반환값 (코루틴 또는 동기 결과)
+        timeout: 최대 대기 시간 (초, 초과 시 TimeoutError)
+    """
+    if asyncio.iscoroutine(result):
+        return get_device_loop().run(result, timeout)
+    return result
+
+
+def fetch_device_status():
+    """디바이스에서 현재 상태 조회 (연결 모드 포함)"""
+    service = get_device_service()
+
+    if CONNECTION_MODE == "SERIAL":
+        status = service.get_status()
+    elif CONNECTION_MODE in ["BLE", "MOCK"]:
+        status = run_device_call(service.get_status())
+    else:
+        status = {"connected": False}
+
+    # 기존 클라이언트 호환을 위해 mode는 연결 모드, 테라피 모드는 therapy_mode로 전달
+    if "mode" in status:
+        status["therapy_mode"] = status["mode"]
+    status["mode"] = CONNECTION_MODE
+    return status
+
+
+# 모든 상태 스트림 구독자가 공유하는 디바이스 상태 구독
+status_hub = DeviceStatusHub(fetch_device_status)
+
+# 펌웨어가 스스로 알리는 상태 변경 (테라피 종료 등) 즉시 반영
+STATE_CHANGE_LINES = ("Starting therapy", "Starting program", "Phase ", "Stopping therapy", "Therapy completed")
+
+if CONNECTION_MODE == "SERIAL":
+    device_service.add_listener(
+        lambda line: status_hub.refresh() if line.startswith(STATE_CHANGE_LINES) else None
+    )
+
+
 @device_bp.route('/api/v1/device/config', methods=['GET'])
 @handle_errors
 def get_device_config():
@@ -85,7 +138,7 @@ def scan_ble_devices():
         devices = service.scan_devices()
     elif CONNECTION_MODE in ["BLE", "MOCK"]:
         timeout = request.args.get('timeout', 10, type=int)
-        devices = asyncio.run(service.scan_devices(timeout=timeout))
+        devices = run_device_call(service.scan_devices(timeout=timeout), timeout + DEVICE_CALL_TIMEOUT)
     else:
         devices = []
 
@@ -124,7 +177,7 @@ def connect_ble_device():
 
     if CONNECTION_MODE == "BLE":
         address = data.get('address')
-        success = asyncio.run(service.connect(address))
+        success = run_device_call(service.connect(address))
         address = getattr(service, 'device_address', None)
     else:
         success = False
@@ -154,7 +207,9 @@ def disconnect_ble_device():
     if CONNECTION_MODE == "SERIAL":
         service.disconnect()
     elif CONNECTION_MODE in ["BLE", "MOCK"]:
-        asyncio.run(service.disconnect())
+        run_device_call(service.disconnect())
+
+    status_hub.refresh()
 
     return jsonify({
         "success": True,
@@ -165,18 +220,39 @@ def disconnect_ble_device():
 @device_bp.route('/api/v1/ble/status', methods=['GET'])
 @handle_errors
 def get_ble_status():
-    """디바이스 상태 조회"""
-    service = get_device_service()
+    """디바이스 상태 조회 (상태 스트림이 최근에 조회한 값이 있으면 재사용)"""
+    status = status_hub.latest(max_age=DEVICE_STATUS_RESYNC_INTERVAL) or fetch_device_status()
+    return jsonify(status)
 
-    if CONNECTION_MODE == "SERIAL":
-        status = service.get_status()
-    elif CONNECTION_MODE in ["BLE", "MOCK"]:
-        status = asyncio.run(service.get_status())
-    else:
-        status = {"connected": False}
 
-    status["mode"] = CONNECTION_MODE
-    return jsonify(status)
+@device_bp.route('/api/v1/ble/status/stream', methods=['GET'])
+def stream_ble_status():
+    """
+    디바이스 상태 푸시 (SSE)
+
+    이벤트:
+    - status: 연결/진행 상태가 바뀔 때 전체 상태 (구독 직후 현재 상태 포함)
+    - tick: 테라피 진행 중 남은 시간 ({"remaining_seconds": N})
+    """
+    def events():
+        subscription = status_hub.subscribe()
+        try:
+            while True:
+                try:
+                    event, data = subscription.get(timeout=DEVICE_STATUS_KEEPALIVE)
+                except queue.Empty:
+                    # 프록시/브라우저 연결 유지용 주석 줄
+                    yield ": keepalive\n\n"
+                    continue
+                yield format_sse(data, event=event)
+        finally:
+            status_hub.unsubscribe(subscription)
+
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 @device_bp.route('/api/v1/ble/therapy/start', methods=['POST'])
@@ -211,10 +287,59 @@ def start_therapy():
     if CONNECTION_MODE == "SERIAL":
         result = service.start_therapy(mode, duration)
     elif CONNECTION_MODE in ["BLE", "MOCK"]:
-        result = asyncio.run(service.start_therapy(mode, duration))
+        result = run_device_call(service.start_therapy(mode, duration))
+    else:
+        result = {"success": False, "message": "지원하지 않는 연결 모드"}
+
+    status_hub.refresh()
+
+    if result["success"]:
+        return jsonify(result)
+    else:
+        return jsonify(result), 500
+
+
+def _program_from_request(data):
+    """
+    요청 본문 → 테라피 프로그램
+
+    phases(단계 목록) 또는 recommendation(분석 결과의 LED 추천) 중 하나를 받습니다.
+
+    Raises:
+        ValueError: 둘 다 없거나 단계 형식 오류
+    """
+    if data.get('phases'):
+        return TherapyProgramService.validate(data['phases'])
+    if data.get('recommendation'):
+        return TherapyProgramService.validate(
+            TherapyProgramService.compile(data['recommendation'])["phases"]
+        )
+    raise ValueError("phases 또는 recommendation이 필요합니다")
+
+
+@device_bp.route('/api/v1/ble/therapy/program', methods=['POST'])
+@handle_errors
+def start_therapy_program():
+    """다단계 테라피 프로그램 업로드 및 시작 (디바이스가 자체 실행)"""
+    program = _program_from_request(request.get_json() or {})
+
+    service = get_device_service()
+
+    if not service.is_connected():
+        return jsonify({
+            "success": False,
+            "message": "디바이스가 연결되지 않았습니다"
+        }), 400
+
+    if CONNECTION_MODE == "SERIAL":
+        result = service.start_program(program)
+    elif CONNECTION_MODE in ["BLE", "MOCK"]:
+        result = run_device_call(service.start_program(program))
     else:
         result = {"success": False, "message": "지원하지 않는 연결 모드"}
 
+    status_hub.refresh()
+
     if result["success"]:
         return jsonify(result)
     else:
@@ -236,10 +361,175 @@ def stop_therapy():
     if CONNECTION_MODE == "SERIAL":
         result = service.stop_therapy()
     elif CONNECTION_MODE in ["BLE", "MOCK"]:
-        result = asyncio.run(service.stop_therapy())
+        result = run_device_call(service.stop_therapy())
     else:
         result = {"success": False, "message": "지원하지 않는 연결 모드"}
 
+    status_hub.refresh()
+
+    if result["success"]:
+        return jsonify(result)
+    else:
+        return jsonify(result), 500
+
+
+# ============================================
+# 다중 디바이스 (클리닉용, 디바이스 id별 연결)
+# ============================================
+
+def _find_device(device_id):
+    """등록된 디바이스 반환 (없으면 None)"""
+    try:
+        return get_device_registry().get(device_id)
+    except KeyError:
+        return None
+
+
+def _not_registered(device_id):
+    return jsonify({
+        "success": False,
+        "message": f"등록되지 않은 디바이스입니다: {device_id}"
+    }), 404
+
+
+@device_bp.route('/api/v1/devices/scan', methods=['GET'])
+@handle_errors
+def scan_devices():
+    """연결 방식별 동시 스캔 (kinds=SERIAL,MOCK)"""
+    default_kind = SERIAL if CONNECTION_MODE == SERIAL else MOCK
+    kinds = [k.strip().upper() for k in request.args.get('kinds', default_kind).split(',') if k.strip()]
+    timeout = request.args.get('timeout', 10, type=int)
+
+    devices = get_device_registry().scan(kinds, timeout=timeout)
+
+    return jsonify({
+        "success": True,
+        "devices": devices,
+        "count": len(devices)
+    })
+
+
+@device_bp.route('/api/v1/devices', methods=['GET'])
+@handle_errors
+def list_devices():
+    """등록된 모든 디바이스 상태 (동시 조회, 느린 디바이스는 status=timeout)"""
+    devices = get_device_registry().status_all()
+    return jsonify({
+        "success": True,
+        "devices": devices,
+        "count": len(devices)
+    })
+
+
+@device_bp.route('/api/v1/devices/<device_id>/connect', methods=['POST'])
+@handle_errors
+def connect_device(device_id):
+    """디바이스 연결 (kind: SERIAL/MOCK, target: 포트 또는 주소 - 없으면 device_id)"""
+    data = request.get_json() or {}
+    kind = (data.get('kind') or SERIAL).upper()
+
+    success = get_device_registry().connect(device_id, kind, data.get('target'))
+
+    if success:
+        return jsonify({
+            "success": True,
+            "message": "디바이스 연결 성공",
+            "device_id": device_id,
+            "kind": kind
+        })
+    else:
+        return jsonify({
+            "success": False,
+            "message": "디바이스 연결 실패",
+            "device_id": device_id
+        }), 500
+
+
+@device_bp.route('/api/v1/devices/<device_id>/disconnect', methods=['POST'])
+@handle_errors
+def disconnect_device(device_id):
+    """디바이스 연결 해제"""
+    if _find_device(device_id) is None:
+        return _not_registered(device_id)
+
+    get_device_registry().disconnect(device_id)
+
+    return jsonify({
+        "success": True,
+        "message": "디바이스 연결 해제 완료",
+        "device_id": device_id
+    })
+
+
+@device_bp.route('/api/v1/devices/<device_id>/status', methods=['GET'])
+@handle_errors
+def get_device_status(device_id):
+    """디바이스 상태 조회"""
+    device = _find_device(device_id)
+    if device is None:
+        return _not_registered(device_id)
+
+    status = device.call("get_status")
+    return jsonify({**device.to_dict(), **status})
+
+
+@device_bp.route('/api/v1/devices/<device_id>/therapy/start', methods=['POST'])
+@handle_errors
+def start_device_therapy(device_id):
+    """디바이스별 LED 테라피 시작"""
+    data = request.get_json() or {}
+    mode = data.get('mode')
+    duration = data.get('duration')
+
+    if not mode or not duration:
+        return jsonify({
+            "success": False,
+            "message": "mode와 duration이 필요합니다"
+        }), 400
+
+    device = _find_device(device_id)
+    if device is None:
+        return _not_registered(device_id)
+
+    result = device.call("start_therapy", mode, duration)
+    result["device_id"] = device_id
+
+    if result["success"]:
+        return jsonify(result)
+    else:
+        return jsonify(result), 500
+
+
+@device_bp.route('/api/v1/devices/<device_id>/therapy/stop', methods=['POST'])
+@handle_errors
+def stop_device_therapy(device_id):
+    """디바이스별 LED 테라피 중지"""
+    device = _find_device(device_id)
+    if device is None:
+        return _not_registered(device_id)
+
+    result = device.call("stop_therapy")
+    result["device_id"] = device_id
+
+    if result["success"]:
+        return jsonify(result)
+    else:
+        return jsonify(result), 500
+
+
+@device_bp.route('/api/v1/devices/<device_id>/therapy/program', methods=['POST'])
+@handle_errors
+def start_device_program(device_id):
+    """디바이스별 다단계 테라피 프로그램 시작"""
+    program = _program_from_request(request.get_json() or {})
+
+    device = _find_device(device_id)
+    if device is None:
+        return _not_registered(device_id)
+
+    result = device.call("start_program", program)
+    result["device_id"] = device_id
+
     if result["success"]:
         return jsonify(result)
     else:
@@ -1,8 +1,9 @@
 """
 통계 API 라우트
 """
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, request
 from services.history_service import HistoryService
+from core.constants import SERIES_DEFAULT_POINTS, SERIES_DEFAULT_WINDOW
 from utils.decorators import handle_errors
 
 stats_bp = Blueprint('stats', __name__)
@@ -14,3 +15,14 @@ def get_stats(user_id):
     """사용자 통계 조회"""
     result = HistoryService.get_user_stats(user_id)
     return jsonify(result)
+
+
+@stats_bp.route('/api/v1/stats/<user_id>/series', methods=['GET'])
+@handle_errors
+def get_score_series(user_id):
+    """사용자 점수 시계열 조회 (차트용)"""
+    bucket = request.args.get('bucket', 'day')
+    points = request.args.get('points', type=int, default=SERIES_DEFAULT_POINTS)
+    window = request.args.get('window', type=int, default=SERIES_DEFAULT_WINDOW)
+    result = HistoryService.get_score_series(user_id, bucket, points, window)
+    return jsonify(result)
@@ -5,6 +5,7 @@ from services.ai_service import get_ai_service
 from services.image_service import get_image_service
 from services.metrics_service import MetricsService
 from services.led_service import LEDService
+from services.therapy_program_service import TherapyProgramService
 from core.logger import setup_logger
 
 logger = setup_logger(__name__)
@@ -31,7 +32,8 @@ class AnalysisService:
             {
                 "overall_score": float,
                 "regions": {...},
-                "recommendation": {...}
+                "recommendation": {...},
+                "program": {...}  # 디바이스 업로드용 다단계 테라피 프로그램
             }
         """
         logger.info(f"\n{'='*50}")
@@ -81,6 +83,7 @@ class AnalysisService:
             "regions": regions_data
         }
         recommendation = self.led_service.recommend(analysis_result)
+        program = TherapyProgramService.compile(recommendation)
 
         logger.info(f"\n   📊 전체 점수: {overall_score}/100")
         logger.info(f"   💡 LED 추천: {recommendation['mode'].upper()} 모드 ({recommendation['duration']}분)")
@@ -89,7 +92,8 @@ class AnalysisService:
         return {
             "overall_score": overall_score,
             "regions": regions_data,
-            "recommendation": recommendation
+            "recommendation": recommendation,
+            "program": program
         }
 
 
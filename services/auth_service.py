@@ -0,0 +1,174 @@
+"""
+비밀번호 해시 및 로그인 기록 서비스
+
+- PasswordHasher: 해시 생성/검증을 크기가 제한된 스레드 풀에서 실행 (추론 스레드와 CPU 경합 제한)
+- LoginTracker: last_login_at 갱신을 모아 주기적으로 일괄 UPDATE
+
+해시 비용 벤치마크: python -m services.auth_service [목표_ms]
+"""
+import atexit
+import hashlib
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+from models.database import User, SessionLocal
+from core.config import PASSWORD_HASH_METHOD
+from core.constants import (
+    PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_PENDING, PASSWORD_HASH_WAIT_TIMEOUT,
+    LOGIN_TRACKER_FLUSH_INTERVAL
+)
+from core.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class PasswordHasher:
+    """제한된 스레드 풀에서 비밀번호 해시를 처리하는 서비스"""
+
+    def __init__(self, method=PASSWORD_HASH_METHOD, workers=PASSWORD_HASH_WORKERS,
+                 max_pending=PASSWORD_HASH_MAX_PENDING):
+        self.method = method
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._slots = threading.BoundedSemaphore(max_pending)
+
+    def hash(self, password):
+        """설정된 방식으로 비밀번호 해시 생성"""
+        return self._submit(generate_password_hash, password, method=self.method)
+
+    def verify(self, password_hash, password):
+        """비밀번호 검증"""
+        return self._submit(check_password_hash, password_hash, password or "")
+
+    def needs_rehash(self, password_hash):
+        """저장된 해시가 현재 설정과 다른 방식/비용으로 만들어졌는지 확인"""
+        return password_hash.split("$", 1)[0] != self.method
+
+    def _submit(self, fn, *args, **kwargs):
+        # 대기 중인 작업 수를 제한해 로그인 폭주 시 큐가 무한히 쌓이지 않도록 함
+        if not self._slots.acquire(timeout=PASSWORD_HASH_WAIT_TIMEOUT):
+            raise RuntimeError("로그인 요청이 많습니다. 잠시 후 다시 시도해주세요.")
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future.result()
+
+
+class LoginTracker:
+    """last_login_at 갱신을 병합해 주기적으로 일괄 저장"""
+
+    def __init__(self, flush_interval=LOGIN_TRACKER_FLUSH_INTERVAL):
+        self.flush_interval = flush_interval
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="login-tracker", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def record(self, user_id, logged_in_at):
+        """로그인 시각 기록 (같은 사용자는 최신 값만 유지)"""
+        with self._lock:
+            self._pending[user_id] = logged_in_at
+
+    def flush(self):
+        """
+        쌓인 로그인 시각을 DB에 반영
+
+        Returns:
+            int: 갱신된 사용자 수
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        db = SessionLocal()
+        try:
+            rows = db.query(User.id, User.user_id)\
+                .filter(User.user_id.in_(list(pending)))\
+                .all()
+            db.bulk_update_mappings(User, [
+                {"id": row.id, "last_login_at": pending[row.user_id]}
+                for row in rows
+            ])
+            db.commit()
+            return len(rows)
+
+        except Exception as e:
+            db.rollback()
+            logger.error(f"❌ 로그인 시각 저장 오류: {e}")
+            # 다음 주기에 재시도 (그 사이 들어온 더 최신 값은 유지)
+            with self._lock:
+                for user_id, logged_in_at in pending.items():
+                    self._pending.setdefault(user_id, logged_in_at)
+            return 0
+
+        finally:
+            db.close()
+
+    def close(self):
+        """백그라운드 스레드 종료 및 최종 flush"""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self._thread.join(timeout=self.flush_interval + 5)
+        self.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+
+def benchmark_pbkdf2_iterations(target_ms=250, hash_name="sha256"):
+    """
+    현재 CPU에서 검증 1회가 target_ms 정도 걸리는 PBKDF2 반복 횟수 측정
+
+    Returns:
+        str: PASSWORD_HASH_METHOD에 설정할 값 (예: "pbkdf2:sha256:600000")
+    """
+    sample_iterations = 100000
+    start = time.perf_counter()
+    hashlib.pbkdf2_hmac(hash_name, b"benchmark", os.urandom(16), sample_iterations)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    iterations = int(sample_iterations * target_ms / elapsed_ms)
+    iterations = max(10000, round(iterations, -4))
+    return f"pbkdf2:{hash_name}:{iterations}"
+
+
+# 싱글톤 인스턴스
+_password_hasher_instance = None
+_login_tracker_instance = None
+_instance_lock = threading.Lock()
+
+
+def get_password_hasher():
+    """PasswordHasher 싱글톤 인스턴스 반환"""
+    global _password_hasher_instance
+    with _instance_lock:
+        if _password_hasher_instance is None:
+            _password_hasher_instance = PasswordHasher()
+    return _password_hasher_instance
+
+
+def get_login_tracker():
+    """LoginTracker 싱글톤 인스턴스 반환"""
+    global _login_tracker_instance
+    with _instance_lock:
+        if _login_tracker_instance is None:
+            _login_tracker_instance = LoginTracker()
+    return _login_tracker_instance
+
+
+if __name__ == '__main__':
+    target = float(sys.argv[1]) if len(sys.argv) > 1 else 250
+    method = benchmark_pbkdf2_iterations(target)
+    print(f"PASSWORD_HASH_METHOD={method}  (목표 {target:.0f}ms)")
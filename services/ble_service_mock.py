@@ -22,6 +22,7 @@ class BLEDeviceServiceMock:
         self._therapy_mode = None
         self._therapy_duration = 0
         self._therapy_start_time = None
+        self._program_phases = []
 
         logger.warning("⚠️ Mock BLE Service 사용 중 - 실제 하드웨어 연결 없음")
 
@@ -129,6 +130,7 @@ class BLEDeviceServiceMock:
             self._therapy_mode = mode.upper()
             self._therapy_duration = duration
             self._therapy_start_time = asyncio.get_event_loop().time()
+            self._program_phases = []
 
             return {
                 "success": True,
@@ -145,6 +147,26 @@ class BLEDeviceServiceMock:
                 "message": "[MOCK] 테라피 시작 중 오류 발생"
             }
 
+    async def start_program(self, program: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        테라피 프로그램 시작 (Mock)
+        """
+        logger.info(f"[MOCK] 테라피 프로그램 시작 시뮬레이션: {program['command']}")
+        await asyncio.sleep(0.5)
+
+        self._therapy_active = True
+        self._program_phases = program["phases"]
+        self._therapy_mode = self._program_phases[0]["mode"].upper()
+        self._therapy_duration = program["total_seconds"] / 60
+        self._therapy_start_time = asyncio.get_event_loop().time()
+
+        return {
+            "success": True,
+            "phases": program["phases"],
+            "total_seconds": program["total_seconds"],
+            "message": "[MOCK] 테라피 프로그램이 시작되었습니다 (시뮬레이션)"
+        }
+
     async def stop_therapy(self) -> Dict[str, Any]:
         """
         LED 테라피 중지 (Mock)
@@ -186,6 +208,14 @@ class BLEDeviceServiceMock:
             total_seconds = self._therapy_duration * 60
             remaining = max(0, int(total_seconds - elapsed))
 
+            # 프로그램 실행 중이면 현재 단계 모드 표시
+            phase_end = 0
+            for phase in self._program_phases:
+                phase_end += phase["seconds"]
+                if elapsed < phase_end:
+                    self._therapy_mode = phase["mode"].upper()
+                    break
+
             return {
                 "connected": True,
                 "status": "active",
@@ -0,0 +1,129 @@
+"""
+챗봇 분석 컨텍스트 서비스
+
+사용자의 최근 분석 결과를 짧은 텍스트로 요약해 챗봇 질문에 붙입니다.
+얼굴 사진을 매번 다시 올리지 않아도 피부 상태를 반영한 답변을 받을 수 있고,
+이미지 토큰이 빠지므로 프롬프트가 짧아집니다. 멀티턴 모드에서는 대화 기록
+(ConversationMemory)도 함께 붙입니다.
+"""
+from models.database import AnalysisHistory, SessionLocal
+from core.constants import CHAT_CONTEXT_TOP_METRICS
+from core.logger import setup_logger
+from services.chat_history_service import ConversationMemory
+
+logger = setup_logger(__name__)
+
+
+class ChatContextService:
+    """챗봇 분석 컨텍스트 생성 서비스"""
+
+    @staticmethod
+    def build_skin_context(user_id, top_metrics=CHAT_CONTEXT_TOP_METRICS):
+        """
+        최근 분석 결과 요약 텍스트 생성
+
+        Args:
+            user_id: 사용자 ID
+            top_metrics: 포함할 상위 메트릭 수 (값이 클수록 결함이 큼)
+
+        Returns:
+            str | None: 요약 텍스트 (분석 기록이 없으면 None)
+        """
+        db = SessionLocal()
+        try:
+            latest = db.query(
+                AnalysisHistory.timestamp,
+                AnalysisHistory.overall_score,
+                AnalysisHistory.regions,
+                AnalysisHistory.recommendation
+            ).filter(AnalysisHistory.user_id == user_id)\
+                .order_by(AnalysisHistory.timestamp.desc())\
+                .first()
+
+            if latest is None:
+                return None
+
+            return ChatContextService._summarize(latest, top_metrics)
+
+        except Exception as e:
+            logger.error(f"❌ 분석 컨텍스트 생성 오류: {e}")
+            raise
+
+        finally:
+            db.close()
+
+    @staticmethod
+    def _summarize(analysis, top_metrics):
+        """분석 행 → 한 단락 요약"""
+        date = analysis.timestamp.strftime("%Y-%m-%d") if analysis.timestamp else "unknown date"
+        lines = [f"[MY SKIN ANALYSIS] {date}, overall score {analysis.overall_score}/100."]
+
+        region_parts = []
+        metrics = []
+        for region, data in (analysis.regions or {}).items():
+            if not isinstance(data, dict):
+                continue
+            score = data.get("score")
+            if score is not None:
+                region_parts.append(f"{region} {round(float(score))}")
+            for name, value in (data.get("metrics") or {}).items():
+                if isinstance(value, (int, float)):
+                    metrics.append((value, region, name))
+
+        if region_parts:
+            lines.append("Region scores: " + ", ".join(region_parts) + ".")
+
+        if metrics and top_metrics > 0:
+            metrics.sort(reverse=True)
+            top = [f"{region} {name} {value:g}" for value, region, name in metrics[:top_metrics]]
+            lines.append("Main concerns: " + ", ".join(top) + ".")
+
+        recommendation = analysis.recommendation or {}
+        if recommendation.get("mode"):
+            led = f"LED care: {recommendation['mode']}"
+            if recommendation.get("duration"):
+                led += f" {recommendation['duration']} min"
+            if recommendation.get("reason"):
+                led += f" ({recommendation['reason']})"
+            lines.append(led + ".")
+
+        return "\n".join(lines)
+
+    @staticmethod
+    def build_context(user_id, include_analysis=True, include_history=False):
+        """
+        질문 앞에 붙일 컨텍스트 블록 생성 (분석 요약 / 대화 기록)
+
+        Args:
+            user_id: 사용자 ID
+            include_analysis: 최근 분석 요약 포함 여부
+            include_history: 멀티턴 대화 기록 포함 여부
+
+        Returns:
+            str | None: 컨텍스트 텍스트 (붙일 컨텍스트가 없거나 조회 실패 시 None)
+        """
+        if not user_id or user_id == "anonymous":
+            return None
+
+        blocks = []
+        # 컨텍스트는 부가 정보이므로 조회 실패 시 해당 블록만 생략
+        if include_analysis:
+            try:
+                blocks.append(ChatContextService.build_skin_context(user_id))
+            except Exception:
+                pass
+        if include_history:
+            try:
+                blocks.append(ConversationMemory.build_history(user_id))
+            except Exception:
+                pass
+
+        blocks = [block for block in blocks if block]
+        return "\n\n".join(blocks) if blocks else None
+
+    @staticmethod
+    def with_context(message, context=None):
+        """컨텍스트가 있으면 질문 앞에 붙인 챗봇 입력 반환 (없으면 원래 질문)"""
+        if not context:
+            return message
+        return f"{context}\n\nQuestion: {message.strip()}"
@@ -1,7 +1,18 @@
 from sqlalchemy.orm import Session
-from models.database import ChatHistory
+from models.database import ChatHistory, ChatSummary, SessionLocal, User
+from core.config import CHAT_SPOOL_PATH
+from core.constants import (
+    CHAT_WRITE_BATCH_SIZE, CHAT_WRITE_FLUSH_INTERVAL, CHAT_WRITE_QUEUE_SIZE,
+    CHAT_MEMORY_TOKEN_BUDGET, CHAT_MEMORY_SUMMARY_TOKENS, CHAT_MEMORY_SCAN_LIMIT, CHAT_MEMORY_SNIPPET_CHARS
+)
 from datetime import datetime
+from types import SimpleNamespace
+import atexit
+import json
 import logging
+import os
+import queue
+import threading
 
 logger = logging.getLogger(__name__)
 
@@ -38,3 +49,355 @@ class ChatHistoryService:
         except Exception as e:
             logger.error(f"Error retrieving chat history: {e}")
             return []
+
+    @staticmethod
+    def save_chats(db: Session, records: list):
+        """
+        상담 내역 일괄 저장 (write-behind 버퍼용)
+
+        삭제 표시된 사용자의 기록은 버립니다 (사용자 행을 잠가 삭제 요청과 직렬화).
+        실패 시 롤백 후 예외를 그대로 올려 호출자가 spool 처리하도록 합니다.
+        """
+        try:
+            users = db.query(User.user_id, User.deleted_at)\
+                .filter(User.user_id.in_(sorted({r["user_id"] for r in records})))\
+                .with_for_update()\
+                .all()
+            deleted = {user.user_id for user in users if user.deleted_at}
+            if deleted:
+                logger.info(f"Dropping chat history for deleted users: {sorted(deleted)}")
+                records = [r for r in records if r["user_id"] not in deleted]
+
+            db.bulk_insert_mappings(ChatHistory, [
+                {
+                    "user_id": r["user_id"],
+                    "message": r["message"],
+                    "reply": r["reply"],
+                    "image_path": r.get("image_path"),
+                    "timestamp": datetime.fromisoformat(r["timestamp"])
+                }
+                for r in records
+            ])
+            db.commit()
+            return len(records)
+        except Exception:
+            db.rollback()
+            raise
+
+
+class ChatHistoryWriter:
+    """
+    챗봇 대화 write-behind 버퍼
+
+    응답 경로에서는 메모리 큐에 넣기만 하고, 백그라운드 스레드가 배치 크기 또는
+    주기마다 일괄 INSERT 합니다. DB에 쓸 수 없으면 로컬 spool 파일(JSONL)에 보관했다가
+    다음 flush 때 재시도합니다 (at-least-once).
+    """
+
+    def __init__(self, batch_size: int = CHAT_WRITE_BATCH_SIZE,
+                 flush_interval: float = CHAT_WRITE_FLUSH_INTERVAL,
+                 spool_path: str = CHAT_SPOOL_PATH):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spool_path = spool_path
+        self._queue = queue.Queue(maxsize=CHAT_WRITE_QUEUE_SIZE)
+        self._inflight = []  # flush가 큐에서 꺼내 저장 중인 기록
+        self._flush_lock = threading.Lock()
+        self._spool_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="chat-history-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def enqueue(self, user_id: str, message: str, reply: str, image_path: str = None):
+        """대화 기록을 큐에 추가 (DB를 기다리지 않음)"""
+        record = {
+            "user_id": user_id,
+            "message": message,
+            "reply": reply,
+            "image_path": image_path,
+            "timestamp": datetime.utcnow().isoformat()
+        }
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            logger.warning("Chat write queue full, spooling record to disk")
+            self._append_spool([record])
+            return
+
+        if self._queue.qsize() >= self.batch_size:
+            self._wake.set()
+
+    def pending_for(self, user_id: str) -> list:
+        """
+        아직 DB에 저장되지 않은 사용자 대화 (저장 중인 배치 + 큐, 오래된 순)
+
+        응답 경로에서 DB 쓰기를 기다리지 않고 직전 대화를 읽기 위한 메모리 조회입니다.
+        """
+        inflight = [r for r in self._inflight if r["user_id"] == user_id]
+        with self._queue.mutex:
+            queued = [r for r in self._queue.queue if r["user_id"] == user_id]
+        return inflight + queued
+
+    def flush(self) -> int:
+        """
+        큐와 spool 파일에 쌓인 기록을 DB에 저장
+
+        Returns:
+            저장된 레코드 수 (실패 시 0)
+        """
+        with self._flush_lock:
+            pending = []
+            while True:
+                try:
+                    pending.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            spooled, spool_offset = self._read_spool()
+            records = spooled + pending
+            if not records:
+                return 0
+
+            self._inflight = records
+            db = SessionLocal()
+            try:
+                saved = ChatHistoryService.save_chats(db, records)
+            except Exception as e:
+                logger.error(f"Error flushing chat history ({len(records)} records), spooling: {e}")
+                self._append_spool(pending)
+                return 0
+            finally:
+                self._inflight = []
+                db.close()
+
+            if spool_offset:
+                self._consume_spool(spool_offset)
+            return saved
+
+    def close(self):
+        """백그라운드 스레드 종료 및 최종 flush"""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout=self.flush_interval + 5)
+        self.flush()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Chat history writer error: {e}")
+
+    def _append_spool(self, records: list):
+        if not records:
+            return
+        with self._spool_lock:
+            os.makedirs(os.path.dirname(self.spool_path) or ".", exist_ok=True)
+            with open(self.spool_path, "a", encoding="utf-8") as f:
+                for r in records:
+                    f.write(json.dumps(r, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _read_spool(self):
+        """spool 파일의 기록과 읽은 바이트 수 반환"""
+        with self._spool_lock:
+            if not os.path.exists(self.spool_path):
+                return [], 0
+            with open(self.spool_path, "rb") as f:
+                data = f.read()
+
+        # 마지막 줄이 쓰다 만 줄이면 다음 flush로 미룸
+        complete = data[:data.rfind(b"\n") + 1]
+        records = []
+        for line in complete.decode("utf-8").splitlines():
+            if not line.strip():
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                logger.error(f"Skipping corrupt chat spool line: {line[:80]}")
+        return records, len(complete)
+
+    def _consume_spool(self, offset: int):
+        """DB에 저장된 앞부분(offset 바이트)을 spool 파일에서 제거"""
+        with self._spool_lock:
+            with open(self.spool_path, "rb") as f:
+                rest = f.read()[offset:]
+            if rest:
+                tmp_path = self.spool_path + ".tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(rest)
+                os.replace(tmp_path, self.spool_path)
+            else:
+                os.remove(self.spool_path)
+
+
+_chat_writer_instance = None
+_chat_writer_lock = threading.Lock()
+
+
+def get_chat_history_writer() -> ChatHistoryWriter:
+    """ChatHistoryWriter 싱글톤 인스턴스 반환"""
+    global _chat_writer_instance
+    with _chat_writer_lock:
+        if _chat_writer_instance is None:
+            _chat_writer_instance = ChatHistoryWriter()
+    return _chat_writer_instance
+
+
+def estimate_tokens(text: str) -> int:
+    """토큰 수 근사 (영문 약 4글자당 1토큰, 한글 등 비ASCII는 글자당 1토큰)"""
+    ascii_chars = sum(1 for c in text if ord(c) < 128)
+    return ascii_chars // 4 + (len(text) - ascii_chars) + 1
+
+
+class ConversationMemory:
+    """
+    멀티턴 대화 메모리
+
+    최근 대화는 토큰 예산 안에서 원문 그대로, 예산 밖으로 밀려난 대화는
+    chat_summaries 테이블의 누적 요약에 한 줄씩 합칩니다. 요약도 예산을 넘으면
+    오래된 줄부터 버리므로 대화가 길어져도 프롬프트 크기는 일정합니다.
+    요약은 모델 호출 없이 질문/답변 앞부분을 발췌하는 방식입니다.
+    """
+
+    @staticmethod
+    def build_history(user_id: str, token_budget: int = CHAT_MEMORY_TOKEN_BUDGET,
+                      summary_budget: int = CHAT_MEMORY_SUMMARY_TOKENS):
+        """
+        프롬프트에 넣을 대화 기록 블록 생성
+
+        Args:
+            user_id: 사용자 ID
+            token_budget: 최근 대화 토큰 예산
+            summary_budget: 누적 요약 토큰 예산
+
+        Returns:
+            str | None: 대화 기록 블록 (이전 대화가 없으면 None)
+        """
+        # write-behind 버퍼에 남아 아직 DB에 없는 직전 대화 (DB 쓰기를 기다리지 않고 메모리에서 읽음)
+        pending = get_chat_history_writer().pending_for(user_id)
+
+        db = SessionLocal()
+        try:
+            memory = db.query(ChatSummary).filter(ChatSummary.user_id == user_id).first()
+            since = memory.summarized_until if memory else 0
+
+            # 요약 이후 대화 (최신순 첫 페이지)
+            turns = db.query(ChatHistory.id, ChatHistory.message, ChatHistory.reply, ChatHistory.timestamp)\
+                .filter(ChatHistory.user_id == user_id, ChatHistory.id > since)\
+                .order_by(ChatHistory.id.desc())\
+                .limit(CHAT_MEMORY_SCAN_LIMIT)\
+                .all()
+
+            # 버퍼 기록은 DB 기록보다 최신 (조회 직전에 저장이 끝난 기록은 중복 제외)
+            saved = {(turn.timestamp, turn.message) for turn in turns}
+            unsaved = [
+                SimpleNamespace(id=None, message=r["message"], reply=r["reply"])
+                for r in reversed(pending)
+                if (datetime.fromisoformat(r["timestamp"]), r["message"]) not in saved
+            ]
+            candidates = unsaved + list(turns)
+
+            recent = []
+            used = 0
+            for turn in candidates:
+                cost = estimate_tokens(ConversationMemory._format_turn(turn))
+                if used + cost > token_budget:
+                    break
+                recent.append(turn)
+                used += cost
+
+            summary = memory.summary if memory else ""
+            summarized_until = since
+            # 첫 페이지보다 오래된 대화가 더 있으면 오래된 순으로 페이지를 돌며 모두 요약에 합침
+            if len(turns) == CHAT_MEMORY_SCAN_LIMIT:
+                summary, summarized_until = ConversationMemory._fold_backlog(
+                    db, user_id, since, turns[-1].id, summary, summary_budget
+                )
+            # 예산 밖으로 밀려난 첫 페이지 대화 (버퍼 기록은 저장된 뒤 다음 호출에서 요약)
+            older = [turn for turn in candidates[len(recent):] if turn.id is not None]
+            if older:
+                summary = ConversationMemory._fold(summary, reversed(older), summary_budget)
+                summarized_until = older[0].id
+
+            if summarized_until != since:
+                try:
+                    if memory is None:
+                        memory = ChatSummary(user_id=user_id)
+                        db.add(memory)
+                    memory.summary = summary
+                    memory.summarized_until = summarized_until
+                    db.commit()
+                except Exception as e:
+                    # 동시 요청이 먼저 요약한 경우 등 - 이번 프롬프트에는 계산한 요약을 그대로 사용
+                    db.rollback()
+                    logger.warning(f"Failed to persist chat summary for {user_id}: {e}")
+
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error building conversation memory: {e}")
+            raise
+
+        finally:
+            db.close()
+
+        blocks = []
+        if summary:
+            blocks.append("[EARLIER CONVERSATION]\n" + summary)
+        if recent:
+            blocks.append("[RECENT CONVERSATION]\n" + "\n".join(
+                ConversationMemory._format_turn(turn) for turn in reversed(recent)
+            ))
+        return "\n\n".join(blocks) or None
+
+    @staticmethod
+    def _fold_backlog(db, user_id: str, since: int, before: int, summary: str, summary_budget: int):
+        """
+        since < id < before 대화를 오래된 순으로 페이지 단위로 읽어 요약에 합침
+
+        Returns:
+            (요약, 마지막으로 합친 대화 id)
+        """
+        while True:
+            page = db.query(ChatHistory.id, ChatHistory.message, ChatHistory.reply)\
+                .filter(ChatHistory.user_id == user_id, ChatHistory.id > since, ChatHistory.id < before)\
+                .order_by(ChatHistory.id.asc())\
+                .limit(CHAT_MEMORY_SCAN_LIMIT)\
+                .all()
+            if page:
+                summary = ConversationMemory._fold(summary, page, summary_budget)
+                since = page[-1].id
+            if len(page) < CHAT_MEMORY_SCAN_LIMIT:
+                return summary, since
+
+    @staticmethod
+    def _format_turn(turn) -> str:
+        return f"User: {turn.message.strip()}\nAssistant: {turn.reply.strip()}"
+
+    @staticmethod
+    def _snippet(text: str) -> str:
+        text = " ".join(text.split())
+        if len(text) > CHAT_MEMORY_SNIPPET_CHARS:
+            text = text[:CHAT_MEMORY_SNIPPET_CHARS].rstrip() + "…"
+        return text
+
+    @staticmethod
+    def _fold(summary: str, turns, summary_budget: int) -> str:
+        """오래된 대화를 요약에 한 줄씩 추가하고 예산을 넘는 앞부분 제거"""
+        lines = [line for line in summary.split("\n") if line]
+        for turn in turns:
+            lines.append(
+                f"- User asked: {ConversationMemory._snippet(turn.message)} / "
+                f"Assistant: {ConversationMemory._snippet(turn.reply)}"
+            )
+        while len(lines) > 1 and estimate_tokens("\n".join(lines)) > summary_budget:
+            lines.pop(0)
+        return "\n".join(lines)
@@ -1,5 +1,13 @@
 import base64
+import requests
 from google.cloud import aiplatform
+from core.config import CHATBOT_STREAM_URL
+from utils.sse import iter_sse
+from services.response_cache import get_response_cache, context_namespace
+from services.chat_context_service import ChatContextService
+
+CACHE_NAMESPACE = "vertex"
+REQUEST_TIMEOUT = 300  # LLaVA 응답 대기 시간 (초)
 
 class ChatbotService:
     def __init__(self):
@@ -18,63 +26,150 @@ class ChatbotService:
             print(f"❌ Vertex AI 초기화 실패: {e}")
             self.endpoint = None
 
-    def generate_response(self, message, image_file=None):
-        if self.endpoint is None:
-            return "AI 서비스가 현재 준비되지 않았습니다."
-
-        instances = [{}]
-
+    @staticmethod
+    def _build_prompt(message, has_image):
         # 이미지 유무에 따라 프롬프트 다르게 구성
-        if image_file:
-            try:
-                image_bytes = image_file.read()
-                image_b64 = base64.b64encode(image_bytes).decode("utf-8")
-                instances[0]["image"] = image_b64
-                # 이미지가 있을 때만 <image> 태그 포함
-                formatted_prompt = f"""USER: <image>
+        if has_image:
+            # 이미지가 있을 때만 <image> 태그 포함
+            return f"""USER: <image>
 {message.strip()}
 
 [STRICT RULE] Your ENTIRE response must be under 150 words. Be concise.
 Chain-of-Thought: (2-3 sentences max)
 Answer: (3-4 sentences max)
 ASSISTANT:"""
-            except Exception as e:
-                return f"이미지 처리 오류: {str(e)}"
-        else:
-            # 이미지가 없을 때는 <image> 태그 제거
-            formatted_prompt = f"""USER: {message.strip()}
+        # 이미지가 없을 때는 <image> 태그 제거
+        return f"""USER: {message.strip()}
 
 [STRICT RULE] Your ENTIRE response must be under 150 words. Be concise.
 Chain-of-Thought: (2-3 sentences max)
 Answer: (3-4 sentences max)
 ASSISTANT:"""
 
-        instances[0]["prompt"] = formatted_prompt
+    @staticmethod
+    def _postprocess(ans):
+        # 답변에서 ASSISTANT: 이후만 추출
+        if "ASSISTANT:" in ans:
+            reply = ans.split("ASSISTANT:")[-1].strip()
+        else:
+            reply = ans.strip()
 
-        try:
-            # AI가 생각할 시간을 충분히 주기 위해 timeout 300초 설정
-            prediction = self.endpoint.predict(instances=instances, timeout=300)
-            if prediction.predictions:
-                ans = prediction.predictions[0]
-                # 답변에서 ASSISTANT: 이후만 추출
-                if "ASSISTANT:" in ans:
-                    reply = ans.split("ASSISTANT:")[-1].strip()
-                else:
-                    reply = ans.strip()
+        # 후처리: Chain-of-Thought만 사용, Answer 부분 제거
+        if "Answer:" in reply:
+            reply = reply.split("Answer:")[0].strip()
+
+        # Chain-of-Thought: 라벨 제거 (내용만 반환)
+        if reply.startswith("Chain-of-Thought:"):
+            reply = reply.replace("Chain-of-Thought:", "").strip()
+
+        return reply
+
+    def _build_instance(self, message, image_file=None):
+        instance = {}
+        if image_file:
+            image_bytes = image_file.read()
+            instance["image"] = base64.b64encode(image_bytes).decode("utf-8")
+        instance["prompt"] = self._build_prompt(message, bool(image_file))
+        return instance
+
+    def generate_response(self, message, image_file=None, context=None):
+        """
+        답변 생성
+
+        Args:
+            message: 사용자 질문 (응답 캐시 키)
+            image_file: 이미지 파일 (있으면 캐시 사용 안 함)
+            context: 질문 앞에 붙일 분석 요약 / 대화 기록 (캐시는 컨텍스트별로 구분)
+        """
+        if self.endpoint is None:
+            return "AI 서비스가 현재 준비되지 않았습니다."
 
-                # 후처리: Chain-of-Thought만 사용, Answer 부분 제거
-                if "Answer:" in reply:
-                    reply = reply.split("Answer:")[0].strip()
+        # 텍스트 전용 질문은 응답 캐시 확인
+        cache = get_response_cache() if not image_file else None
+        namespace = context_namespace(CACHE_NAMESPACE, context)
+        if cache is not None:
+            cached = cache.get(message, namespace)
+            if cached is not None:
+                return cached
 
-                # Chain-of-Thought: 라벨 제거 (내용만 반환)
-                if reply.startswith("Chain-of-Thought:"):
-                    reply = reply.replace("Chain-of-Thought:", "").strip()
+        try:
+            instances = [self._build_instance(ChatContextService.with_context(message, context), image_file)]
+        except Exception as e:
+            return f"이미지 처리 오류: {str(e)}"
 
+        try:
+            # AI가 생각할 시간을 충분히 주기 위해 timeout 300초 설정
+            # (parameters.timeout으로 서버에도 마감을 전달 → 늦을 요청은 서버가 대기열에서 제외)
+            prediction = self.endpoint.predict(
+                instances=instances, parameters={"timeout": REQUEST_TIMEOUT}, timeout=REQUEST_TIMEOUT
+            )
+            if prediction.predictions:
+                reply = self._postprocess(prediction.predictions[0])
+                if cache is not None:
+                    cache.set(message, reply, namespace)
                 return reply
             return "답변을 생성할 수 없습니다."
         except Exception as e:
             return f"AI 상담 중 오류 발생: {str(e)}"
 
+    def stream_response(self, message, image_file=None, context=None):
+        """
+        답변 스트리밍
+
+        CHATBOT_STREAM_URL(LLaVA 서버 /predict/stream)이 설정되어 있으면 토큰을 받는 대로
+        {"token": ...}을 내보내고, 마지막에 후처리된 {"reply": ...}를 내보냅니다.
+        설정이 없으면 일반 응답을 한 번에 내보냅니다. 인자는 generate_response와 같습니다.
+        """
+        if not CHATBOT_STREAM_URL:
+            yield {"reply": self.generate_response(message, image_file, context)}
+            return
+
+        cache = get_response_cache() if not image_file else None
+        namespace = context_namespace(CACHE_NAMESPACE, context)
+        if cache is not None:
+            cached = cache.get(message, namespace)
+            if cached is not None:
+                yield {"reply": cached}
+                return
+
+        try:
+            instances = [self._build_instance(ChatContextService.with_context(message, context), image_file)]
+        except Exception as e:
+            yield {"reply": f"이미지 처리 오류: {str(e)}"}
+            return
+
+        chunks = []
+        completed = False  # done 이벤트를 받은 완전한 답변만 캐시
+        try:
+            # 클라이언트가 끊겨 이 제너레이터가 닫히면 with 블록이 연결을 닫아 서버 측 생성도 중단됨
+            with requests.post(CHATBOT_STREAM_URL, json={"instances": instances},
+                               headers={"X-Request-Timeout": str(REQUEST_TIMEOUT)},
+                               stream=True, timeout=(10, REQUEST_TIMEOUT)) as response:
+                if response.status_code == 503:
+                    retry_after = response.headers.get("Retry-After", "잠시")
+                    yield {"reply": f"상담 요청이 많아 처리할 수 없습니다. {retry_after}초 후 다시 시도해 주세요."}
+                    return
+                response.raise_for_status()
+                for event, data in iter_sse(response.iter_lines(decode_unicode=True)):
+                    if event == "error":
+                        raise RuntimeError(data.get("error"))
+                    if event == "done":
+                        chunks = [data.get("reply", "".join(chunks))]
+                        completed = True
+                        break
+                    token = data.get("token")
+                    if token:
+                        chunks.append(token)
+                        yield {"token": token}
+        except Exception as e:
+            yield {"reply": f"AI 상담 중 오류 발생: {str(e)}"}
+            return
+
+        reply = self._postprocess("".join(chunks))
+        if cache is not None and completed:
+            cache.set(message, reply, namespace)
+        yield {"reply": reply}
+
 # [필수] app.py에서 호출하는 함수
 _chatbot_instance = None
 def get_chatbot_service():
@@ -0,0 +1,86 @@
+"""
+디바이스 탐색 캐시
+마지막으로 연결에 성공한 시리얼 포트 / BLE 주소를 디바이스별로 기억
+
+앱 재시작이나 케이블 재연결 후 전체 스캔 없이 이전 포트부터 확인합니다.
+USB 재연결 시 포트 이름이 바뀔 수 있으므로(/dev/ttyACM0 → ttyACM1) 시리얼 번호/hwid도 함께 저장합니다.
+"""
+import json
+import os
+import threading
+from typing import Any, Dict, Optional
+from core.config import DEVICE_CACHE_PATH
+from core.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class DeviceDiscoveryCache:
+    """
+    디바이스 키 → 마지막 연결 정보 (JSON 파일)
+
+    Args:
+        path: 캐시 파일 경로
+    """
+
+    def __init__(self, path: str = DEVICE_CACHE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._data: Dict[str, Dict[str, Any]] = self._load()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"디바이스 캐시 로드 실패 (무시): {e}")
+            return {}
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """마지막 연결 정보 (없으면 None)"""
+        with self._lock:
+            entry = self._data.get(key)
+            return dict(entry) if entry else None
+
+    def remember(self, key: str, **info):
+        """
+        연결 성공 정보 저장
+
+        Args:
+            key: 디바이스 키 (디바이스 이름 또는 id)
+            **info: port / address / hwid / serial_number 등
+        """
+        with self._lock:
+            if self._data.get(key) == info:
+                return
+            self._data[key] = info
+            snapshot = dict(self._data)
+        self._save(snapshot)
+
+    def _save(self, snapshot: Dict[str, Dict[str, Any]]):
+        """임시 파일에 쓴 뒤 교체 (쓰는 중 종료되어도 기존 캐시 유지)"""
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(snapshot, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"디바이스 캐시 저장 실패 (무시): {e}")
+
+
+# 싱글톤 인스턴스
+_device_cache_instance: Optional[DeviceDiscoveryCache] = None
+_device_cache_lock = threading.Lock()
+
+
+def get_device_cache() -> DeviceDiscoveryCache:
+    """디바이스 탐색 캐시 싱글톤 인스턴스 획득"""
+    global _device_cache_instance
+    if _device_cache_instance is None:
+        with _device_cache_lock:
+            if _device_cache_instance is None:
+                _device_cache_instance = DeviceDiscoveryCache()
+    return _device_cache_instance
@@ -0,0 +1,317 @@
+"""
+LED 마스크 바이너리 명령 프로토콜 (v1)
+
+텍스트 명령("START:RED:20")과 같은 링크에서 함께 쓰는 길이 접두 프레임:
+
+    SYNC(0xA5) | VER | SEQ | TYPE | LEN | PAYLOAD(LEN) | CRC16(2, big-endian)
+
+- CRC16: CCITT-FALSE (poly 0x1021, init 0xFFFF), VER부터 PAYLOAD까지
+- SEQ: 요청/응답 연결용 (1~255, 0은 사용하지 않음) - 여러 명령을 응답 순서와 무관하게 파이프라인
+- 펌웨어 텍스트 출력은 ASCII라 0xA5가 나오지 않으므로 SYNC 바이트로 프레임과 텍스트 줄을 구분
+
+버전 협상: 호스트가 텍스트로 "PROTO:<지원 최대 버전>"을 보내면 펌웨어가 "OK:PROTO:<사용할 버전>"으로
+응답합니다. 구 펌웨어는 ERROR:UNKNOWN_COMMAND로 응답하므로 텍스트 프로토콜을 계속 사용합니다.
+
+상위 계층은 텍스트 명령/응답 문자열을 그대로 쓰고, 이 모듈이 프레임과 상호 변환합니다.
+
+테라피 프로그램 (여러 단계를 한 번에 업로드, 디바이스가 스스로 실행):
+
+    PROGRAM:RED,1200,128,255,60;GOLD,300,96,191,60    → OK:PROGRAM:<단계 수>:<전체 초>
+
+단계 = 모드, 시간(초), 시작 PWM, 목표 PWM, 램프 시간(초 - 시작→목표 밝기로 올리는 시간)
+"""
+import struct
+from typing import List, Optional, Tuple, Union
+
+PROTOCOL_VERSION = 1
+SYNC = 0xA5
+HEADER_SIZE = 5
+CRC_SIZE = 2
+MAX_PAYLOAD = 32
+
+# 요청 (호스트 → 디바이스)
+CMD_START = 0x01    # [mode, minutes]
+CMD_STOP = 0x02
+CMD_STATUS = 0x03
+CMD_TEST = 0x04
+CMD_PROGRAM = 0x05  # [단계 수, (mode, seconds(u16), pwm_start, pwm_end, ramp_seconds) × 단계 수]
+
+# 응답 (디바이스 → 호스트)
+RSP_OK = 0x81       # [요청 TYPE, ...] - START는 [CMD_START, mode, minutes], PROGRAM은 [CMD_PROGRAM, 단계 수, 전체 초(u16)]
+RSP_ERROR = 0x82    # [error code]
+RSP_STATUS = 0x83   # [active(0/1), mode, remaining_seconds(u16)]
+
+MODES = ["RED", "BLUE", "GOLD"]
+MODE_OFF = 0xFF
+
+# 테라피 프로그램 제한 (펌웨어 저장 공간 / BLE 특성 100바이트 제한)
+MAX_PROGRAM_PHASES = 4
+MAX_PROGRAM_SECONDS = 3600
+PHASE_SIZE = 6
+
+# CRC가 맞지 않는 프레임은 SEQ도 믿을 수 없으므로 응답 없이 버림 (호스트는 시간 초과)
+ERRORS = {
+    1: "INVALID_FORMAT",
+    2: "INVALID_DURATION",
+    3: "UNKNOWN_COMMAND",
+    4: "INVALID_MODE",
+    5: "UNSUPPORTED_VERSION"
+}
+ERROR_CODES = {name: code for code, name in ERRORS.items()}
+
+OK_TEXT = {CMD_STOP: "OK:STOPPED", CMD_TEST: "OK:TEST_COMPLETED"}
+
+
+class ProtocolError(ValueError):
+    """프레임/명령을 변환할 수 없음"""
+
+
+class Frame:
+    """디코딩된 프레임 한 개"""
+
+    def __init__(self, seq: int, type_: int, payload: bytes = b"", version: int = PROTOCOL_VERSION):
+        self.version = version
+        self.seq = seq
+        self.type = type_
+        self.payload = payload
+
+    def __repr__(self):
+        return f"Frame(seq={self.seq}, type=0x{self.type:02X}, payload={self.payload.hex()})"
+
+
+def crc16(data: bytes) -> int:
+    """CRC-16/CCITT-FALSE"""
+    crc = 0xFFFF
+    for byte in data:
+        crc ^= byte << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021) if crc & 0x8000 else (crc << 1)
+            crc &= 0xFFFF
+    return crc
+
+
+def encode_frame(frame: Frame) -> bytes:
+    """Frame → 전송 바이트"""
+    if len(frame.payload) > MAX_PAYLOAD:
+        raise ProtocolError(f"payload too long: {len(frame.payload)}")
+    body = bytes([frame.version, frame.seq, frame.type, len(frame.payload)]) + frame.payload
+    return bytes([SYNC]) + body + struct.pack(">H", crc16(body))
+
+
+class FrameParser:
+    """
+    수신 바이트 스트림을 프레임과 텍스트 줄로 분리
+
+    feed()는 ("frame", Frame), ("line", str), ("error", 사유) 항목 리스트를 반환합니다.
+    CRC가 맞지 않으면 SYNC 바이트 하나만 버리고 다음 바이트부터 다시 동기화합니다.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def feed(self, data: bytes) -> List[Tuple[str, Union[Frame, str]]]:
+        self._buffer += data
+        items = []
+        buf = self._buffer
+        while buf:
+            if buf[0] == SYNC:
+                if len(buf) < HEADER_SIZE:
+                    break
+                length = buf[4]
+                if length > MAX_PAYLOAD:
+                    items.append(("error", "payload length out of range"))
+                    del buf[0]
+                    continue
+                total = HEADER_SIZE + length + CRC_SIZE
+                if len(buf) < total:
+                    break
+                body = bytes(buf[1:HEADER_SIZE + length])
+                (crc,) = struct.unpack(">H", bytes(buf[HEADER_SIZE + length:total]))
+                if crc != crc16(body):
+                    items.append(("error", "crc mismatch"))
+                    del buf[0]
+                    continue
+                items.append(("frame", Frame(body[1], body[2], body[4:], version=body[0])))
+                del buf[:total]
+                continue
+
+            newline = buf.find(b"\n")
+            sync = buf.find(bytes([SYNC]))
+            if sync != -1 and (newline == -1 or sync < newline):
+                # 줄 중간에 프레임이 시작됨 - 앞부분은 불완전한 텍스트로 처리
+                end, skip = sync, 0
+            elif newline != -1:
+                end, skip = newline, 1
+            else:
+                break
+            line = bytes(buf[:end]).decode("utf-8", errors="replace").strip()
+            del buf[:end + skip]
+            if line:
+                items.append(("line", line))
+        return items
+
+
+def _mode_code(mode: str) -> int:
+    try:
+        return MODES.index(mode.strip().upper())
+    except ValueError:
+        raise ProtocolError(f"unknown mode: {mode}")
+
+
+def _mode_name(code: int) -> str:
+    return MODES[code] if code < len(MODES) else "OFF"
+
+
+def format_program(phases: List[dict]) -> str:
+    """
+    단계 목록 → PROGRAM 텍스트 명령
+
+    Args:
+        phases: [{"mode", "seconds", "pwm_start", "pwm_end", "ramp_seconds"}, ...]
+    """
+    return "PROGRAM:" + ";".join(
+        f"{p['mode'].upper()},{p['seconds']},{p['pwm_start']},{p['pwm_end']},{p['ramp_seconds']}"
+        for p in phases
+    )
+
+
+def parse_program(command: str) -> List[dict]:
+    """
+    PROGRAM 텍스트 명령 → 단계 목록 (형식/범위 검증)
+
+    Raises:
+        ProtocolError: 형식 오류 (메시지는 펌웨어 오류 이름)
+    """
+    body = command.strip().upper()[len("PROGRAM:"):]
+    phases = []
+    for part in body.split(";"):
+        fields = part.split(",")
+        if len(fields) != 5 or not all(f.strip().isdigit() for f in fields[1:]):
+            raise ProtocolError("INVALID_FORMAT")
+        mode = fields[0].strip()
+        if mode not in MODES:
+            raise ProtocolError("INVALID_MODE")
+        seconds, pwm_start, pwm_end, ramp = (int(f) for f in fields[1:])
+        if not 0 < seconds <= MAX_PROGRAM_SECONDS:
+            raise ProtocolError("INVALID_DURATION")
+        if ramp > min(seconds, 255) or max(pwm_start, pwm_end) > 255:
+            raise ProtocolError("INVALID_FORMAT")
+        phases.append({
+            "mode": mode, "seconds": seconds, "pwm_start": pwm_start, "pwm_end": pwm_end, "ramp_seconds": ramp
+        })
+    if not 0 < len(phases) <= MAX_PROGRAM_PHASES:
+        raise ProtocolError("INVALID_FORMAT")
+    if sum(p["seconds"] for p in phases) > MAX_PROGRAM_SECONDS:
+        raise ProtocolError("INVALID_DURATION")
+    return phases
+
+
+def encode_command(command: str, seq: int) -> Optional[bytes]:
+    """
+    텍스트 명령 → 요청 프레임 (프레임으로 표현할 수 없는 명령이면 None)
+
+    Args:
+        command: "START:RED:20", "STOP", "STATUS", "TEST"
+        seq: 시퀀스 번호 (1~255)
+    """
+    cmd = command.strip().upper()
+    if cmd == "STOP":
+        return encode_frame(Frame(seq, CMD_STOP))
+    if cmd == "STATUS":
+        return encode_frame(Frame(seq, CMD_STATUS))
+    if cmd == "TEST":
+        return encode_frame(Frame(seq, CMD_TEST))
+    if cmd.startswith("START:"):
+        parts = cmd.split(":")
+        if len(parts) != 3 or not parts[2].isdigit() or parts[1] not in MODES or not 0 <= int(parts[2]) <= 255:
+            return None
+        return encode_frame(Frame(seq, CMD_START, bytes([_mode_code(parts[1]), int(parts[2])])))
+    if cmd.startswith("PROGRAM:"):
+        try:
+            phases = parse_program(cmd)
+        except ProtocolError:
+            # 텍스트로 보내 펌웨어가 오류 응답하도록 함
+            return None
+        payload = bytes([len(phases)])
+        for p in phases:
+            payload += bytes([_mode_code(p["mode"])]) + struct.pack(">H", p["seconds"])
+            payload += bytes([p["pwm_start"], p["pwm_end"], p["ramp_seconds"]])
+        return encode_frame(Frame(seq, CMD_PROGRAM, payload))
+    return None
+
+
+def decode_command(frame: Frame) -> str:
+    """요청 프레임 → 텍스트 명령 (디바이스/시뮬레이터 쪽)"""
+    if frame.type == CMD_START:
+        if len(frame.payload) != 2 or frame.payload[0] >= len(MODES):
+            raise ProtocolError("INVALID_MODE" if len(frame.payload) == 2 else "INVALID_FORMAT")
+        return f"START:{MODES[frame.payload[0]]}:{frame.payload[1]}"
+    if frame.type == CMD_STOP:
+        return "STOP"
+    if frame.type == CMD_STATUS:
+        return "STATUS"
+    if frame.type == CMD_TEST:
+        return "TEST"
+    if frame.type == CMD_PROGRAM:
+        payload = frame.payload
+        if not payload or len(payload) != 1 + payload[0] * PHASE_SIZE:
+            raise ProtocolError("INVALID_FORMAT")
+        phases = []
+        for i in range(payload[0]):
+            chunk = payload[1 + i * PHASE_SIZE:1 + (i + 1) * PHASE_SIZE]
+            if chunk[0] >= len(MODES):
+                raise ProtocolError("INVALID_MODE")
+            (seconds,) = struct.unpack(">H", chunk[1:3])
+            phases.append({
+                "mode": MODES[chunk[0]], "seconds": seconds,
+                "pwm_start": chunk[3], "pwm_end": chunk[4], "ramp_seconds": chunk[5]
+            })
+        return format_program(phases)
+    raise ProtocolError("UNKNOWN_COMMAND")
+
+
+def encode_response(response: str, seq: int) -> bytes:
+    """텍스트 응답 → 응답 프레임 (디바이스/시뮬레이터 쪽)"""
+    if response.startswith("ERROR:"):
+        code = ERROR_CODES.get(response[len("ERROR:"):], ERROR_CODES["UNKNOWN_COMMAND"])
+        return encode_frame(Frame(seq, RSP_ERROR, bytes([code])))
+    if response == "IDLE":
+        return encode_frame(Frame(seq, RSP_STATUS, bytes([0, MODE_OFF]) + struct.pack(">H", 0)))
+    if response.startswith("ACTIVE:"):
+        _, mode, remaining = response.split(":")
+        payload = bytes([1, _mode_code(mode)]) + struct.pack(">H", min(int(remaining), 0xFFFF))
+        return encode_frame(Frame(seq, RSP_STATUS, payload))
+    if response.startswith("OK:STARTED:"):
+        _, _, mode, minutes = response.split(":")
+        return encode_frame(Frame(seq, RSP_OK, bytes([CMD_START, _mode_code(mode), int(minutes)])))
+    if response.startswith("OK:PROGRAM:"):
+        _, _, count, total = response.split(":")
+        return encode_frame(Frame(seq, RSP_OK, bytes([CMD_PROGRAM, int(count)]) + struct.pack(">H", int(total))))
+    for cmd, text in OK_TEXT.items():
+        if response == text:
+            return encode_frame(Frame(seq, RSP_OK, bytes([cmd])))
+    raise ProtocolError(f"cannot encode response: {response}")
+
+
+def decode_response(frame: Frame) -> str:
+    """응답 프레임 → 텍스트 응답 (SerialDeviceService가 기존 파싱을 그대로 사용)"""
+    payload = frame.payload
+    if frame.type == RSP_ERROR:
+        return "ERROR:" + ERRORS.get(payload[0] if payload else 0, "UNKNOWN")
+    if frame.type == RSP_STATUS:
+        if len(payload) != 4:
+            raise ProtocolError("bad status payload")
+        if not payload[0]:
+            return "IDLE"
+        (remaining,) = struct.unpack(">H", payload[2:4])
+        return f"ACTIVE:{_mode_name(payload[1])}:{remaining}"
+    if frame.type == RSP_OK and payload:
+        if payload[0] == CMD_START and len(payload) == 3:
+            return f"OK:STARTED:{_mode_name(payload[1])}:{payload[2]}"
+        if payload[0] == CMD_PROGRAM and len(payload) == 4:
+            (total,) = struct.unpack(">H", payload[2:4])
+            return f"OK:PROGRAM:{payload[1]}:{total}"
+        if payload[0] in OK_TEXT:
+            return OK_TEXT[payload[0]]
+        return "OK"
+    raise ProtocolError(f"unknown response frame: {frame!r}")
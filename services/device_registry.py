@@ -0,0 +1,243 @@
+"""
+다중 디바이스 레지스트리
+한 호스트에서 여러 LED 마스크를 동시에 제어 (클리닉 배포)
+
+- 디바이스 id별로 독립된 서비스 인스턴스(시리얼 포트 / BLE 주소)를 보관
+- 디바이스마다 전용 명령 큐(단일 워커)를 두어 같은 디바이스의 명령은 순서대로,
+  다른 디바이스의 명령은 동시에 실행 - 느린 디바이스가 다른 디바이스를 막지 않음
+- BLE/Mock 코루틴은 공유 디바이스 이벤트 루프에서 실행
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout, wait
+from typing import Any, Dict, List, Optional
+from core.logger import setup_logger
+from core.constants import DEVICE_CALL_TIMEOUT
+from utils.async_loop import get_device_loop
+
+logger = setup_logger(__name__)
+
+SERIAL = "SERIAL"
+MOCK = "MOCK"
+
+
+def _create_service(kind: str):
+    """연결 방식별 디바이스 서비스 인스턴스 생성 (싱글톤이 아닌 디바이스별 인스턴스)"""
+    if kind == SERIAL:
+        from services.serial_service import SerialDeviceService
+        return SerialDeviceService()
+    if kind == MOCK:
+        from services.ble_service_mock import BLEDeviceServiceMock
+        return BLEDeviceServiceMock()
+    raise ValueError(f"지원하지 않는 연결 방식: {kind}")
+
+
+class ManagedDevice:
+    """레지스트리에 등록된 디바이스 한 대"""
+
+    def __init__(self, device_id: str, kind: str, target: Optional[str]):
+        self.device_id = device_id
+        self.kind = kind
+        self.target = target  # 시리얼 포트 또는 BLE 주소
+        self.service = _create_service(kind)
+        # 디바이스별 명령 큐 (단일 워커 = 명령 순서 보장)
+        self._queue = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"device-{device_id}")
+
+    def submit(self, method: str, *args, timeout: float = DEVICE_CALL_TIMEOUT) -> Future:
+        """
+        서비스 메서드 호출을 디바이스 명령 큐에 등록
+
+        코루틴 메서드는 큐 워커가 디바이스 이벤트 루프에 넘기고 결과를 기다립니다.
+        """
+        def call():
+            result = getattr(self.service, method)(*args)
+            if asyncio.iscoroutine(result):
+                return get_device_loop().run(result, timeout)
+            return result
+        return self._queue.submit(call)
+
+    def call(self, method: str, *args, timeout: float = DEVICE_CALL_TIMEOUT) -> Any:
+        """
+        명령 큐를 거쳐 호출하고 결과 대기
+
+        Raises:
+            TimeoutError: 큐 대기 + 실행이 timeout을 넘긴 경우
+        """
+        future = self.submit(method, *args, timeout=timeout)
+        try:
+            return future.result(timeout)
+        except FutureTimeout:
+            future.cancel()
+            raise TimeoutError(f"디바이스 응답 시간 초과: {self.device_id} ({method})")
+
+    def close(self):
+        self._queue.shutdown(wait=False)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"device_id": self.device_id, "kind": self.kind, "target": self.target}
+
+
+class DeviceRegistry:
+    """디바이스 id → ManagedDevice"""
+
+    def __init__(self):
+        self._devices: Dict[str, ManagedDevice] = {}
+        self._targets: Dict[str, str] = {}  # 스캔으로 찾은 device_id → 포트 경로 / BLE 주소
+        self._lock = threading.Lock()
+
+    def scan(self, kinds: List[str], timeout: int = 10) -> List[Dict[str, Any]]:
+        """
+        연결 방식별 스캔을 동시에 실행
+
+        Args:
+            kinds: 스캔할 연결 방식 목록 (SERIAL, MOCK)
+            timeout: BLE 스캔 시간 (초)
+
+        Returns:
+            발견된 디바이스 목록 (device_id, kind, target 포함)
+        """
+        def scan_kind(kind):
+            service = _create_service(kind)
+            if kind == SERIAL:
+                # URL 경로에 쓸 수 있도록 포트 경로의 마지막 부분을 id로 사용 (/dev/ttyACM0 → ttyACM0)
+                return [
+                    {**port, "device_id": os.path.basename(port["port"]), "kind": kind, "target": port["port"]}
+                    for port in service.scan_devices()
+                ]
+            devices = get_device_loop().run(service.scan_devices(timeout=timeout), timeout + DEVICE_CALL_TIMEOUT)
+            return [
+                {**device, "device_id": device["address"], "kind": kind, "target": device["address"]}
+                for device in devices
+            ]
+
+        found = []
+        with ThreadPoolExecutor(max_workers=max(1, len(kinds))) as pool:
+            futures = {kind: pool.submit(scan_kind, kind) for kind in kinds}
+            for kind, future in futures.items():
+                try:
+                    found.extend(future.result())
+                except Exception as e:
+                    logger.error(f"{kind} 스캔 실패: {e}")
+
+        with self._lock:
+            self._targets.update({device["device_id"]: device["target"] for device in found})
+        return found
+
+    def connect(self, device_id: str, kind: str, target: Optional[str] = None) -> bool:
+        """
+        디바이스 등록 후 연결 (이미 등록된 id면 기존 연결 재사용)
+
+        Args:
+            device_id: 디바이스 id
+            kind: 연결 방식 (SERIAL, MOCK)
+            target: 시리얼 포트 또는 BLE 주소 (None이면 스캔 결과에서 device_id로 찾음)
+
+        Raises:
+            TimeoutError: 연결 응답 시간 초과 (등록은 취소됨)
+        """
+        if target is None:
+            target = self._resolve_target(device_id, kind)
+
+        with self._lock:
+            device = self._devices.get(device_id)
+            if device is None:
+                device = ManagedDevice(device_id, kind, target)
+                self._devices[device_id] = device
+
+        try:
+            connected = device.call("connect", device.target)
+        except Exception:
+            # 아직 진행 중인 연결이 끝나면 포트를 닫도록 큐에 해제를 넣고 등록 취소
+            device.submit("disconnect")
+            self._remove(device_id)
+            logger.error(f"디바이스 연결 실패: {device_id} ({kind} {device.target})")
+            raise
+        if not connected:
+            self._remove(device_id)
+        logger.info(f"디바이스 연결 {'성공' if connected else '실패'}: {device_id} ({kind} {device.target})")
+        return connected
+
+    def disconnect(self, device_id: str):
+        """디바이스 연결 해제 후 레지스트리에서 제거"""
+        device = self.get(device_id)
+        try:
+            device.call("disconnect")
+        finally:
+            self._remove(device_id)
+
+    def get(self, device_id: str) -> ManagedDevice:
+        """
+        등록된 디바이스 반환
+
+        Raises:
+            KeyError: 등록되지 않은 디바이스 id
+        """
+        with self._lock:
+            if device_id not in self._devices:
+                raise KeyError(device_id)
+            return self._devices[device_id]
+
+    def devices(self) -> List[ManagedDevice]:
+        with self._lock:
+            return list(self._devices.values())
+
+    def status_all(self, timeout: float = DEVICE_CALL_TIMEOUT) -> List[Dict[str, Any]]:
+        """
+        모든 디바이스 상태를 동시에 조회
+
+        timeout 안에 응답하지 않은 디바이스는 status="timeout"으로 표시됩니다.
+        """
+        futures = [(device, device.submit("get_status", timeout=timeout)) for device in self.devices()]
+        wait([future for _, future in futures], timeout)
+
+        results = []
+        for device, future in futures:
+            if not future.done():
+                future.cancel()
+                status = {"connected": device.service.is_connected(), "status": "timeout"}
+            elif future.exception() is not None:
+                status = {"connected": False, "status": "error", "error": str(future.exception())}
+            else:
+                status = future.result()
+            results.append({**device.to_dict(), **status})
+        return results
+
+    def _resolve_target(self, device_id: str, kind: str) -> str:
+        """
+        device_id → 연결 대상
+
+        스캔 결과에 있으면 그 대상을, 없으면 시리얼은 포트 이름(ttyACM0)이 같은 포트 경로를
+        찾고, 그래도 없으면 device_id를 그대로 사용합니다.
+        """
+        with self._lock:
+            target = self._targets.get(device_id)
+        if target:
+            return target
+        if kind == SERIAL:
+            from services.serial_service import SerialDeviceService
+            for port in SerialDeviceService().scan_devices():
+                if os.path.basename(port["port"]) == device_id:
+                    return port["port"]
+        return device_id
+
+    def _remove(self, device_id: str):
+        with self._lock:
+            device = self._devices.pop(device_id, None)
+        if device:
+            device.close()
+
+
+# 싱글톤 인스턴스
+_device_registry_instance: Optional[DeviceRegistry] = None
+_device_registry_lock = threading.Lock()
+
+
+def get_device_registry() -> DeviceRegistry:
+    """디바이스 레지스트리 싱글톤 인스턴스 획득"""
+    global _device_registry_instance
+    if _device_registry_instance is None:
+        with _device_registry_lock:
+            if _device_registry_instance is None:
+                _device_registry_instance = DeviceRegistry()
+    return _device_registry_instance
@@ -0,0 +1,254 @@
+"""
+가상 LED 마스크 디바이스 (pty 기반)
+실제 하드웨어 없이 시리얼 통신을 개발/테스트하기 위한 펌웨어 시뮬레이터
+
+의사 터미널(pty)을 열어 MySkinLED_XiaoBLE 펌웨어의 시리얼 출력(명령 에코,
+디버그 출력, 응답 줄)을 그대로 흉내 냅니다. port 경로를 SerialDeviceService.connect()에
+넘기면 실제 USB 포트처럼 사용할 수 있습니다. 바이너리 프레임 프로토콜도 지원하며,
+protocol_version=0이면 프로토콜 협상을 모르는 구 펌웨어처럼 동작합니다.
+
+    python -m services.device_simulator   # 포트 경로 출력 후 대기
+"""
+import os
+import select
+import threading
+import time
+import tty
+from typing import Optional
+from core.logger import setup_logger
+from services.device_protocol import (
+    PROTOCOL_VERSION, ERROR_CODES, RSP_ERROR, Frame, FrameParser, ProtocolError,
+    decode_command, encode_frame, encode_response, parse_program
+)
+
+logger = setup_logger(__name__)
+
+# 펌웨어 LED 모드 (RGB)
+FIRMWARE_MODES = {
+    "RED": (255, 0, 0),
+    "BLUE": (0, 0, 255),
+    "GOLD": (255, 215, 0)
+}
+
+
+class FakeSerialDevice:
+    """
+    pty 기반 가상 디바이스
+
+    Args:
+        response_delay: 명령 처리 후 응답까지의 지연 (초, 느린 디바이스 흉내)
+        boot_delay: 시작 후 명령을 받기 시작할 때까지의 지연 (초, 부팅 흉내)
+        protocol_version: 지원하는 바이너리 프로토콜 버전 (0이면 텍스트 전용 구 펌웨어)
+    """
+
+    def __init__(self, response_delay: float = 0.0, boot_delay: float = 0.0, protocol_version: int = PROTOCOL_VERSION):
+        self.response_delay = response_delay
+        self.boot_delay = boot_delay
+        self.protocol_version = protocol_version
+        self._master: Optional[int] = None
+        self._slave: Optional[int] = None
+        self.port: Optional[str] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.received = []  # 받은 명령 기록 (바이너리 명령은 텍스트로 변환해 기록)
+        self.frames_received = 0
+
+        self._mode = "OFF"
+        self._phases = []      # [{"mode", "seconds", ...}] - START는 단일 단계 프로그램
+        self._phase_index = 0
+        self._phase_started_at = 0.0
+        self._active = False
+
+    def start(self) -> str:
+        """pty를 열고 펌웨어 스레드 시작 (포트 경로 반환)"""
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._master)
+        tty.setraw(self._slave)
+        self.port = os.ttyname(self._slave)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="fake-serial-device", daemon=True)
+        self._thread.start()
+        logger.info(f"가상 디바이스 시작: {self.port}")
+        return self.port
+
+    def stop(self):
+        """펌웨어 스레드 종료 후 pty 닫기"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=1)
+        for fd in (self._master, self._slave):
+            if fd is not None:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+        self._master = self._slave = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _write(self, line: str):
+        os.write(self._master, (line + "\r\n").encode("utf-8"))
+
+    def _write_bytes(self, data: bytes):
+        os.write(self._master, data)
+
+    def _run(self):
+        self._write("MySkin LED Mask - Xiao BLE")
+        self._write("Initializing...")
+        if self.boot_delay:
+            # 부팅 중 받은 입력은 수신 버퍼에 쌓였다가 부팅 후 처리됨 (실제 UART와 동일)
+            time.sleep(self.boot_delay)
+        self._write("Ready!")
+
+        parser = FrameParser()
+        while not self._stop.is_set():
+            data = self._read(0.05)
+            if data is None:
+                return
+            for kind, item in parser.feed(data):
+                if kind == "line":
+                    self._handle(item)
+                elif kind == "frame" and self.protocol_version >= 1:
+                    self._handle_frame(item)
+            self._update()
+
+    def _read(self, timeout: float) -> Optional[bytes]:
+        try:
+            ready, _, _ = select.select([self._master], [], [], timeout)
+            return os.read(self._master, 1024) if ready else b""
+        except (OSError, ValueError, TypeError):
+            return None
+
+    def _handle(self, command: str):
+        self.received.append(command)
+        self._write(f"Serial command received: {command}")
+        response = self.process_command(command)
+        if self.response_delay:
+            time.sleep(self.response_delay)
+        self._write(response)
+
+    def _handle_frame(self, frame: Frame):
+        """바이너리 명령 처리 (에코 줄 없이 같은 SEQ의 응답 프레임 전송)"""
+        self.frames_received += 1
+        if frame.version > self.protocol_version:
+            self._write_bytes(encode_frame(Frame(frame.seq, RSP_ERROR, bytes([ERROR_CODES["UNSUPPORTED_VERSION"]]))))
+            return
+        try:
+            command = decode_command(frame)
+        except ProtocolError as e:
+            self._write_bytes(encode_frame(Frame(frame.seq, RSP_ERROR, bytes([ERROR_CODES[str(e)]]))))
+            return
+        self.received.append(command)
+        response = self.process_command(command)
+        if self.response_delay:
+            time.sleep(self.response_delay)
+        self._write_bytes(encode_response(response, frame.seq))
+
+    def process_command(self, cmd: str) -> str:
+        """펌웨어 processCommand()와 같은 규칙으로 명령 처리 (응답 반환)"""
+        cmd = cmd.strip().upper()
+
+        if cmd.startswith("PROTO:") and self.protocol_version >= 1:
+            try:
+                requested = int(cmd[len("PROTO:"):])
+            except ValueError:
+                return "ERROR:INVALID_FORMAT"
+            return f"OK:PROTO:{min(requested, self.protocol_version)}"
+
+        if cmd.startswith("START:"):
+            parts = cmd.split(":")
+            if len(parts) < 3:
+                self._write("Invalid command format")
+                return "ERROR:INVALID_FORMAT"
+            mode = parts[1].strip()
+            try:
+                duration = int(parts[2])
+            except ValueError:
+                duration = 0
+            if not 0 < duration <= 60:
+                self._write("Invalid duration (must be 1-60 minutes)")
+                return "ERROR:INVALID_DURATION"
+            self._start_therapy(mode, duration)
+            return f"OK:STARTED:{mode}:{duration}"
+
+        if cmd.startswith("PROGRAM:"):
+            try:
+                phases = parse_program(cmd)
+            except ProtocolError as e:
+                return f"ERROR:{e}"
+            self._start_program(phases)
+            return f"OK:PROGRAM:{len(phases)}:{sum(p['seconds'] for p in phases)}"
+
+        if cmd == "STOP":
+            self._stop_therapy()
+            return "OK:STOPPED"
+
+        if cmd == "STATUS":
+            if self._active:
+                elapsed = time.monotonic() - self._phase_started_at
+                remaining = int(sum(p["seconds"] for p in self._phases[self._phase_index:]) - elapsed)
+                return f"ACTIVE:{self._mode}:{max(0, remaining)}"
+            return "IDLE"
+
+        if cmd == "TEST":
+            self._write("Running LED test sequence...")
+            return "OK:TEST_COMPLETED"
+
+        self._write("Unknown command: " + cmd)
+        return "ERROR:UNKNOWN_COMMAND"
+
+    def _start_therapy(self, mode: str, duration_min: int):
+        self._write(f"Starting therapy: {mode} for {duration_min} minutes")
+        if mode not in FIRMWARE_MODES:
+            self._write("Invalid mode: " + mode)
+            return
+        self._phases = [{"mode": mode, "seconds": duration_min * 60, "pwm_start": 255, "pwm_end": 255, "ramp_seconds": 0}]
+        self._enter_phase(0)
+        self._active = True
+
+    def _start_program(self, phases):
+        self._write(f"Starting program: {len(phases)} phases")
+        self._phases = phases
+        self._enter_phase(0)
+        self._active = True
+
+    def _enter_phase(self, index: int):
+        phase = self._phases[index]
+        if len(self._phases) > 1:
+            self._write(f"Phase {index + 1}/{len(self._phases)}: {phase['mode']} for {phase['seconds']} seconds")
+        r, g, b = (c * phase["pwm_start"] // 255 for c in FIRMWARE_MODES[phase["mode"]])
+        self._write(f"LED Color set to R:{r} G:{g} B:{b}")
+        self._phase_index = index
+        self._phase_started_at = time.monotonic()
+        self._mode = phase["mode"]
+
+    def _stop_therapy(self):
+        self._write("Stopping therapy")
+        self._active = False
+        self._mode = "OFF"
+        self._write("LED Color set to R:0 G:0 B:0")
+
+    def _update(self):
+        if not self._active:
+            return
+        if time.monotonic() - self._phase_started_at >= self._phases[self._phase_index]["seconds"]:
+            if self._phase_index + 1 < len(self._phases):
+                self._enter_phase(self._phase_index + 1)
+            else:
+                self._write("Therapy completed!")
+                self._stop_therapy()
+
+
+if __name__ == "__main__":
+    with FakeSerialDevice() as device:
+        print(f"가상 디바이스 포트: {device.port} (Ctrl+C로 종료)")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,162 @@
+"""
+디바이스 상태 브로드캐스트 허브
+
+연결된 모든 클라이언트(SSE)가 하나의 디바이스 상태 구독을 공유합니다.
+- 구독자가 있을 때만 전용 스레드가 동작하며, 디바이스 조회는 구독자 수와 무관하게
+  DEVICE_STATUS_RESYNC_INTERVAL마다 한 번 (또는 refresh() 직후) 실행
+- 그 사이의 남은 시간 카운트다운은 마지막 조회 결과에서 로컬로 계산해 tick 이벤트로 전송
+- 상태(연결/진행/모드)가 바뀔 때만 status 이벤트 전송
+"""
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Set
+from core.logger import setup_logger
+from core.constants import DEVICE_STATUS_RESYNC_INTERVAL, DEVICE_STATUS_TICK_INTERVAL, DEVICE_STATUS_QUEUE_SIZE
+
+logger = setup_logger(__name__)
+
+
+class DeviceStatusHub:
+    """
+    디바이스 상태 구독 공유
+
+    Args:
+        fetch_status: 디바이스 상태 dict를 반환하는 함수 (get_status와 같은 형식)
+        resync_interval: 디바이스 재조회 주기 (초)
+        tick_interval: 카운트다운 tick 주기 (초)
+    """
+
+    def __init__(
+        self,
+        fetch_status: Callable[[], Dict[str, Any]],
+        resync_interval: float = DEVICE_STATUS_RESYNC_INTERVAL,
+        tick_interval: float = DEVICE_STATUS_TICK_INTERVAL
+    ):
+        self.fetch_status = fetch_status
+        self.resync_interval = resync_interval
+        self.tick_interval = tick_interval
+        self._subscribers: Set[queue.Queue] = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()      # 대기 중인 스레드 깨우기 (재조회 요청 / 마지막 구독자 해제)
+        self._refresh_requested = False     # refresh()로 요청된 즉시 재조회
+        self._thread: Optional[threading.Thread] = None
+        self._status: Optional[Dict[str, Any]] = None
+        self._fetched_at = 0.0
+        self.fetches = 0
+
+    def subscribe(self) -> queue.Queue:
+        """
+        구독 등록 (이벤트 큐 반환)
+
+        큐 항목은 (event, data) 튜플이며, 마지막 상태가 있으면 바로 받습니다.
+        """
+        q: queue.Queue = queue.Queue(maxsize=DEVICE_STATUS_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.add(q)
+            if self._status is not None:
+                q.put_nowait(("status", self._snapshot()))
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="device-status-hub", daemon=True)
+                self._thread.start()
+        return q
+
+    def unsubscribe(self, q: queue.Queue):
+        """구독 해제 (마지막 구독자가 나가면 스레드 종료)"""
+        with self._lock:
+            self._subscribers.discard(q)
+            last = not self._subscribers
+        # 남은 구독자가 있으면 깨우지 않음 (클라이언트 해제마다 디바이스를 재조회하지 않도록)
+        if last:
+            self._wake.set()
+
+    def refresh(self):
+        """즉시 재조회 요청 (테라피 시작/중지 등 상태 변경 직후)"""
+        with self._lock:
+            self._refresh_requested = True
+        self._wake.set()
+
+    def latest(self, max_age: float) -> Optional[Dict[str, Any]]:
+        """
+        max_age초 이내에 조회한 상태 반환 (없으면 None)
+
+        남은 시간은 현재 시각 기준으로 보정됩니다.
+        """
+        with self._lock:
+            if self._status is None or time.monotonic() - self._fetched_at > max_age:
+                return None
+            return self._snapshot()
+
+    def stats(self) -> Dict[str, Any]:
+        """구독자 수 / 디바이스 조회 횟수"""
+        with self._lock:
+            return {"subscribers": len(self._subscribers), "fetches": self.fetches}
+
+    def _snapshot(self) -> Dict[str, Any]:
+        """마지막 상태 사본 (남은 시간 로컬 보정, self._lock 보유 상태에서 호출)"""
+        status = dict(self._status)
+        if "remaining_seconds" in status:
+            elapsed = int(time.monotonic() - self._fetched_at)
+            status["remaining_seconds"] = max(0, status["remaining_seconds"] - elapsed)
+        return status
+
+    @staticmethod
+    def _state_key(status: Dict[str, Any]):
+        return status.get("connected"), status.get("status"), status.get("mode"), status.get("therapy_mode")
+
+    def _fetch(self) -> Dict[str, Any]:
+        try:
+            status = self.fetch_status()
+        except Exception as e:
+            logger.error(f"디바이스 상태 조회 실패: {e}")
+            status = {"connected": False, "status": "error", "error": str(e)}
+        self.fetches += 1
+        return status
+
+    def _run(self):
+        logger.info("디바이스 상태 구독 시작")
+        while True:
+            with self._lock:
+                if not self._subscribers:
+                    self._thread = None
+                    logger.info("디바이스 상태 구독 종료 (구독자 없음)")
+                    return
+                due = (self._status is None or self._refresh_requested
+                       or time.monotonic() - self._fetched_at >= self.resync_interval)
+                self._refresh_requested = False
+                self._wake.clear()
+
+            if due:
+                status = self._fetch()
+                with self._lock:
+                    changed = self._status is None or self._state_key(status) != self._state_key(self._status)
+                    self._status = status
+                    self._fetched_at = time.monotonic()
+                    event = ("status", self._snapshot()) if changed else None
+                if event:
+                    self._publish(event)
+
+            with self._lock:
+                active = self._status is not None and self._status.get("status") == "active"
+                tick = ("tick", {"remaining_seconds": self._snapshot().get("remaining_seconds")}) if active else None
+            if tick:
+                self._publish(tick)
+
+            self._wake.wait(self.tick_interval)
+
+    def _publish(self, event):
+        """모든 구독자에게 전송 (가득 찬 큐는 가장 오래된 이벤트를 버림)"""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            try:
+                q.put_nowait(event)
+            except queue.Full:
+                try:
+                    q.get_nowait()
+                except queue.Empty:
+                    pass
+                try:
+                    q.put_nowait(event)
+                except queue.Full:
+                    pass
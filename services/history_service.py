@@ -2,14 +2,43 @@
 분석 히스토리 관리 서비스
 """
 from datetime import datetime
-from models.database import AnalysisHistory, User, ChatHistory, SessionLocal
-from core.constants import MAX_HISTORY_ITEMS
+import threading
+from sqlalchemy import func
+from models.database import AnalysisHistory, RegionScore, User, SessionLocal
+from core.constants import (
+    MAX_HISTORY_ITEMS, SERIES_DEFAULT_POINTS, SERIES_MAX_POINTS, SERIES_DEFAULT_WINDOW,
+    PROFILE_CACHE_SIZE, PROFILE_CACHE_TTL, USERS_PAGE_SIZE, USERS_MAX_PAGE_SIZE, LED_RESCORE_BATCH_SIZE
+)
 from core.logger import setup_logger
-from werkzeug.security import generate_password_hash, check_password_hash
+from services.led_service import LEDService
+from services.population_service import PopulationStatsService
+from services.purge_service import get_user_purge_worker
+from utils.cache import TTLCache
+from utils.timeseries import BUCKETS, bucketize, moving_average, lttb
+from services.auth_service import get_password_hasher, get_login_tracker
 
 logger = setup_logger(__name__)
 
 
+class UserDeletedError(Exception):
+    """삭제 처리 중인 사용자에 대한 요청 (정리가 끝날 때까지 읽기/쓰기 거부)"""
+
+
+def _ensure_active_user(db, user_id, lock=False):
+    """
+    삭제 표시된 사용자면 UserDeletedError
+
+    lock=True면 사용자 행을 잠가 같은 트랜잭션의 쓰기가 삭제 요청과 직렬화되도록 합니다
+    (삭제 표시 이후에 쓰인 행이 정리 작업을 지나쳐 남지 않음).
+    """
+    query = db.query(User.deleted_at).filter(User.user_id == user_id)
+    if lock:
+        query = query.with_for_update()
+    user = query.first()
+    if user and user.deleted_at:
+        raise UserDeletedError("삭제 처리 중인 사용자입니다.")
+
+
 class HistoryService:
     """히스토리 관리 서비스"""
 
@@ -27,6 +56,8 @@ class HistoryService:
         """
         db = SessionLocal()
         try:
+            _ensure_active_user(db, user_id, lock=True)
+
             # 타임스탬프 처리
             timestamp_str = analysis_data.get('timestamp')
             if timestamp_str and isinstance(timestamp_str, str):
@@ -45,6 +76,10 @@ class HistoryService:
             )
 
             db.add(new_record)
+            db.flush()
+
+            # 부위별 점수/메트릭 정규화 행 저장 (분석 쿼리용)
+            db.add_all(new_record.build_region_rows())
             db.commit()
             db.refresh(new_record)
 
@@ -64,6 +99,77 @@ class HistoryService:
         finally:
             db.close()
 
+    @staticmethod
+    def ensure_active_user(user_id):
+        """
+        삭제 처리 중인 사용자인지 확인
+
+        Raises:
+            UserDeletedError: 삭제 표시된 사용자
+        """
+        db = SessionLocal()
+        try:
+            _ensure_active_user(db, user_id)
+        finally:
+            db.close()
+
+    @staticmethod
+    def rescore_recommendations(batch_size=LED_RESCORE_BATCH_SIZE, weights=None, thresholds=None):
+        """
+        저장된 모든 분석의 LED 추천 재계산 (추천 가중치/구간 변경 후)
+
+        id 순서로 batch_size개씩 읽어 LEDService.recommend_batch로 한 번에 채점하고,
+        추천이 달라진 기록만 갱신합니다.
+
+        Args:
+            batch_size: 배치당 기록 수
+            weights: 부위 → 문제 가중치 표 (None이면 기본값)
+            thresholds: 시간 구간 표 (None이면 기본값)
+
+        Returns:
+            dict: {"scanned": int, "updated": int}
+        """
+        scanned = updated = 0
+        last_id = 0
+        while True:
+            db = SessionLocal()
+            try:
+                rows = db.query(AnalysisHistory.id, AnalysisHistory.overall_score,
+                                AnalysisHistory.regions, AnalysisHistory.recommendation)\
+                    .filter(AnalysisHistory.id > last_id)\
+                    .order_by(AnalysisHistory.id)\
+                    .limit(batch_size)\
+                    .all()
+                if not rows:
+                    break
+
+                recommendations = LEDService.recommend_batch(
+                    [{"overall_score": row.overall_score, "regions": row.regions or {}} for row in rows],
+                    weights=weights,
+                    thresholds=thresholds
+                )
+                changes = [
+                    {"id": row.id, "recommendation": recommendation}
+                    for row, recommendation in zip(rows, recommendations)
+                    if row.recommendation != recommendation
+                ]
+                if changes:
+                    db.bulk_update_mappings(AnalysisHistory, changes)
+                    db.commit()
+
+                scanned += len(rows)
+                updated += len(changes)
+                last_id = rows[-1].id
+            except Exception as e:
+                db.rollback()
+                logger.error(f"❌ LED 추천 재계산 오류: {e}")
+                raise
+            finally:
+                db.close()
+
+        logger.info(f"💡 LED 추천 재계산 완료: {scanned}건 중 {updated}건 갱신")
+        return {"scanned": scanned, "updated": updated}
+
     @staticmethod
     def get_user_history(user_id, limit=MAX_HISTORY_ITEMS):
         """
@@ -78,6 +184,8 @@ class HistoryService:
         """
         db = SessionLocal()
         try:
+            _ensure_active_user(db, user_id)
+
             # 데이터베이스에서 조회 (최신순)
             records = db.query(AnalysisHistory)\
                 .filter(AnalysisHistory.user_id == user_id)\
@@ -114,19 +222,26 @@ class HistoryService:
         """
         db = SessionLocal()
         try:
-            # 전체 히스토리 조회
-            records = db.query(AnalysisHistory)\
+            _ensure_active_user(db, user_id)
+
+            # 전체 점수 조회 (regions JSON은 로드하지 않음)
+            records = db.query(AnalysisHistory.id, AnalysisHistory.overall_score)\
                 .filter(AnalysisHistory.user_id == user_id)\
                 .order_by(AnalysisHistory.timestamp.desc())\
                 .all()
 
             if not records:
+                # 분석이 있는 사용자와 같은 형식 (백분위는 계산할 점수가 없으므로 비움)
                 return {
                     "user_id": user_id,
                     "total_analyses": 0,
                     "average_score": 0,
                     "trend": "neutral",
-                    "region_stats": {}
+                    "region_stats": {},
+                    "latest_score": 0,
+                    "best_score": 0,
+                    "worst_score": 0,
+                    "percentiles": {"overall": None, "regions": {}}
                 }
 
             # 통계 계산
@@ -144,17 +259,34 @@ class HistoryService:
             else:
                 trend = "stable"
 
-            # 부위별 통계
-            region_stats = {}
-            for record in records:
-                for region_name, region_data in record.regions.items():
-                    if region_name not in region_stats:
-                        region_stats[region_name] = []
-                    region_stats[region_name].append(region_data.get('score', 0))
+            # 부위별 통계 (정규화 테이블에서 집계)
+            region_rows = db.query(
+                    RegionScore.region,
+                    func.avg(func.coalesce(RegionScore.score, 0))
+                )\
+                .filter(RegionScore.user_id == user_id)\
+                .group_by(RegionScore.region)\
+                .all()
 
             region_averages = {
-                region: round(sum(scores) / len(scores), 1)
-                for region, scores in region_stats.items()
+                region: round(float(avg), 1)
+                for region, avg in region_rows
+            }
+
+            # 모집단 내 백분위 (최신 분석 기준, 사전 계산된 룩업 테이블 사용)
+            user = db.query(User.skin_type, User.gender).filter(User.user_id == user_id).first()
+            skin_type, gender = (user.skin_type, user.gender) if user else (None, None)
+
+            latest_regions = db.query(RegionScore.region, RegionScore.score)\
+                .filter(RegionScore.analysis_id == records[0].id)\
+                .all()
+
+            percentiles = {
+                "overall": PopulationStatsService.get_percentile_rank(scores[0], "overall", skin_type, gender),
+                "regions": {
+                    region: PopulationStatsService.get_percentile_rank(score, region, skin_type, gender)
+                    for region, score in latest_regions
+                }
             }
 
             return {
@@ -165,7 +297,8 @@ class HistoryService:
                 "region_stats": region_averages,
                 "latest_score": scores[0] if scores else 0,
                 "best_score": max(scores) if scores else 0,
-                "worst_score": min(scores) if scores else 0
+                "worst_score": min(scores) if scores else 0,
+                "percentiles": percentiles
             }
 
         except Exception as e:
@@ -175,6 +308,107 @@ class HistoryService:
         finally:
             db.close()
 
+    @staticmethod
+    def get_score_series(user_id, bucket="day", points=SERIES_DEFAULT_POINTS, window=SERIES_DEFAULT_WINDOW):
+        """
+        차트용 점수 시계열 조회 (버킷 집계 + 이동 평균 + LTTB 다운샘플링)
+
+        Args:
+            user_id: 사용자 ID
+            bucket: 집계 단위 ("day" / "week" / "month")
+            points: 시계열당 최대 점 개수
+            window: 이동 평균 윈도우 (버킷 개수)
+
+        Returns:
+            dict: {"overall": [...], "regions": {region: [...]}}
+        """
+        if bucket not in BUCKETS:
+            raise ValueError(f"지원하지 않는 bucket입니다: {bucket} (day, week, month 중 선택)")
+        points = max(2, min(int(points), SERIES_MAX_POINTS))
+        window = max(1, int(window))
+
+        db = SessionLocal()
+        try:
+            _ensure_active_user(db, user_id)
+
+            overall_rows = db.query(AnalysisHistory.timestamp, AnalysisHistory.overall_score)\
+                .filter(AnalysisHistory.user_id == user_id)\
+                .all()
+
+            region_rows = db.query(RegionScore.region, RegionScore.timestamp, RegionScore.score)\
+                .filter(RegionScore.user_id == user_id)\
+                .all()
+
+            region_samples = {}
+            for region, timestamp, score in region_rows:
+                region_samples.setdefault(region, []).append((timestamp, score))
+
+            return {
+                "user_id": user_id,
+                "bucket": bucket,
+                "window": window,
+                "total_analyses": len(overall_rows),
+                "overall": HistoryService._build_series(overall_rows, bucket, points, window),
+                "regions": {
+                    region: HistoryService._build_series(samples, bucket, points, window)
+                    for region, samples in sorted(region_samples.items())
+                }
+            }
+
+        except Exception as e:
+            logger.error(f"❌ 시계열 조회 오류: {e}")
+            raise
+
+        finally:
+            db.close()
+
+    @staticmethod
+    def _build_series(samples, bucket, points, window):
+        """버킷 집계 → 이동 평균 → LTTB 다운샘플링 후 JSON 직렬화 가능한 리스트로 변환"""
+        series = bucketize(samples, bucket)
+        averages = moving_average([p["score"] for p in series], window)
+        for p, avg in zip(series, averages):
+            p["moving_avg"] = avg
+
+        series = lttb(series, points, x=lambda p: p["t"].timestamp(), y=lambda p: p["score"])
+
+        return [
+            {
+                "t": p["t"].date().isoformat(),
+                "score": round(p["score"], 1),
+                "moving_avg": round(p["moving_avg"], 1),
+                "count": p["count"]
+            }
+            for p in series
+        ]
+
+
+# 프로필 read-through 캐시 (save_profile / delete_user / 로그인 시 갱신)
+_profile_cache = TTLCache(maxsize=PROFILE_CACHE_SIZE, ttl=PROFILE_CACHE_TTL)
+# 사용자별 무효화 횟수 - 조회 도중 삭제된 프로필을 캐시에 되살리지 않도록 비교 후 저장
+_profile_versions = {}
+_profile_versions_lock = threading.Lock()
+
+
+def _profile_version(user_id):
+    """DB 조회 전에 읽어 두는 프로필 캐시 버전"""
+    with _profile_versions_lock:
+        return _profile_versions.get(user_id, 0)
+
+
+def _cache_profile(user_id, profile, version):
+    """조회 이후 무효화가 없었을 때만 캐시에 저장"""
+    with _profile_versions_lock:
+        if _profile_versions.get(user_id, 0) == version:
+            _profile_cache.set(user_id, profile)
+
+
+def _invalidate_profile(user_id):
+    """프로필 캐시 무효화 (커밋 이후 호출)"""
+    with _profile_versions_lock:
+        _profile_versions[user_id] = _profile_versions.get(user_id, 0) + 1
+        _profile_cache.delete(user_id)
+
 
 class ProfileService:
     """사용자 프로필 관리 서비스"""
@@ -190,14 +424,24 @@ class ProfileService:
         Returns:
             dict: 저장 결과
         """
+        user_id = profile_data.get('user_id')
+        version = _profile_version(user_id)
+
         db = SessionLocal()
         try:
-            user_id = profile_data.get('user_id')
             if not user_id:
                 raise ValueError("user_id is required")
 
+            # 해시는 사용자 행을 잠그기 전에 계산 (느린 해시 동안 행 잠금을 잡고 있지 않도록)
+            hasher = get_password_hasher()
+            password = profile_data.get('password')
+            password_hash = hasher.hash(password) if password else None
+
             # 기존 사용자 조회
-            existing_user = db.query(User).filter(User.user_id == user_id).first()
+            existing_user = db.query(User).filter(User.user_id == user_id).with_for_update().first()
+
+            if existing_user and existing_user.deleted_at:
+                raise UserDeletedError("삭제 처리 중인 사용자입니다. 잠시 후 다시 시도해주세요.")
 
             if existing_user:
                 # 업데이트
@@ -208,19 +452,21 @@ class ProfileService:
                 existing_user.goals = profile_data.get('goals', existing_user.goals)
                 
                 # 비밀번호가 제공된 경우에만 업데이트
-                password = profile_data.get('password')
-                if password:
-                    existing_user.password_hash = generate_password_hash(password)
+                if password_hash:
+                    existing_user.password_hash = password_hash
                 
                 existing_user.updated_at = datetime.now()
 
                 db.commit()
                 logger.info(f"📝 프로필 업데이트 완료: {user_id}")
 
+                profile = existing_user.to_dict()
+                _cache_profile(user_id, profile, version)
+
                 return {
                     "success": True,
                     "message": "프로필이 업데이트되었습니다.",
-                    "profile": existing_user.to_dict()
+                    "profile": profile
                 }
 
             else:
@@ -232,7 +478,7 @@ class ProfileService:
                     gender=profile_data.get('gender'),
                     concerns=profile_data.get('concerns', []),
                     goals=profile_data.get('goals', ''),
-                    password_hash=generate_password_hash(profile_data.get('password', '1234')) # 기본값 1234
+                    password_hash=password_hash or hasher.hash(profile_data.get('password', '1234')) # 기본값 1234
                 )
  
                 db.add(new_user)
@@ -241,10 +487,13 @@ class ProfileService:
 
                 logger.info(f"📝 새 프로필 생성 완료: {user_id}")
 
+                profile = new_user.to_dict()
+                _cache_profile(user_id, profile, version)
+
                 return {
                     "success": True,
                     "message": "프로필이 생성되었습니다.",
-                    "profile": new_user.to_dict()
+                    "profile": profile
                 }
 
         except Exception as e:
@@ -258,7 +507,7 @@ class ProfileService:
     @staticmethod
     def get_profile(user_id):
         """
-        프로필 조회
+        프로필 조회 (read-through 캐시)
 
         Args:
             user_id: 사용자 ID
@@ -266,14 +515,26 @@ class ProfileService:
         Returns:
             dict: 프로필 데이터
         """
+        profile = _profile_cache.get(user_id)
+        if profile is not None:
+            return {
+                "success": True,
+                "profile": profile
+            }
+
+        version = _profile_version(user_id)
         db = SessionLocal()
         try:
-            user = db.query(User).filter(User.user_id == user_id).first()
+            user = db.query(User)\
+                .filter(User.user_id == user_id, User.deleted_at.is_(None))\
+                .first()
 
             if user:
+                profile = user.to_dict()
+                _cache_profile(user_id, profile, version)
                 return {
                     "success": True,
-                    "profile": user.to_dict()
+                    "profile": profile
                 }
             else:
                 return {
@@ -292,44 +553,99 @@ class ProfileService:
     def verify_login(user_id, password):
         """
         사용자 로그인 검증
+
+        해시 검증은 전용 스레드 풀에서 수행하고, DB 세션은 검증 전에 반환합니다.
+        last_login_at은 LoginTracker가 모아서 저장하며, 설정과 다른 방식의
+        해시는 검증 성공 시 재해시합니다.
         """
+        version = _profile_version(user_id)
         db = SessionLocal()
         try:
-            user = db.query(User).filter(User.user_id == user_id).first()
-            if user and user.password_hash:
-                if check_password_hash(user.password_hash, password):
-                    user.last_login_at = datetime.now()
-                    db.commit()
-                    return {"success": True, "profile": user.to_dict()}
-            
+            user = db.query(User)\
+                .filter(User.user_id == user_id, User.deleted_at.is_(None))\
+                .first()
+            if not user:
+                return {"success": False, "error": "아이디 또는 비밀번호가 일치하지 않습니다."}
+            password_hash = user.password_hash
+            profile = user.to_dict()
+        except Exception as e:
+            logger.error(f"❌ 로그인 검증 오류: {e}")
+            return {"success": False, "error": str(e)}
+        finally:
+            db.close()
+
+        try:
+            hasher = get_password_hasher()
+
             # 초기 버전 호환성: 비밀번호가 없는 경우 user_id만으로 로그인 허용 (선택 사항)
-            if user and not user.password_hash:
-                 user.last_login_at = datetime.now()
-                 db.commit()
-                 return {"success": True, "profile": user.to_dict()}
+            if password_hash and not hasher.verify(password_hash, password):
+                return {"success": False, "error": "아이디 또는 비밀번호가 일치하지 않습니다."}
+
+            if password_hash and hasher.needs_rehash(password_hash):
+                ProfileService._rehash_password(user_id, password_hash, hasher.hash(password))
+
+            now = datetime.now()
+            get_login_tracker().record(user_id, now)
+            profile['last_login_at'] = now.isoformat()
+            _cache_profile(user_id, profile, version)
+            return {"success": True, "profile": profile}
 
-            return {"success": False, "error": "아이디 또는 비밀번호가 일치하지 않습니다."}
         except Exception as e:
             logger.error(f"❌ 로그인 검증 오류: {e}")
             return {"success": False, "error": str(e)}
+
+    @staticmethod
+    def _rehash_password(user_id, old_hash, new_hash):
+        """기존 해시가 그대로일 때만 새 해시로 교체 (동시 비밀번호 변경 보호)"""
+        db = SessionLocal()
+        try:
+            db.query(User)\
+                .filter(User.user_id == user_id, User.password_hash == old_hash)\
+                .update({User.password_hash: new_hash}, synchronize_session=False)
+            db.commit()
+            logger.info(f"🔐 비밀번호 재해시 완료: {user_id}")
+        except Exception as e:
+            db.rollback()
+            logger.error(f"❌ 비밀번호 재해시 오류: {e}")
         finally:
             db.close()
 
     @staticmethod
-    def get_all_users():
+    def get_all_users(limit=USERS_PAGE_SIZE, after=None):
         """
-        모든 사용자 목록 조회
+        사용자 목록 조회 (user_id 기준 keyset 페이징, 필요한 컬럼만 조회)
+
+        Args:
+            limit: 페이지 크기
+            after: 이전 페이지의 next_cursor (마지막 user_id)
 
         Returns:
-            list: 사용자 목록 ({user_id, name})
+            dict: {"users": [{user_id, name, created_at}], "next_cursor": str | None}
         """
+        limit = max(1, min(int(limit), USERS_MAX_PAGE_SIZE))
+
         db = SessionLocal()
         try:
-            users = db.query(User).all()
-            return [
-                {"user_id": u.user_id, "name": u.name, "created_at": u.created_at.isoformat()}
-                for u in users
-            ]
+            query = db.query(User.user_id, User.name, User.created_at)\
+                .filter(User.deleted_at.is_(None))
+            if after:
+                query = query.filter(User.user_id > after)
+
+            rows = query.order_by(User.user_id.asc()).limit(limit + 1).all()
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+
+            return {
+                "users": [
+                    {
+                        "user_id": row.user_id,
+                        "name": row.name,
+                        "created_at": row.created_at.isoformat() if row.created_at else None
+                    }
+                    for row in rows
+                ],
+                "next_cursor": rows[-1].user_id if has_more else None
+            }
         except Exception as e:
             logger.error(f"❌ 사용자 목록 조회 오류: {e}")
             raise
@@ -339,24 +655,24 @@ class ProfileService:
     @staticmethod
     def delete_user(user_id):
         """
-        사용자 및 관련 데이터 삭제
+        사용자 삭제 요청
+
+        사용자를 삭제 표시만 하고 즉시 반환합니다. 연관 데이터와 사용자 행은
+        UserPurgeWorker가 배치 단위로 정리합니다.
         """
         db = SessionLocal()
         try:
-            # 사용자 조회
-            user = db.query(User).filter(User.user_id == user_id).first()
-            if not user:
+            updated = db.query(User)\
+                .filter(User.user_id == user_id, User.deleted_at.is_(None))\
+                .update({User.deleted_at: datetime.now()}, synchronize_session=False)
+            if not updated:
                 return {"success": False, "error": "사용자를 찾을 수 없습니다."}
+            db.commit()
+            _invalidate_profile(user_id)
 
-            # 연관 데이터 삭제 (AnalysisHistory, ChatHistory)
-            db.query(AnalysisHistory).filter(AnalysisHistory.user_id == user_id).delete()
-            db.query(ChatHistory).filter(ChatHistory.user_id == user_id).delete()
+            get_user_purge_worker().notify()
 
-            # 사용자 삭제
-            db.delete(user)
-            db.commit()
-            
-            logger.info(f"🗑️ 사용자 삭제 완료: {user_id}")
+            logger.info(f"🗑️ 사용자 삭제 요청 완료: {user_id}")
             return {"success": True, "message": "사용자가 삭제되었습니다."}
             
         except Exception as e:
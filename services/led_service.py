@@ -1,11 +1,46 @@
 """
 LED 추천 엔진 서비스
+
+부위→문제 가중치, 시간 구간, 강도 규칙은 core.constants의 표로 정의되며,
+여러 분석 결과를 NumPy 행렬 연산으로 한 번에 채점합니다 (히스토리 재계산 / 가중치 튜닝용).
 """
-from core.constants import LED_MODES, DEVICE_CONFIG, LED_DURATION_THRESHOLDS
+import numpy as np
+from core.constants import (
+    LED_MODES, DEVICE_CONFIG, LED_DURATION_THRESHOLDS, LED_ISSUES, LED_REGION_ISSUE_WEIGHTS,
+    LED_MODE_REASONS, LED_DEFAULT_REGION_SCORE, LED_WEAK_REGION_SCORE, LED_INTENSITY_SCALE, LED_INTENSITY_RANGE
+)
 from core.logger import setup_logger
 
 logger = setup_logger(__name__)
 
+# 문제 유형 → LED 모드 (LED_MODES의 target_issues)
+ISSUE_MODES = [
+    next(mode for mode, info in LED_MODES.items() if issue in info["target_issues"])
+    for issue in LED_ISSUES
+]
+
+
+def build_weight_matrix(weights):
+    """
+    부위 → 문제 가중치 표를 행렬로 변환
+
+    Args:
+        weights: {region: {issue: weight}} (LED_REGION_ISSUE_WEIGHTS 형식)
+
+    Returns:
+        (region_index, matrix): 부위 이름 → 행 번호, (부위 수 + 1) × 문제 수 행렬
+        (마지막 행은 표에 없는 부위용 0 행)
+    """
+    region_index = {region: i for i, region in enumerate(weights)}
+    matrix = np.zeros((len(region_index) + 1, len(LED_ISSUES)))
+    for region, issue_weights in weights.items():
+        for issue, weight in issue_weights.items():
+            matrix[region_index[region], LED_ISSUES.index(issue)] = weight
+    return region_index, matrix
+
+
+_DEFAULT_WEIGHTS = build_weight_matrix(LED_REGION_ISSUE_WEIGHTS)
+
 
 class LEDService:
     """LED 모드 추천 서비스"""
@@ -28,70 +63,99 @@ class LEDService:
                 "ble_command": str
             }
         """
-        regions = analysis_results.get("regions", {})
-        overall_score = analysis_results.get("overall_score", 75)
-
-        # 1. 부위별 문제 점수 집계
-        issue_scores = {
-            "wrinkle": 0,
-            "elasticity": 0,
-            "pigmentation": 0,
-            "acne": 0,
-            "pore": 0
-        }
-
-        weak_regions = []
-
-        for region_name, data in regions.items():
-            score = data.get("score", 75)
-            if score < 70:
-                weak_regions.append(region_name)
-
-            # 부위별 특성에 따라 문제 유형 가중치 부여
-            if region_name in ["forehead", "eye_l", "eye_r"]:
-                issue_scores["wrinkle"] += (100 - score) * 0.3
-                issue_scores["elasticity"] += (100 - score) * 0.2
-            elif region_name in ["cheek_l", "cheek_r"]:
-                issue_scores["pore"] += (100 - score) * 0.25
-                issue_scores["pigmentation"] += (100 - score) * 0.2
-            elif region_name == "chin":
-                issue_scores["acne"] += (100 - score) * 0.3
-
-        # 2. 가장 심각한 문제 찾기
-        main_issue = max(issue_scores, key=issue_scores.get)
-        issue_severity = issue_scores[main_issue]
-
-        # 3. LED 모드 선택
-        if main_issue in ["acne", "pore"]:
-            mode = "blue"
-            reason = "모공 및 피지 문제 집중 케어"
-        elif main_issue in ["wrinkle", "elasticity"]:
-            mode = "red"
-            reason = "주름 및 탄력 개선 집중"
-        else:
-            mode = "gold"
-            reason = "색소 침착 및 피부톤 개선"
-
-        # 4. 시간 조정 (문제가 심각할수록 길게)
-        if issue_severity > 40:
-            duration = 25
-        elif issue_severity > 25:
-            duration = 20
-        else:
-            duration = 15
-
-        # 5. 강도 계산 (향후 BLE PWM 제어용)
-        intensity = min(100, max(50, int(issue_severity * 1.5)))
-
-        return {
-            "mode": mode,
-            "duration": duration,
-            "reason": reason,
-            "target_regions": weak_regions,
-            "intensity": intensity,
-            "ble_command": f"START:{mode.upper()}:{duration}",
-            "issue_analysis": {k: round(v, 2) for k, v in issue_scores.items()}
-        }
+        return LEDService.recommend_batch([analysis_results])[0]
+
+    @staticmethod
+    def recommend_batch(analyses, weights=None, thresholds=None):
+        """
+        여러 분석 결과의 LED 추천을 한 번에 계산
+
+        Args:
+            analyses: 분석 결과 리스트 (recommend와 같은 형식)
+            weights: 부위 → 문제 가중치 표 (None이면 LED_REGION_ISSUE_WEIGHTS)
+            thresholds: 시간 구간 표 (None이면 LED_DURATION_THRESHOLDS)
+
+        Returns:
+            list: 분석 결과 순서대로 recommend 결과
+        """
+        if not analyses:
+            return []
+
+        region_index, matrix = _DEFAULT_WEIGHTS if weights is None else build_weight_matrix(weights)
+        unknown = len(region_index)
+
+        # 1. 부위 점수를 (분석 × 부위) 행렬로 - 부위 순서는 분석별 입력 순서 유지, 빈 칸은 결함 0
+        regions = [analysis.get("regions", {}) for analysis in analyses]
+        names = [list(items) for items in regions]
+        width = max(len(items) for items in names)
+        rows = np.array([
+            [region_index.get(name, unknown) for name in items] + [unknown] * (width - len(items))
+            for items in names
+        ], dtype=np.intp).reshape(len(analyses), width)
+        scores = np.array([
+            [data.get("score", LED_DEFAULT_REGION_SCORE) for data in items.values()] + [100.0] * (width - len(items))
+            for items in regions
+        ], dtype=float).reshape(len(analyses), width)
+
+        # 2. 문제 점수 = Σ 결함 × 가중치 (부위 순서대로 누적해 단건 계산과 부동소수점까지 동일)
+        region_weights = matrix[rows]                                # (분석, 부위, 문제)
+        contributions = (100 - scores)[:, :, None] * region_weights
+        issue_scores = np.zeros((len(analyses), len(LED_ISSUES)))
+        for r in range(width):
+            issue_scores += contributions[:, r]
+        scored = (region_weights != 0).any(axis=1)                   # 점수가 한 번이라도 누적된 문제
+
+        # 3. 가장 심각한 문제 (동점이면 LED_ISSUES 순서상 앞)
+        main_issue = issue_scores.argmax(axis=1)
+        severity = issue_scores[np.arange(len(analyses)), main_issue]
+
+        # 4. 시간: 심각도가 구간 값을 넘는 첫 구간 (가장 낮은 구간은 나머지 전부)
+        levels = sorted((thresholds or LED_DURATION_THRESHOLDS).values(), reverse=True)
+        durations = np.select(
+            [severity > level for level, _ in levels[:-1]],
+            [duration for _, duration in levels[:-1]],
+            default=levels[-1][1]
+        )
+
+        # 5. 강도 (테라피 프로그램 PWM 제어용)
+        low, high = LED_INTENSITY_RANGE
+        intensities = np.clip(np.trunc(severity * LED_INTENSITY_SCALE), low, high)
+
+        # 6. 결과 dict 구성 (행렬 → 파이썬 값 한 번에 변환)
+        weak = (scores < LED_WEAK_REGION_SCORE).tolist()
+        results = []
+        for items, is_weak, issue, duration, intensity, issue_row, scored_row in zip(
+            names, weak, main_issue.tolist(), durations.tolist(), intensities.tolist(),
+            issue_scores.tolist(), scored.tolist()
+        ):
+            mode = ISSUE_MODES[issue]
+            results.append({
+                "mode": mode,
+                "duration": int(duration),
+                "reason": LED_MODE_REASONS[mode],
+                "target_regions": [name for name, flag in zip(items, is_weak) if flag],
+                "intensity": int(intensity),
+                "ble_command": f"START:{mode.upper()}:{int(duration)}",
+                "issue_analysis": {
+                    name: round(value, 2) if flag else 0
+                    for name, value, flag in zip(LED_ISSUES, issue_row, scored_row)
+                }
+            })
+        return results
+
+    @staticmethod
+    def intensity(severity):
+        """
+        문제 심각도 → LED 강도
+
+        Args:
+            severity: 문제 점수
+
+        Returns:
+            int: 강도 (50-100)
+        """
+        low, high = LED_INTENSITY_RANGE
+        return min(high, max(low, int(severity * LED_INTENSITY_SCALE)))
 
     @staticmethod
     def get_device_config():
@@ -0,0 +1,219 @@
+"""
+모집단 점수 분위수 서비스
+
+주기적 배치로 전체/부위별 점수 분위수를 skin_type, gender 세그먼트별로 계산해
+score_percentiles 룩업 테이블에 저장하고, 요청 시 이분 탐색으로 백분위를 반환합니다.
+
+배치 실행: python -m services.population_service
+"""
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import func
+
+from models.database import AnalysisHistory, RegionScore, ScorePercentile, User, SessionLocal
+from core.config import POPULATION_STATS_INTERVAL
+from core.constants import PERCENTILE_ALL_SEGMENT, PERCENTILE_MIN_SAMPLES, PERCENTILE_CACHE_TTL
+from core.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+ALL = PERCENTILE_ALL_SEGMENT
+
+
+class PopulationStatsService:
+    """모집단 분위수 계산 및 조회 서비스"""
+
+    _cache = {}
+    _cache_loaded_at = 0.0
+    _cache_lock = threading.Lock()
+
+    @staticmethod
+    def compute_percentiles():
+        """
+        분위수 룩업 테이블 재계산 (배치 작업)
+
+        사용자당 최신 분석 1건(가장 큰 id)만 표본으로 사용하고 삭제 처리 중인 사용자는 제외하며, 각 metric("overall" 또는 부위)에 대해
+        (skin_type, gender), (skin_type, *), (*, gender), (*, *) 세그먼트를 모두 계산합니다.
+
+        Returns:
+            int: 저장된 룩업 행 수
+        """
+        db = SessionLocal()
+        try:
+            # 사용자별 최신 분석 id (DB에서 집계)
+            latest_ids = db.query(func.max(AnalysisHistory.id).label("id"))\
+                .group_by(AnalysisHistory.user_id)\
+                .subquery()
+
+            # 프로필이 없는 사용자(anonymous 등)는 유지, 삭제 표시된 사용자는 제외
+            rows = db.query(
+                    AnalysisHistory.id,
+                    AnalysisHistory.overall_score,
+                    User.skin_type,
+                    User.gender
+                )\
+                .join(latest_ids, latest_ids.c.id == AnalysisHistory.id)\
+                .outerjoin(User, User.user_id == AnalysisHistory.user_id)\
+                .filter(User.deleted_at.is_(None))\
+                .yield_per(1000)
+
+            samples = {}
+            segments_by_analysis = {}
+            for row in rows:
+                segments = PopulationStatsService._segments(row.skin_type, row.gender)
+                segments_by_analysis[row.id] = segments
+                if row.overall_score is not None:
+                    for segment in segments:
+                        samples.setdefault(("overall",) + segment, []).append(row.overall_score)
+
+            region_rows = db.query(RegionScore.analysis_id, RegionScore.region, RegionScore.score)\
+                .join(latest_ids, latest_ids.c.id == RegionScore.analysis_id)\
+                .filter(RegionScore.score.isnot(None))\
+                .yield_per(1000)
+
+            for analysis_id, region, score in region_rows:
+                segments = segments_by_analysis.get(analysis_id)
+                if segments is None:
+                    continue
+                for segment in segments:
+                    samples.setdefault((region,) + segment, []).append(score)
+
+            computed_at = datetime.utcnow()
+            lookups = [
+                ScorePercentile(
+                    metric=metric,
+                    skin_type=skin_type,
+                    gender=gender,
+                    sample_count=len(values),
+                    cutpoints=[round(float(v), 2) for v in np.percentile(values, np.arange(101))],
+                    computed_at=computed_at
+                )
+                for (metric, skin_type, gender), values in samples.items()
+            ]
+
+            # 전체 교체 (룩업 테이블은 작으므로 단일 트랜잭션)
+            db.query(ScorePercentile).delete()
+            db.add_all(lookups)
+            db.commit()
+
+            PopulationStatsService.invalidate_cache()
+            logger.info(f"📊 분위수 룩업 갱신 완료: 사용자 {len(segments_by_analysis)}명, {len(lookups)}개 세그먼트")
+            return len(lookups)
+
+        except Exception as e:
+            db.rollback()
+            logger.error(f"❌ 분위수 계산 오류: {e}")
+            raise
+
+        finally:
+            db.close()
+
+    @staticmethod
+    def get_percentile_rank(score, metric="overall", skin_type=None, gender=None):
+        """
+        점수의 모집단 내 백분위 조회 (O(log n))
+
+        표본이 부족한 세그먼트는 (skin_type, *) → (*, gender) → (*, *) 순으로 대체합니다.
+
+        Args:
+            score: 점수
+            metric: "overall" 또는 부위 이름
+            skin_type: 피부 타입 (없으면 전체)
+            gender: 성별 (없으면 전체)
+
+        Returns:
+            dict | None: {"percentile", "sample_count", "segment"} (룩업이 없으면 None)
+        """
+        if score is None:
+            return None
+
+        lookups = PopulationStatsService._load_cache()
+        for segment in PopulationStatsService._segments(skin_type, gender):
+            lookup = lookups.get((metric,) + segment)
+            if lookup is None:
+                continue
+            cutpoints, sample_count = lookup
+            if sample_count < PERCENTILE_MIN_SAMPLES and segment != (ALL, ALL):
+                continue
+
+            # 동점 구간은 중앙값으로 처리
+            low = bisect_left(cutpoints, score)
+            high = bisect_right(cutpoints, score)
+            percentile = max(0.0, min(100.0, (low + high - 1) / 2))
+
+            return {
+                "percentile": round(percentile, 1),
+                "sample_count": sample_count,
+                "segment": {"skin_type": segment[0], "gender": segment[1]}
+            }
+
+        return None
+
+    @staticmethod
+    def invalidate_cache():
+        """룩업 메모리 캐시 무효화"""
+        with PopulationStatsService._cache_lock:
+            PopulationStatsService._cache_loaded_at = 0.0
+
+    @staticmethod
+    def _load_cache():
+        """룩업 테이블을 메모리에 적재 (TTL 기반 재적재)"""
+        cls = PopulationStatsService
+        with cls._cache_lock:
+            if cls._cache_loaded_at and time.monotonic() - cls._cache_loaded_at < PERCENTILE_CACHE_TTL:
+                return cls._cache
+
+            db = SessionLocal()
+            try:
+                cls._cache = {
+                    (row.metric, row.skin_type, row.gender): (row.cutpoints, row.sample_count)
+                    for row in db.query(ScorePercentile).all()
+                }
+                cls._cache_loaded_at = time.monotonic()
+            finally:
+                db.close()
+            return cls._cache
+
+    @staticmethod
+    def _segments(skin_type, gender):
+        """세그먼트 목록 (구체적 → 전체 순, 중복 제거)"""
+        skin_type = skin_type or ALL
+        gender = gender or ALL
+        segments = [(skin_type, gender), (skin_type, ALL), (ALL, gender), (ALL, ALL)]
+        return list(dict.fromkeys(segments))
+
+
+# 앱 내 주기 실행 스케줄러
+_scheduler_thread = None
+
+
+def start_population_scheduler(interval=POPULATION_STATS_INTERVAL):
+    """
+    분위수 배치를 주기적으로 실행하는 데몬 스레드 시작
+
+    Args:
+        interval: 실행 주기 (초, 0 이하이면 시작하지 않음)
+    """
+    global _scheduler_thread
+    if interval <= 0 or _scheduler_thread is not None:
+        return
+
+    def run():
+        while True:
+            try:
+                PopulationStatsService.compute_percentiles()
+            except Exception as e:
+                logger.error(f"❌ 분위수 배치 실패: {e}")
+            time.sleep(interval)
+
+    _scheduler_thread = threading.Thread(target=run, name="population-stats", daemon=True)
+    _scheduler_thread.start()
+    logger.info(f"📊 분위수 배치 스케줄러 시작 (주기 {interval}초)")
+
+
+if __name__ == '__main__':
+    PopulationStatsService.compute_percentiles()
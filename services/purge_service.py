@@ -0,0 +1,147 @@
+"""
+사용자 삭제 백그라운드 정리 서비스
+
+ProfileService.delete_user는 사용자를 삭제 표시(deleted_at)만 하고,
+연관 데이터(analysis_history, chat_history)는 이 서비스가 제한된 크기의 배치로
+나눠 삭제한 뒤 마지막에 사용자 행을 삭제합니다. 처리 중 프로세스가 종료되어도
+deleted_at이 남아 있으므로 다음 실행 때 이어서 정리합니다.
+"""
+import threading
+
+from models.database import AnalysisHistory, ChatHistory, ChatSummary, RegionMetric, RegionScore, User, SessionLocal
+from core.constants import USER_PURGE_BATCH_SIZE, USER_PURGE_INTERVAL
+from core.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class UserPurgeService:
+    """삭제 표시된 사용자의 연관 데이터를 배치 단위로 정리"""
+
+    @staticmethod
+    def purge_user(user_id, batch_size=USER_PURGE_BATCH_SIZE):
+        """
+        사용자 한 명의 연관 데이터와 사용자 행 삭제
+
+        Args:
+            user_id: 사용자 ID
+            batch_size: 배치당 삭제 행 수
+
+        Returns:
+            dict: 삭제된 행 수
+        """
+        analyses = UserPurgeService._delete_in_batches(
+            AnalysisHistory, user_id, batch_size, children=(RegionScore, RegionMetric)
+        )
+        chats = UserPurgeService._delete_in_batches(ChatHistory, user_id, batch_size)
+
+        db = SessionLocal()
+        try:
+            db.query(ChatSummary)\
+                .filter(ChatSummary.user_id == user_id)\
+                .delete(synchronize_session=False)
+            db.query(User)\
+                .filter(User.user_id == user_id, User.deleted_at.isnot(None))\
+                .delete(synchronize_session=False)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        logger.info(f"🗑️ 사용자 데이터 정리 완료: {user_id} (분석 {analyses}건, 상담 {chats}건)")
+        return {"analysis_history": analyses, "chat_history": chats}
+
+    @staticmethod
+    def purge_pending(batch_size=USER_PURGE_BATCH_SIZE):
+        """
+        삭제 표시된 모든 사용자 정리
+
+        Returns:
+            int: 정리된 사용자 수
+        """
+        db = SessionLocal()
+        try:
+            user_ids = [
+                row.user_id for row in
+                db.query(User.user_id).filter(User.deleted_at.isnot(None)).all()
+            ]
+        finally:
+            db.close()
+
+        for user_id in user_ids:
+            UserPurgeService.purge_user(user_id, batch_size)
+        return len(user_ids)
+
+    @staticmethod
+    def _delete_in_batches(model, user_id, batch_size, children=()):
+        """id 기준으로 batch_size개씩 삭제하고 배치마다 커밋 (락 유지 시간 제한)"""
+        total = 0
+        while True:
+            db = SessionLocal()
+            try:
+                ids = [
+                    row.id for row in
+                    db.query(model.id)
+                    .filter(model.user_id == user_id)
+                    .order_by(model.id)
+                    .limit(batch_size)
+                    .all()
+                ]
+                if not ids:
+                    return total
+
+                # FK CASCADE가 없는 기존 DB에서도 고아 행이 남지 않도록 명시적으로 삭제
+                for child in children:
+                    db.query(child)\
+                        .filter(child.analysis_id.in_(ids))\
+                        .delete(synchronize_session=False)
+                db.query(model)\
+                    .filter(model.id.in_(ids))\
+                    .delete(synchronize_session=False)
+                db.commit()
+                total += len(ids)
+
+            except Exception:
+                db.rollback()
+                raise
+
+            finally:
+                db.close()
+
+
+class UserPurgeWorker:
+    """삭제 요청 시 깨어나고, 주기적으로 남은 삭제를 재확인하는 백그라운드 워커"""
+
+    def __init__(self, interval=USER_PURGE_INTERVAL):
+        self.interval = interval
+        self._wake = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="user-purge", daemon=True)
+        self._thread.start()
+
+    def notify(self):
+        """새 삭제 요청 알림"""
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.clear()
+            try:
+                UserPurgeService.purge_pending()
+            except Exception as e:
+                logger.error(f"❌ 사용자 데이터 정리 오류: {e}")
+            self._wake.wait(self.interval)
+
+
+_purge_worker_instance = None
+_purge_worker_lock = threading.Lock()
+
+
+def get_user_purge_worker():
+    """UserPurgeWorker 싱글톤 인스턴스 반환"""
+    global _purge_worker_instance
+    with _purge_worker_lock:
+        if _purge_worker_instance is None:
+            _purge_worker_instance = UserPurgeWorker()
+    return _purge_worker_instance
@@ -3,9 +3,14 @@ import logging
 import io
 from PIL import Image
 from core.config import GPU_SERVER_URL
+from utils.sse import iter_sse
+from services.response_cache import get_response_cache, context_namespace
+from services.chat_context_service import ChatContextService
 
 logger = logging.getLogger(__name__)
 
+CACHE_NAMESPACE = "remote"
+
 class RemoteChatbotService:
     """원격 GPU 서버를 통한 챗봇 서비스"""
 
@@ -13,23 +18,37 @@ class RemoteChatbotService:
         self.base_url = GPU_SERVER_URL.rstrip('/')
         logger.info(f"Using Remote Chatbot Service at {self.base_url}")
 
-    def generate_response(self, message, image=None):
+    @staticmethod
+    def _build_files(image):
+        files = {}
+        if image:
+            # Handle Image (can be file storage, PIL Image or raw bytes)
+            img_byte_arr = io.BytesIO()
+
+            if isinstance(image, bytes):
+                img_byte_arr.write(image)
+            elif isinstance(image, Image.Image):
+                image.save(img_byte_arr, format='JPEG')
+            else:
+                # If it's a FileStorage object from Flask
+                image.save(img_byte_arr)
+                img_byte_arr.seek(0)
+
+            files['image'] = ('image.jpg', img_byte_arr.getvalue(), 'image/jpeg')
+        return files
+
+    def generate_response(self, message, image=None, context=None):
+        # 텍스트 전용 질문은 응답 캐시 확인 (질문 원문을 키로, 붙은 컨텍스트별로 구분)
+        cache = get_response_cache() if not image else None
+        namespace = context_namespace(CACHE_NAMESPACE, context)
+        if cache is not None:
+            cached = cache.get(message, namespace)
+            if cached is not None:
+                return cached
+
         try:
-            data = {'message': message}
-            files = {}
-
-            if image:
-                # Handle Image (can be file storage or PIL Image)
-                img_byte_arr = io.BytesIO()
-                
-                if isinstance(image, Image.Image):
-                    image.save(img_byte_arr, format='JPEG')
-                else:
-                    # If it's a FileStorage object from Flask
-                    image.save(img_byte_arr)
-                    img_byte_arr.seek(0)
-                
-                files['image'] = ('image.jpg', img_byte_arr.getvalue(), 'image/jpeg')
+            data = {'message': ChatContextService.with_context(message, context)}
+            files = self._build_files(image)
 
             logger.info("📡 Sending chatbot request to GPU server...")
             response = requests.post(
@@ -42,6 +61,8 @@ class RemoteChatbotService:
             if response.status_code == 200:
                 result = response.json()
                 if result.get("success"):
+                    if cache is not None:
+                        cache.set(message, result["reply"], namespace)
                     return result["reply"]
                 else:
                     logger.error(f"Remote Chatbot Error: {result}")
@@ -56,5 +77,59 @@ class RemoteChatbotService:
             traceback.print_exc()
             return "죄송합니다. 답변을 생성하는 도중 오류가 발생했습니다."
 
+    def stream_response(self, message, image=None, context=None):
+        """
+        GPU 서버의 SSE 스트림을 그대로 중계
+
+        {"token": ...}을 받는 대로 내보내고 마지막에 {"reply": ...}를 내보냅니다.
+        서버가 스트리밍을 지원하지 않으면(404) 일반 응답으로 대체합니다.
+        """
+        cache = get_response_cache() if not image else None
+        namespace = context_namespace(CACHE_NAMESPACE, context)
+        if cache is not None:
+            cached = cache.get(message, namespace)
+            if cached is not None:
+                yield {"reply": cached}
+                return
+
+        try:
+            data = {'message': ChatContextService.with_context(message, context)}
+            files = self._build_files(image)
+
+            logger.info("📡 Streaming chatbot request to GPU server...")
+            with requests.post(
+                f"{self.base_url}/api/v1/chatbot/stream",
+                data=data,
+                files=files if files else None,
+                stream=True,
+                timeout=(10, 300)
+            ) as response:
+                if response.status_code == 404:
+                    image_bytes = files['image'][1] if files else None
+                    yield {"reply": self.generate_response(message, image_bytes, context)}
+                    return
+
+                response.raise_for_status()
+                chunks = []
+                for event, payload in iter_sse(response.iter_lines(decode_unicode=True)):
+                    if event == "error":
+                        raise RuntimeError(payload.get("error"))
+                    if event == "done":
+                        reply = payload.get("reply", "".join(chunks))
+                        if cache is not None:
+                            cache.set(message, reply, namespace)
+                        yield {"reply": reply}
+                        return
+                    token = payload.get("token")
+                    if token:
+                        chunks.append(token)
+                        yield {"token": token}
+
+                yield {"reply": "".join(chunks)}
+
+        except Exception as e:
+            logger.error(f"❌ Remote chatbot stream failed: {e}")
+            yield {"reply": "죄송합니다. 답변을 생성하는 도중 오류가 발생했습니다."}
+
 def get_remote_chatbot_service():
     return RemoteChatbotService()
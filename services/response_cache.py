@@ -0,0 +1,217 @@
+"""
+챗봇 응답 캐시
+
+자주 반복되는 텍스트 질문("모공 줄이는 법", "파란 LED 효과")의 답변을 재사용해
+Vertex AI / GPU 서버 호출을 생략합니다.
+
+- 정확 일치: 정규화한 질문의 해시
+- 유사 일치 (선택): RESPONSE_CACHE_EMBEDDING_MODEL이 설정되면 질문 임베딩의
+  코사인 유사도로 가장 가까운 캐시 항목을 찾습니다.
+"""
+import hashlib
+import re
+import threading
+
+import numpy as np
+
+from core.config import RESPONSE_CACHE_EMBEDDING_MODEL
+from core.constants import RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL, RESPONSE_CACHE_SIMILARITY
+from utils.cache import TTLCache
+from core.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_question(message):
+    """캐시 키용 질문 정규화 (대소문자, 공백, 끝 문장부호 무시)"""
+    return _WHITESPACE.sub(" ", message).strip().lower().rstrip("?!.~ ")
+
+
+def context_namespace(namespace, context=None):
+    """
+    대화 컨텍스트(분석 요약 / 대화 기록)별 캐시 네임스페이스
+
+    같은 질문이라도 붙은 컨텍스트가 다르면 답변이 달라지므로 컨텍스트 해시로 구분합니다.
+    컨텍스트가 없는 질문은 사용자와 무관하게 기본 네임스페이스를 공유합니다.
+    """
+    if not context:
+        return namespace
+    return f"{namespace}:{hashlib.sha256(context.encode('utf-8')).hexdigest()[:16]}"
+
+
+class ResponseCache:
+    """
+    텍스트 전용 챗봇 응답 캐시
+
+    Args:
+        maxsize: 최대 항목 수
+        ttl: 항목 유지 시간 (초)
+        embedding_model: sentence-transformers 모델 이름 (None이면 정확 일치만)
+        similarity: 유사 일치로 판단할 최소 코사인 유사도
+    """
+
+    def __init__(self, maxsize=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL,
+                 embedding_model=None, similarity=RESPONSE_CACHE_SIMILARITY):
+        self._cache = TTLCache(maxsize, ttl)
+        self.similarity = similarity
+        self._embedding_model_name = embedding_model
+        self._encoder = None
+        self._lock = threading.Lock()
+        # 유사 검색용 벡터 인덱스 (정규화된 임베딩 행렬과 키 목록)
+        self._keys = []
+        self._namespaces = []
+        self._vectors = None
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(namespace, question):
+        return hashlib.sha256(f"{namespace}\n{question}".encode("utf-8")).hexdigest()
+
+    def get(self, message, namespace="default"):
+        """
+        캐시된 답변 조회
+
+        Args:
+            message: 사용자 질문
+            namespace: 응답 출처 구분 (서비스별로 후처리가 다를 수 있음)
+
+        Returns:
+            str | None: 캐시된 답변
+        """
+        question = normalize_question(message)
+        if not question:
+            return None
+
+        reply = self._cache.get(self._key(namespace, question))
+        if reply is not None:
+            with self._lock:
+                self.exact_hits += 1
+            return reply
+
+        reply = self._semantic_get(namespace, question)
+        with self._lock:
+            if reply is not None:
+                self.semantic_hits += 1
+            else:
+                self.misses += 1
+        return reply
+
+    def set(self, message, reply, namespace="default"):
+        """답변 저장 (정상 응답만 호출할 것)"""
+        question = normalize_question(message)
+        if not question or not reply:
+            return
+
+        key = self._key(namespace, question)
+        self._cache.set(key, reply)
+
+        # 만료/축출 후 다시 저장된 키는 기존 인덱스 행을 그대로 사용 (같은 질문 = 같은 벡터)
+        with self._lock:
+            indexed = key in self._keys
+        if not indexed:
+            vector = self._embed(question)
+            if vector is not None:
+                with self._lock:
+                    if key in self._keys:
+                        return
+                    self._keys.append(key)
+                    self._namespaces.append(namespace)
+                    self._vectors = vector[None, :] if self._vectors is None else np.vstack([self._vectors, vector])
+                    if len(self._keys) > self._cache.maxsize:
+                        self._prune()
+
+    def _semantic_get(self, namespace, question):
+        vector = self._embed(question)
+        if vector is None:
+            return None
+
+        with self._lock:
+            if self._vectors is None:
+                return None
+            scores = self._vectors @ vector
+            # 다른 네임스페이스(출처/대화 컨텍스트)의 답변은 유사해도 사용하지 않음
+            scores[np.array(self._namespaces) != namespace] = -np.inf
+            best = int(np.argmax(scores))
+            if scores[best] < self.similarity:
+                return None
+            key = self._keys[best]
+
+        reply = self._cache.get(key)
+        if reply is None:
+            with self._lock:
+                self._prune()
+        return reply
+
+    def _prune(self):
+        """만료/축출된 항목을 벡터 인덱스에서 제거 (self._lock 보유 상태에서 호출)"""
+        alive = [i for i, key in enumerate(self._keys) if key in self._cache]
+        self._keys = [self._keys[i] for i in alive]
+        self._namespaces = [self._namespaces[i] for i in alive]
+        self._vectors = self._vectors[alive] if alive else None
+
+    def _embed(self, question):
+        """질문의 정규화된 임베딩 (모델이 없으면 None, 네임스페이스 구분은 검색 시 마스크로 처리)"""
+        encoder = self._get_encoder()
+        if encoder is None:
+            return None
+        try:
+            vector = encoder.encode(question, normalize_embeddings=True)
+            return np.asarray(vector, dtype=np.float32)
+        except Exception as e:
+            logger.warning(f"⚠️ 질문 임베딩 실패: {e}")
+            return None
+
+    def _get_encoder(self):
+        if self._embedding_model_name is None:
+            return None
+        with self._lock:
+            if self._encoder is None:
+                try:
+                    from sentence_transformers import SentenceTransformer
+                    self._encoder = SentenceTransformer(self._embedding_model_name)
+                    logger.info(f"✅ 응답 캐시 임베딩 모델 로드: {self._embedding_model_name}")
+                except Exception as e:
+                    # 임베딩 모델을 쓸 수 없으면 정확 일치만 사용
+                    logger.warning(f"⚠️ 응답 캐시 임베딩 모델 로드 실패, 정확 일치만 사용: {e}")
+                    self._embedding_model_name = None
+                    return None
+            return self._encoder
+
+    def stats(self):
+        """캐시 적중 통계"""
+        with self._lock:
+            total = self.exact_hits + self.semantic_hits + self.misses
+            return {
+                "size": len(self._cache),
+                "maxsize": self._cache.maxsize,
+                "indexed": len(self._keys),
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.exact_hits + self.semantic_hits) / total, 3) if total else 0.0
+            }
+
+    def clear(self):
+        """전체 무효화"""
+        with self._lock:
+            self._cache.clear()
+            self._keys = []
+            self._namespaces = []
+            self._vectors = None
+
+
+_response_cache_instance = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """ResponseCache 싱글톤 인스턴스 반환"""
+    global _response_cache_instance
+    with _response_cache_lock:
+        if _response_cache_instance is None:
+            _response_cache_instance = ResponseCache(embedding_model=RESPONSE_CACHE_EMBEDDING_MODEL)
+    return _response_cache_instance
@@ -1,16 +1,57 @@
 """
 USB 시리얼 통신 서비스
 Seeed Xiao BLE와 USB 케이블로 직접 연결
+
+전용 리더 스레드가 수신 바이트를 줄 단위로 나누고, 응답 줄을 보낸 순서대로
+대기 중인 명령에 연결합니다. 명령은 디바이스가 응답하는 즉시 완료되며,
+응답이 없으면 명령별 제한 시간 후 TimeoutError가 발생합니다.
+
+펌웨어가 바이너리 프레임 프로토콜(services.device_protocol)을 지원하면 연결 시
+협상해 사용하며, 응답은 순서가 아닌 시퀀스 번호로 명령에 연결됩니다.
 """
 import serial
 import serial.tools.list_ports
+import os
+import threading
 import time
-from typing import Optional, Dict, Any, List
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout, as_completed
+from typing import Optional, Dict, Any, List, Callable
 from core.logger import setup_logger
-from core.constants import DEVICE_CONFIG
+from core.config import SERIAL_BINARY_PROTOCOL
+from core.constants import (
+    DEVICE_CONFIG, SERIAL_READ_TIMEOUT, SERIAL_COMMAND_TIMEOUT, SERIAL_COMMAND_TIMEOUTS, SERIAL_READY_TIMEOUT, SERIAL_PROBE_TIMEOUT
+)
+from services.device_cache import get_device_cache
+from services.device_protocol import PROTOCOL_VERSION, FrameParser, ProtocolError, encode_command, decode_response
 
 logger = setup_logger(__name__)
 
+# 펌웨어가 명령을 받으면 출력하는 에코 줄 (응답 순서 재동기화에 사용)
+ECHO_PREFIX = "Serial command received:"
+# 명령 응답 줄 (그 외 줄은 펌웨어 디버그 출력)
+RESPONSE_PREFIXES = ("OK", "ERROR", "ACTIVE:")
+RESPONSE_LINES = ("IDLE", "COMPLETED")
+
+
+def is_response_line(line: str) -> bool:
+    """펌웨어 출력 줄이 명령 응답인지 확인"""
+    return line.startswith(RESPONSE_PREFIXES) or line in RESPONSE_LINES
+
+
+class _PendingCommand:
+    """응답을 기다리는 명령"""
+
+    def __init__(self, command: str, default_timeout: float = SERIAL_COMMAND_TIMEOUT):
+        self.command = command
+        self.future: Future = Future()
+        # 명령 이름(":" 앞)별 응답 대기 시간 - TEST처럼 오래 실행된 뒤 응답하는 명령
+        self.timeout = SERIAL_COMMAND_TIMEOUTS.get(command.split(":", 1)[0], default_timeout)
+        # 디바이스가 명령 에코를 보냄 (수신 확인 - 응답이 반드시 뒤따름)
+        self.echoed = False
+        # 제한 시간이 지나 호출자가 포기한 명령 - 늦게 온 응답은 이 자리에서 버려짐
+        self.abandoned = False
+
 
 class SerialDeviceService:
     """시리얼 디바이스 통신 서비스"""
@@ -20,7 +61,18 @@ class SerialDeviceService:
         self.serial_port: Optional[serial.Serial] = None
         self.port_name: Optional[str] = None
         self.baud_rate = 115200
+        self.command_timeout = SERIAL_COMMAND_TIMEOUT
         self._connected = False
+        self._reader: Optional[threading.Thread] = None
+        self._stop_reader = threading.Event()
+        self._pending: deque = deque()   # 텍스트 명령 (응답 순서로 연결)
+        self._pending_seq: Dict[int, _PendingCommand] = {}  # 바이너리 명령 (시퀀스 번호로 연결)
+        self._seq = 0
+        self.protocol_version = 0        # 0: 텍스트, 1 이상: 바이너리 프레임
+        self._pending_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self.device_log: deque = deque(maxlen=100)  # 최근 펌웨어 디버그 출력
+        self._listeners: List[Callable[[str], None]] = []
 
     def scan_devices(self) -> List[Dict[str, str]]:
         """
@@ -46,6 +98,91 @@ class SerialDeviceService:
         logger.info(f"{len(available_ports)}개의 시리얼 포트 발견")
         return available_ports
 
+    def discover(self) -> Optional[str]:
+        """
+        MySkin 펌웨어가 응답하는 포트 탐색
+
+        1. 마지막으로 연결된 포트 (USB 재연결로 이름이 바뀌었으면 시리얼 번호로 찾음)를 먼저 확인
+        2. 실패하면 나머지 USB 포트를 동시에 확인하고 처음 응답한 포트 반환
+
+        Returns:
+            포트 이름 (없으면 None)
+        """
+        started = time.monotonic()
+        ports = serial.tools.list_ports.comports()
+        cached = get_device_cache().get(self.device_name) or {}
+
+        cached_port = None
+        for p in ports:
+            if cached.get("serial_number") and p.serial_number == cached["serial_number"]:
+                cached_port = p.device
+                break
+        if cached_port is None and cached.get("port") and os.path.exists(cached["port"]):
+            cached_port = cached["port"]
+
+        if cached_port and self.probe_port(cached_port):
+            logger.info(f"캐시된 포트 확인: {cached_port} ({(time.monotonic() - started) * 1000:.0f}ms)")
+            return cached_port
+
+        # 시리얼 하드웨어 정보가 없는 포트(내장 UART, 가상 포트)는 제외
+        candidates = [p.device for p in ports if p.device != cached_port and p.hwid != "n/a"]
+        if not candidates:
+            return None
+
+        pool = ThreadPoolExecutor(max_workers=len(candidates), thread_name_prefix="serial-probe")
+        try:
+            futures = {pool.submit(self.probe_port, candidate): candidate for candidate in candidates}
+            for future in as_completed(futures):
+                if future.result():
+                    found = futures[future]
+                    logger.info(f"포트 탐색 완료: {found} ({(time.monotonic() - started) * 1000:.0f}ms)")
+                    return found
+            return None
+        finally:
+            # 나머지 확인은 각자 제한 시간 안에 끝나므로 기다리지 않음
+            pool.shutdown(wait=False)
+
+    def probe_port(self, port: str, timeout: float = SERIAL_PROBE_TIMEOUT) -> bool:
+        """
+        포트에 STATUS를 보내 MySkin 펌웨어인지 확인 (명령 에코 + 응답 줄)
+
+        Args:
+            port: 포트 이름
+            timeout: 응답 대기 시간 (초)
+
+        Returns:
+            MySkin 펌웨어 여부
+        """
+        try:
+            with serial.Serial(port=port, baudrate=self.baud_rate, timeout=0.05, write_timeout=timeout) as conn:
+                conn.reset_input_buffer()
+                conn.write(b"STATUS\n")
+                conn.flush()
+
+                parser = FrameParser()
+                echoed = False
+                deadline = time.monotonic() + timeout
+                while time.monotonic() < deadline:
+                    for kind, item in parser.feed(conn.read(conn.in_waiting or 1)):
+                        if kind != "line":
+                            continue
+                        if item.startswith(ECHO_PREFIX):
+                            echoed = True
+                        elif echoed and is_response_line(item):
+                            return True
+        except (serial.SerialException, OSError, ValueError) as e:
+            logger.debug(f"포트 확인 실패: {port} ({e})")
+        return False
+
+    def _remember_port(self, port: str):
+        """연결된 포트를 탐색 캐시에 저장 (USB 재연결 대비 시리얼 번호 포함)"""
+        info = {"port": port}
+        for p in serial.tools.list_ports.comports():
+            if p.device == port:
+                info.update(serial_number=p.serial_number, hwid=p.hwid)
+                break
+        get_device_cache().remember(self.device_name, **info)
+
     def connect(self, port: Optional[str] = None) -> bool:
         """
         시리얼 포트 연결
@@ -61,46 +198,37 @@ class SerialDeviceService:
             return True
 
         try:
-            # 포트가 지정되지 않으면 자동 검색
+            # 포트가 지정되지 않으면 펌웨어가 응답하는 포트 탐색
             if port is None:
-                ports = self.scan_devices()
-                if not ports:
-                    logger.error("사용 가능한 시리얼 포트가 없습니다")
-                    return False
-
-                # Arduino/Seeed 장치 우선 선택
-                for p in ports:
-                    desc_lower = p['description'].lower()
-                    if 'arduino' in desc_lower or 'ch340' in desc_lower or 'usb serial' in desc_lower:
-                        port = p['port']
-                        logger.info(f"Arduino 포트 자동 선택: {port}")
-                        break
-
-                # 없으면 첫 번째 포트 사용
+                port = self.discover()
                 if port is None:
-                    port = ports[0]['port']
-                    logger.info(f"첫 번째 포트 선택: {port}")
+                    logger.error("MySkin 펌웨어가 응답하는 시리얼 포트가 없습니다")
+                    return False
 
             logger.info(f"시리얼 포트 연결 시도: {port} @ {self.baud_rate} baud")
 
-            # 시리얼 포트 열기
+            # 시리얼 포트 열기 (짧은 read timeout으로 리더 스레드가 종료 신호를 확인)
             self.serial_port = serial.Serial(
                 port=port,
                 baudrate=self.baud_rate,
-                timeout=2,
+                timeout=SERIAL_READ_TIMEOUT,
                 write_timeout=2
             )
 
-            # 연결 안정화 대기
-            time.sleep(2)
-
-            # 아두이노 리셋 후 초기화 메시지 읽기
+            # 이전 세션에서 남은 출력 제거
             self.serial_port.reset_input_buffer()
             self.serial_port.reset_output_buffer()
 
             self._connected = True
             self.port_name = port
-            logger.info(f"시리얼 포트 연결 성공: {port}")
+            self._start_reader()
+
+            # 고정 대기 대신 디바이스가 응답하는 즉시 진행
+            self._wait_ready()
+            if SERIAL_BINARY_PROTOCOL:
+                self._negotiate()
+            logger.info(f"시리얼 포트 연결 성공: {port} (protocol v{self.protocol_version})")
+            self._remember_port(port)
 
             return True
 
@@ -119,55 +247,230 @@ class SerialDeviceService:
         """시리얼 포트 연결 해제"""
         if self.serial_port and self.serial_port.is_open:
             try:
-                # STOP 명령 전송 후 닫기
-                self.send_command("STOP")
-                time.sleep(0.5)
+                # STOP 응답을 받은 뒤 닫기
+                try:
+                    self.send_command("STOP")
+                except TimeoutError:
+                    logger.warning("STOP 응답 없음 - 연결 해제 계속")
+                self._stop_reader_thread()
                 self.serial_port.close()
                 logger.info("시리얼 포트 연결 해제 완료")
             except Exception as e:
                 logger.error(f"연결 해제 오류: {e}")
             finally:
+                self._stop_reader_thread()
+                self._fail_pending(ConnectionError("시리얼 포트 연결이 해제되었습니다"))
                 self.serial_port = None
                 self._connected = False
                 self.port_name = None
+                self.protocol_version = 0
 
-    def send_command(self, command: str) -> str:
+    def send_command(self, command: str, timeout: Optional[float] = None) -> str:
         """
-        시리얼로 명령 전송
+        시리얼로 명령 전송 후 응답 대기
 
         Args:
             command: 전송할 명령 문자열
+            timeout: 응답 대기 시간 (초, None이면 명령별 기본값)
 
         Returns:
             아두이노 응답
+
+        Raises:
+            ConnectionError: 연결되지 않았거나 대기 중 연결이 끊긴 경우
+            TimeoutError: 제한 시간 안에 응답이 없는 경우
         """
-        if not self._connected or not self.serial_port or not self.serial_port.is_open:
+        if not self.is_connected():
             raise ConnectionError("시리얼 포트가 연결되지 않았습니다")
 
+        pending = _PendingCommand(command, self.command_timeout)
+        seq = None
         try:
             logger.info(f"명령 전송: {command}")
 
-            # 명령 전송 (줄바꿈 포함)
-            self.serial_port.write((command + '\n').encode('utf-8'))
-            self.serial_port.flush()
+            # 대기열 순서와 전송 순서가 같도록 함께 잠금
+            with self._write_lock:
+                frame = None
+                if self.protocol_version >= 1:
+                    seq = self._next_seq()
+                    frame = encode_command(command, seq)
+                with self._pending_lock:
+                    if frame is not None:
+                        self._pending_seq[seq] = pending
+                    else:
+                        seq = None
+                        self._pending.append(pending)
+                self.serial_port.write(frame if frame is not None else (command + '\n').encode('utf-8'))
+                self.serial_port.flush()
+
+        except Exception as e:
+            self._forget(pending, seq)
+            logger.error(f"명령 전송 오류: {e}")
+            raise
 
-            # 응답 대기
-            time.sleep(0.3)
+        try:
+            response = pending.future.result(timeout or pending.timeout)
+        except FutureTimeout:
+            if seq is not None:
+                # 시퀀스 번호로 연결하므로 늦은 응답은 그대로 버려짐
+                self._forget(pending, seq)
+            # 텍스트 명령은 늦게 오는 응답이 다음 명령에 잘못 연결되지 않도록 자리는 유지
+            pending.abandoned = True
+            logger.error(f"응답 시간 초과: {command}")
+            raise TimeoutError(f"디바이스 응답 시간 초과: {command}")
+
+        logger.info(f"아두이노 응답: {response}")
+        return response
+
+    def _wait_ready(self):
+        """
+        디바이스가 STATUS에 응답할 때까지 대기 (최대 SERIAL_READY_TIMEOUT)
+
+        부팅 중 받은 명령은 펌웨어 수신 버퍼에 쌓였다가 순서대로 처리되므로
+        재전송하지 않고 한 번만 보냅니다.
+        """
+        try:
+            self.send_command("STATUS", timeout=SERIAL_READY_TIMEOUT)
+        except TimeoutError:
+            logger.warning("디바이스 응답 없음 - 부팅 중일 수 있습니다")
 
-            # 응답 읽기
+    def _negotiate(self):
+        """바이너리 프로토콜 버전 협상 (구 펌웨어면 텍스트 유지)"""
+        try:
+            response = self.send_command(f"PROTO:{PROTOCOL_VERSION}")
+        except TimeoutError:
             response = ""
-            if self.serial_port.in_waiting > 0:
-                response = self.serial_port.readline().decode('utf-8').strip()
+        if response.startswith("OK:PROTO:"):
+            self.protocol_version = min(int(response.rsplit(":", 1)[1]), PROTOCOL_VERSION)
+        else:
+            logger.info("펌웨어가 바이너리 프로토콜을 지원하지 않음 - 텍스트 명령 사용")
+
+    def _next_seq(self) -> int:
+        """다음 시퀀스 번호 (1~255, 응답 대기 중인 번호는 건너뜀, self._write_lock 보유 상태에서 호출)"""
+        for _ in range(255):
+            self._seq = self._seq % 255 + 1
+            if self._seq not in self._pending_seq:
+                return self._seq
+        raise ConnectionError("응답 대기 중인 명령이 너무 많습니다")
+
+    def _forget(self, pending: _PendingCommand, seq: Optional[int]):
+        """대기 목록에서 명령 제거"""
+        with self._pending_lock:
+            if seq is not None:
+                if self._pending_seq.get(seq) is pending:
+                    del self._pending_seq[seq]
+            elif pending in self._pending:
+                self._pending.remove(pending)
+
+    def _start_reader(self):
+        self._stop_reader.clear()
+        self._reader = threading.Thread(target=self._read_loop, name="serial-reader", daemon=True)
+        self._reader.start()
+
+    def _stop_reader_thread(self):
+        self._stop_reader.set()
+        if self._reader and self._reader is not threading.current_thread():
+            self._reader.join(timeout=1)
+        self._reader = None
+
+    def _read_loop(self):
+        """수신 바이트를 프레임 / 줄 단위로 나눠 처리 (전용 스레드)"""
+        port = self.serial_port
+        parser = FrameParser()
+        while not self._stop_reader.is_set():
+            try:
+                data = port.read(port.in_waiting or 1)
+            except (serial.SerialException, OSError, TypeError) as e:
+                if not self._stop_reader.is_set():
+                    logger.error(f"시리얼 읽기 오류 (연결 끊김): {e}")
+                    self._connected = False
+                    self._fail_pending(ConnectionError(f"시리얼 연결이 끊겼습니다: {e}"))
+                return
+
+            if not data:
+                continue
+            for kind, item in parser.feed(data):
+                if kind == "line":
+                    self._handle_line(item)
+                elif kind == "frame":
+                    self._handle_frame(item)
+                else:
+                    logger.warning(f"잘못된 프레임 수신: {item}")
+
+    def _handle_frame(self, frame):
+        """응답 프레임을 시퀀스 번호가 같은 명령에 연결"""
+        with self._pending_lock:
+            pending = self._pending_seq.pop(frame.seq, None)
+        if pending is None:
+            logger.debug(f"대기 명령 없는 프레임: {frame!r}")
+            return
+        try:
+            pending.future.set_result(decode_response(frame))
+        except ProtocolError as e:
+            pending.future.set_exception(e)
+
+    def _handle_line(self, line: str):
+        """수신 줄 분류: 에코 → 순서 재동기화, 응답 → 대기 명령 완료, 그 외 → 로그"""
+        if line.startswith(ECHO_PREFIX):
+            self._resync(line[len(ECHO_PREFIX):].strip())
+            return
+
+        if is_response_line(line):
+            with self._pending_lock:
+                pending = self._pending.popleft() if self._pending else None
+            if pending is None:
+                logger.debug(f"대기 명령 없는 응답: {line}")
+            elif not pending.abandoned:
+                pending.future.set_result(line)
+            return
+
+        self.device_log.append(line)
+        logger.debug(f"디바이스 출력: {line}")
+        for listener in self._listeners:
+            try:
+                listener(line)
+            except Exception as e:
+                logger.error(f"디바이스 출력 리스너 오류: {e}")
 
-            if not response:
-                response = "OK"
+    def add_listener(self, callback: Callable[[str], None]):
+        """
+        펌웨어가 스스로 출력하는 줄(응답 외) 구독
 
-            logger.info(f"아두이노 응답: {response}")
-            return response
+        리더 스레드에서 호출되므로 callback은 오래 걸리지 않아야 합니다.
 
-        except Exception as e:
-            logger.error(f"명령 전송 오류: {e}")
-            raise
+        Args:
+            callback: 출력 줄을 받는 함수
+        """
+        self._listeners.append(callback)
+
+    def _resync(self, echoed: str):
+        """
+        에코된 명령을 수신 확인으로 표시하고, 그보다 앞선 미확인 명령 정리
+
+        디바이스가 명령을 순서대로 처리하므로, 에코된 명령 앞에 남아 있는 미확인
+        명령은 유실되어 응답을 받을 수 없습니다.
+        """
+        with self._pending_lock:
+            waiting = [p for p in self._pending if not p.echoed]
+            commands = [p.command.strip().upper() for p in waiting]
+            if echoed.upper() not in commands:
+                return
+            index = commands.index(echoed.upper())
+            for lost in waiting[:index]:
+                self._pending.remove(lost)
+                if not lost.abandoned:
+                    lost.future.set_exception(TimeoutError(f"디바이스 응답 누락: {lost.command}"))
+            waiting[index].echoed = True
+
+    def _fail_pending(self, error: Exception):
+        """대기 중인 모든 명령을 실패 처리"""
+        with self._pending_lock:
+            waiting = list(self._pending) + list(self._pending_seq.values())
+            self._pending.clear()
+            self._pending_seq.clear()
+        for pending in waiting:
+            if not pending.abandoned and not pending.future.done():
+                pending.future.set_exception(error)
 
     def start_therapy(self, mode: str, duration: int) -> Dict[str, Any]:
         """
@@ -215,6 +518,41 @@ class SerialDeviceService:
                 "message": "테라피 시작 중 오류 발생"
             }
 
+    def start_program(self, program: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        테라피 프로그램 업로드 및 시작 (단계 전환은 디바이스가 자체 실행)
+
+        Args:
+            program: TherapyProgramService.compile / validate 결과
+
+        Returns:
+            응답 딕셔너리
+        """
+        try:
+            response = self.send_command(program["command"])
+
+            if response.startswith("OK:PROGRAM"):
+                return {
+                    "success": True,
+                    "phases": program["phases"],
+                    "total_seconds": program["total_seconds"],
+                    "message": "테라피 프로그램이 시작되었습니다"
+                }
+            error_type = response.split(':')[1] if response.startswith("ERROR:") else response
+            return {
+                "success": False,
+                "error": error_type,
+                "message": f"테라피 프로그램 시작 실패: {error_type}"
+            }
+
+        except Exception as e:
+            logger.error(f"테라피 프로그램 시작 실패: {e}")
+            return {
+                "success": False,
+                "error": str(e),
+                "message": "테라피 프로그램 시작 중 오류 발생"
+            }
+
     def stop_therapy(self) -> Dict[str, Any]:
         """
         LED 테라피 중지
@@ -251,7 +589,7 @@ class SerialDeviceService:
         Returns:
             상태 딕셔너리
         """
-        if not self._connected or not self.serial_port or not self.serial_port.is_open:
+        if not self.is_connected():
             return {
                 "connected": False,
                 "status": "disconnected"
@@ -297,7 +635,13 @@ class SerialDeviceService:
 
     def is_connected(self) -> bool:
         """연결 상태 확인"""
-        return self._connected and self.serial_port is not None and self.serial_port.is_open
+        return (
+            self._connected
+            and self.serial_port is not None
+            and self.serial_port.is_open
+            and self._reader is not None
+            and self._reader.is_alive()
+        )
 
 
 # 싱글톤 인스턴스
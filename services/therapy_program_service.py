@@ -0,0 +1,128 @@
+"""
+테라피 프로그램 서비스
+분석 결과(LED 추천)를 다단계 LED 시퀀스로 변환
+
+프로그램은 한 번의 PROGRAM 명령으로 디바이스에 업로드되며, 이후 단계 전환과
+PWM 램프는 펌웨어가 자체 타이머로 실행합니다 (연결이 끊겨도 계속 진행).
+"""
+from typing import Any, Dict, List
+from core.constants import (
+    LED_MODES, THERAPY_RAMP_SECONDS, THERAPY_RAMP_START_RATIO,
+    THERAPY_SECONDARY_RATIO, THERAPY_SECONDARY_MINUTES
+)
+from core.logger import setup_logger
+from services.led_service import LEDService
+from services.device_protocol import MAX_PROGRAM_PHASES, MAX_PROGRAM_SECONDS, format_program, parse_program
+
+logger = setup_logger(__name__)
+
+
+class TherapyProgramService:
+    """테라피 프로그램 생성 / 검증 서비스"""
+
+    @staticmethod
+    def compile(recommendation: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        LED 추천 결과 → 테라피 프로그램
+
+        주 문제 모드를 추천 시간만큼 실행하고, 심각도가 주 문제의
+        THERAPY_SECONDARY_RATIO 이상인 다른 모드를 보조 단계로 이어 붙입니다.
+        각 단계는 목표 밝기의 THERAPY_RAMP_START_RATIO에서 시작해 서서히 밝아집니다.
+
+        Args:
+            recommendation: LEDService.recommend 결과
+
+        Returns:
+            {
+                "phases": [{"mode", "seconds", "pwm_start", "pwm_end", "ramp_seconds"}],
+                "total_seconds": int,
+                "command": str (PROGRAM 명령)
+            }
+        """
+        issues = recommendation.get("issue_analysis", {})
+        severities = {
+            mode: max((issues.get(issue, 0) for issue in info["target_issues"]), default=0)
+            for mode, info in LED_MODES.items()
+        }
+
+        main_mode = recommendation["mode"]
+        phases = [TherapyProgramService._phase(
+            main_mode, recommendation["duration"] * 60, recommendation.get("intensity", 100)
+        )]
+        total = phases[0]["seconds"]
+
+        # 보조 단계: 심각도 높은 순, 프로그램 최대 길이/단계 수 이내
+        threshold = severities.get(main_mode, 0) * THERAPY_SECONDARY_RATIO
+        secondary = sorted(
+            (mode for mode, severity in severities.items() if mode != main_mode and severity > 0 and severity >= threshold),
+            key=lambda mode: severities[mode],
+            reverse=True
+        )
+        for mode in secondary:
+            seconds = THERAPY_SECONDARY_MINUTES * 60
+            if len(phases) >= MAX_PROGRAM_PHASES or total + seconds > MAX_PROGRAM_SECONDS:
+                break
+            phases.append(TherapyProgramService._phase(mode, seconds, LEDService.intensity(severities[mode])))
+            total += seconds
+
+        return {
+            "phases": phases,
+            "total_seconds": total,
+            "command": format_program(phases)
+        }
+
+    @staticmethod
+    def validate(phases: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        클라이언트가 보낸 단계 목록 검증 / 기본값 채우기
+
+        Args:
+            phases: [{"mode", "minutes" 또는 "seconds", "intensity" 또는 "pwm_start"/"pwm_end", "ramp_seconds"}]
+
+        Returns:
+            compile과 같은 형식의 프로그램
+
+        Raises:
+            ValueError: 형식 오류 / 펌웨어 제한 초과
+        """
+        if not isinstance(phases, list) or not phases:
+            raise ValueError("phases는 비어 있지 않은 목록이어야 합니다")
+
+        normalized = []
+        for phase in phases:
+            try:
+                seconds = int(phase["seconds"]) if "seconds" in phase else int(phase["minutes"]) * 60
+                base = TherapyProgramService._phase(str(phase["mode"]).lower(), seconds, int(phase.get("intensity", 100)))
+                for key in ("pwm_start", "pwm_end", "ramp_seconds"):
+                    if key in phase:
+                        base[key] = int(phase[key])
+            except (KeyError, TypeError, ValueError, AttributeError):
+                raise ValueError("단계 형식 오류: mode와 minutes(또는 seconds)가 필요합니다")
+            normalized.append(base)
+
+        # 와이어 형식으로 왕복시켜 펌웨어와 같은 규칙으로 검증 (ProtocolError는 ValueError)
+        command = format_program(normalized)
+        try:
+            parsed = parse_program(command)
+        except ValueError as e:
+            raise ValueError(f"테라피 프로그램 검증 실패: {e}")
+        for phase, original in zip(parsed, normalized):
+            phase["mode"] = original["mode"]
+
+        return {
+            "phases": parsed,
+            "total_seconds": sum(p["seconds"] for p in parsed),
+            "command": command
+        }
+
+    @staticmethod
+    def _phase(mode: str, seconds: int, intensity: int) -> Dict[str, Any]:
+        """단계 하나 생성 (강도 0-100 → PWM 0-255, 시작 밝기에서 램프)"""
+        pwm_end = max(0, min(255, round(intensity * 255 / 100)))
+        return {
+            "mode": mode,
+            "seconds": seconds,
+            "pwm_start": int(pwm_end * THERAPY_RAMP_START_RATIO),
+            "pwm_end": pwm_end,
+            "ramp_seconds": min(THERAPY_RAMP_SECONDS, seconds, 255)
+        }
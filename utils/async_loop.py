@@ -0,0 +1,74 @@
+"""
+백그라운드 asyncio 이벤트 루프
+
+Flask 핸들러(동기)에서 BLE/Mock 디바이스 코루틴을 실행하기 위한 장기 실행 루프입니다.
+요청마다 asyncio.run()으로 루프를 만들고 닫는 대신 하나의 루프 스레드가
+디바이스 서비스를 소유하므로, 루프에 묶인 BLE 연결이 요청 사이에 유지됩니다.
+"""
+import asyncio
+import threading
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Any, Optional
+from core.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class BackgroundEventLoop:
+    """전용 스레드에서 run_forever로 도는 이벤트 루프"""
+
+    def __init__(self, name: str = "async-loop"):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def run(self, coro, timeout: Optional[float] = None) -> Any:
+        """
+        코루틴을 루프에서 실행하고 결과를 기다림
+
+        Args:
+            coro: 실행할 코루틴
+            timeout: 최대 대기 시간 (초, None이면 무제한)
+
+        Returns:
+            코루틴 반환값
+
+        Raises:
+            TimeoutError: 제한 시간 초과 (코루틴은 취소됨)
+        """
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        try:
+            return future.result(timeout)
+        except FutureTimeout:
+            future.cancel()
+            raise TimeoutError(f"비동기 작업 시간 초과 ({timeout}초)")
+
+    def is_running(self) -> bool:
+        """루프 스레드 동작 여부"""
+        return self._thread.is_alive() and self.loop.is_running()
+
+    def stop(self):
+        """루프 종료 (스레드 join)"""
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout=5)
+        self.loop.close()
+
+
+# 싱글톤 인스턴스
+_device_loop: Optional[BackgroundEventLoop] = None
+_device_loop_lock = threading.Lock()
+
+
+def get_device_loop() -> BackgroundEventLoop:
+    """디바이스 서비스용 이벤트 루프 싱글톤 인스턴스 반환"""
+    global _device_loop
+    if _device_loop is None:
+        with _device_loop_lock:
+            if _device_loop is None:
+                _device_loop = BackgroundEventLoop(name="device-loop")
+                logger.info("디바이스 이벤트 루프 시작")
+    return _device_loop
@@ -0,0 +1,77 @@
+"""
+프로세스 내 TTL + LRU 캐시
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """
+    스레드 안전한 TTL + LRU 캐시
+
+    Args:
+        maxsize: 최대 항목 수 (초과 시 가장 오래 사용하지 않은 항목 제거)
+        ttl: 항목 유지 시간 (초)
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        """값 조회 (없거나 만료되면 default)"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[1] < time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value):
+        """값 저장"""
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        """항목 무효화"""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        """전체 무효화"""
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        """캐시 적중 통계"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0
+            }
+
+    def __contains__(self, key):
+        """만료되지 않은 항목 존재 여부 (적중 통계에 반영하지 않음)"""
+        with self._lock:
+            entry = self._data.get(key)
+            return entry is not None and entry[1] >= time.monotonic()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
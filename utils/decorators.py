@@ -17,6 +17,9 @@ def handle_errors(f):
         except ValueError as e:
             logger.error(f"입력 오류: {e}")
             return jsonify({"error": str(e)}), 400
+        except TimeoutError as e:
+            logger.error(f"시간 초과: {e}")
+            return jsonify({"error": "응답 시간이 초과되었습니다"}), 504
         except Exception as e:
             logger.error(f"API 오류: {e}", exc_info=True)
             return jsonify({"error": "서버 오류가 발생했습니다"}), 500
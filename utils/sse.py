@@ -0,0 +1,50 @@
+"""
+Server-Sent Events 유틸리티
+"""
+import json
+
+
+def format_sse(data, event=None):
+    """
+    SSE 메시지 한 건 직렬화
+
+    Args:
+        data: JSON 직렬화 가능한 데이터
+        event: 이벤트 이름 (없으면 기본 message 이벤트)
+
+    Returns:
+        str: "event: ...\\ndata: {...}\\n\\n"
+    """
+    message = f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+    if event:
+        message = f"event: {event}\n{message}"
+    return message
+
+
+def iter_sse(lines):
+    """
+    SSE 스트림 파싱
+
+    Args:
+        lines: 디코딩된 줄 iterable (예: requests Response.iter_lines(decode_unicode=True))
+
+    Yields:
+        (event, data): event는 이름 또는 None, data는 JSON 파싱된 값
+    """
+    event = None
+    data_lines = []
+    for line in lines:
+        if line is None:
+            continue
+        if line == "":
+            if data_lines:
+                yield event, json.loads("\n".join(data_lines))
+            event = None
+            data_lines = []
+        elif line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data_lines.append(line[len("data:"):].strip())
+
+    if data_lines:
+        yield event, json.loads("\n".join(data_lines))
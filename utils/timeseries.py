@@ -0,0 +1,130 @@
+"""
+시계열 집계/다운샘플링 유틸리티
+"""
+from datetime import datetime, timedelta
+
+BUCKETS = ("day", "week", "month")
+
+
+def bucket_start(timestamp, bucket):
+    """
+    타임스탬프가 속한 버킷의 시작 시각 계산
+
+    Args:
+        timestamp: datetime
+        bucket: "day" / "week" / "month"
+
+    Returns:
+        datetime: 버킷 시작 시각 (week는 월요일 기준)
+    """
+    day = datetime(timestamp.year, timestamp.month, timestamp.day)
+    if bucket == "day":
+        return day
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())
+    if bucket == "month":
+        return day.replace(day=1)
+    raise ValueError(f"지원하지 않는 bucket입니다: {bucket} (day, week, month 중 선택)")
+
+
+def bucketize(samples, bucket):
+    """
+    (timestamp, value) 샘플을 버킷별 평균으로 집계
+
+    Args:
+        samples: [(datetime, float)] (순서 무관, value가 None이면 제외)
+        bucket: "day" / "week" / "month"
+
+    Returns:
+        list: [{"t": datetime, "score": float, "count": int}] (시간순)
+    """
+    sums = {}
+    for timestamp, value in samples:
+        if timestamp is None or value is None:
+            continue
+        key = bucket_start(timestamp, bucket)
+        total, count = sums.get(key, (0.0, 0))
+        sums[key] = (total + float(value), count + 1)
+
+    return [
+        {"t": key, "score": total / count, "count": count}
+        for key, (total, count) in sorted(sums.items())
+    ]
+
+
+def moving_average(values, window):
+    """
+    단순 이동 평균 (앞쪽 구간은 가능한 개수만큼 평균)
+
+    Args:
+        values: 숫자 리스트
+        window: 윈도우 크기 (1 이상)
+
+    Returns:
+        list: values와 같은 길이의 이동 평균
+    """
+    window = max(1, int(window))
+    result = []
+    running = 0.0
+    for i, value in enumerate(values):
+        running += value
+        if i >= window:
+            running -= values[i - window]
+        result.append(running / min(i + 1, window))
+    return result
+
+
+def lttb(points, threshold, x=lambda p: p[0], y=lambda p: p[1]):
+    """
+    Largest-Triangle-Three-Buckets 다운샘플링
+
+    첫/마지막 점은 항상 유지하고, 나머지는 threshold-2개 구간에서
+    인접 구간과 가장 큰 삼각형을 이루는 점 하나씩을 선택합니다.
+
+    Args:
+        points: 시간순 정렬된 점 리스트
+        threshold: 목표 점 개수
+        x, y: 점에서 좌표를 꺼내는 함수
+
+    Returns:
+        list: 다운샘플링된 점 리스트 (원본 객체 유지)
+    """
+    n = len(points)
+    if threshold >= n:
+        return list(points)
+    if threshold <= 2:
+        return [points[0], points[-1]][:max(threshold, 0)]
+
+    sampled = [points[0]]
+    every = (n - 2) / (threshold - 2)
+    a = 0
+
+    for i in range(threshold - 2):
+        # 다음 구간의 평균점
+        avg_start = int((i + 1) * every) + 1
+        avg_end = min(int((i + 2) * every) + 1, n)
+        avg_range = points[avg_start:avg_end]
+        avg_x = sum(x(p) for p in avg_range) / len(avg_range)
+        avg_y = sum(y(p) for p in avg_range) / len(avg_range)
+
+        # 현재 구간에서 삼각형 면적이 최대인 점 선택
+        range_start = int(i * every) + 1
+        range_end = int((i + 1) * every) + 1
+        ax, ay = x(points[a]), y(points[a])
+
+        max_area = -1.0
+        next_a = range_start
+        for j in range(range_start, range_end):
+            area = abs(
+                (ax - avg_x) * (y(points[j]) - ay)
+                - (ax - x(points[j])) * (avg_y - ay)
+            )
+            if area > max_area:
+                max_area = area
+                next_a = j
+
+        sampled.append(points[next_a])
+        a = next_a
+
+    sampled.append(points[-1])
+    return sampled